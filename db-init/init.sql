@@ -18,6 +18,7 @@ CREATE TABLE products (
     name VARCHAR(150) NOT NULL,
     sku VARCHAR(64) NOT NULL UNIQUE,
     price DECIMAL(10,2) NOT NULL,
+    stock INT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -39,10 +40,83 @@ CREATE TABLE order_items (
     product_id INT NOT NULL,
     quantity INT NOT NULL DEFAULT 1,
     unit_price DECIMAL(10,2) NOT NULL,
+    stock_reserved BOOLEAN NOT NULL DEFAULT FALSE,
     FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE,
     FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE RESTRICT
 );
 
+-- Archived orders and items, moved out of the live tables by commands/order_archival.py
+DROP TABLE IF EXISTS order_items_archive;
+DROP TABLE IF EXISTS orders_archive;
+CREATE TABLE orders_archive (
+    id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    total_amount DECIMAL(12,2) NOT NULL,
+    created_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_orders_archive_created (created_at),
+    INDEX idx_orders_archive_user_created (user_id, created_at),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE order_items_archive (
+    id INT PRIMARY KEY,
+    order_id INT NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL DEFAULT 1,
+    unit_price DECIMAL(10,2) NOT NULL,
+    INDEX idx_order_items_archive_order_covering (order_id, product_id, quantity, unit_price),
+    INDEX idx_order_items_archive_product_covering (product_id, quantity, unit_price),
+    FOREIGN KEY (order_id) REFERENCES orders_archive(id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE RESTRICT
+);
+
+-- Order events (transactional outbox), projected into Redis by commands/order_projector.py
+DROP TABLE IF EXISTS order_events;
+CREATE TABLE order_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    order_id INT NOT NULL,
+    event_type VARCHAR(32) NOT NULL,
+    payload JSON NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    processed_at TIMESTAMP NULL,
+    INDEX idx_order_events_pending (processed_at, id)
+);
+
+-- Report summaries, maintained by commands/write_order.py in the same transaction as orders
+DROP TABLE IF EXISTS user_spend_summary;
+CREATE TABLE user_spend_summary (
+    user_id INT PRIMARY KEY,
+    total_spent DECIMAL(14,2) NOT NULL DEFAULT 0,
+    order_count INT NOT NULL DEFAULT 0,
+    INDEX idx_user_spend_total (total_spent),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+DROP TABLE IF EXISTS product_sales_summary;
+CREATE TABLE product_sales_summary (
+    product_id INT PRIMARY KEY,
+    units_sold INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    INDEX idx_product_sales_units (units_sold),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+
+-- Migrations already included above: run_migrations() must not apply them again (e.g. V004's ALTER TABLE).
+-- A migration whose DDL is copied here is recorded here too; the others (V002) run at startup
+DROP TABLE IF EXISTS schema_migrations;
+CREATE TABLE schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(150) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO schema_migrations (version, name) VALUES (1, 'report_summaries');
+INSERT INTO schema_migrations (version, name) VALUES (3, 'order_events');
+INSERT INTO schema_migrations (version, name) VALUES (4, 'product_stock');
+INSERT INTO schema_migrations (version, name) VALUES (5, 'order_archive');
+INSERT INTO schema_migrations (version, name) VALUES (6, 'order_items_stock_reserved');
+
 -- Mock data: users
 INSERT INTO users (name, email) VALUES
 ('Ada Lovelace', 'alovelace@example.com'),
@@ -60,3 +134,10 @@ INSERT INTO products (name, sku, price) VALUES
 INSERT INTO orders (user_id, total_amount) VALUES
 (1, 1999.99),
 (2, 59.50);
+
+-- Mock data: report summaries, computed like manage.py backfill-report-summaries
+INSERT INTO user_spend_summary (user_id, total_spent, order_count)
+SELECT user_id, SUM(total_amount), COUNT(*) FROM orders GROUP BY user_id;
+
+INSERT INTO product_sales_summary (product_id, units_sold, revenue)
+SELECT product_id, SUM(quantity), SUM(quantity * unit_price) FROM order_items GROUP BY product_id;
@@ -0,0 +1,16 @@
+-- Report summary tables for databases created before they were added to init.sql
+CREATE TABLE IF NOT EXISTS user_spend_summary (
+    user_id INT PRIMARY KEY,
+    total_spent DECIMAL(14,2) NOT NULL DEFAULT 0,
+    order_count INT NOT NULL DEFAULT 0,
+    INDEX idx_user_spend_total (total_spent),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS product_sales_summary (
+    product_id INT PRIMARY KEY,
+    units_sold INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    INDEX idx_product_sales_units (units_sold),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
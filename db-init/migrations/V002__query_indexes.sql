@@ -0,0 +1,11 @@
+-- Orders of a user, most recent first (also serves the user_id foreign key)
+CREATE INDEX idx_orders_user_created ON orders (user_id, created_at);
+
+-- Time-range scans over orders (sync, export, archival)
+CREATE INDEX idx_orders_created ON orders (created_at);
+
+-- Items of an order, covering the quantity * unit_price aggregation (also serves the order_id foreign key)
+CREATE INDEX idx_order_items_order_covering ON order_items (order_id, product_id, quantity, unit_price);
+
+-- Units sold per product, covering the best sellers backfill (also serves the product_id foreign key)
+CREATE INDEX idx_order_items_product_covering ON order_items (product_id, quantity, unit_price);
@@ -0,0 +1,10 @@
+-- Transactional outbox of order events, projected into Redis in the background
+CREATE TABLE IF NOT EXISTS order_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    order_id INT NOT NULL,
+    event_type VARCHAR(32) NOT NULL,
+    payload JSON NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    processed_at TIMESTAMP NULL,
+    INDEX idx_order_events_pending (processed_at, id)
+);
@@ -0,0 +1,2 @@
+-- Available stock per product (NULL: not tracked). Redis holds the live level, this column is flushed periodically
+ALTER TABLE products ADD COLUMN stock INT NULL;
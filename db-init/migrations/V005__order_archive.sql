@@ -0,0 +1,24 @@
+-- Archive of the cold orders and their items, filled in batches by commands/order_archival.py.
+-- Same columns and constraints as the live tables, the IDs being kept
+CREATE TABLE IF NOT EXISTS orders_archive (
+    id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    total_amount DECIMAL(12,2) NOT NULL,
+    created_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_orders_archive_created (created_at),
+    INDEX idx_orders_archive_user_created (user_id, created_at),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS order_items_archive (
+    id INT PRIMARY KEY,
+    order_id INT NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL DEFAULT 1,
+    unit_price DECIMAL(10,2) NOT NULL,
+    INDEX idx_order_items_archive_order_covering (order_id, product_id, quantity, unit_price),
+    INDEX idx_order_items_archive_product_covering (product_id, quantity, unit_price),
+    FOREIGN KEY (order_id) REFERENCES orders_archive(id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE RESTRICT
+);
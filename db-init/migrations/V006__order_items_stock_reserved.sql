@@ -0,0 +1,3 @@
+-- Whether the item's quantity was taken from a tracked stock level when the order was placed:
+-- deleting the order gives back only these, not the stock of a product tracked since
+ALTER TABLE order_items ADD COLUMN stock_reserved BOOLEAN NOT NULL DEFAULT FALSE;
@@ -0,0 +1,62 @@
+"""
+Admission control: per-client rate limiting and MySQL concurrency cap
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from redis.exceptions import RedisError
+import config
+from db import get_redis_conn
+
+logger = logging.getLogger(__name__)
+
+# Token bucket refilled from the Redis clock, so every worker process shares the same limits.
+# Returns {allowed, seconds to wait before the next token}.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(now - ts, 0) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+_mysql_slots = threading.BoundedSemaphore(config.MYSQL_MAX_CONCURRENCY)
+
+def check_rate_limit(client_id, route_class):
+    """Take a token from the client's bucket, return None if allowed or the seconds to wait otherwise"""
+    rate, burst = config.RATE_LIMITS[route_class]
+    try:
+        r = get_redis_conn()
+        allowed, retry_after = r.register_script(TOKEN_BUCKET_SCRIPT)(
+            keys=[f"ratelimit:{route_class}:{client_id}"], args=[rate, burst])
+    except RedisError as e:
+        # Redis unavailable: let the request through rather than refusing every client
+        logger.warning("limitation de débit indisponible : %s", e)
+        return None
+    return None if int(allowed) else float(retry_after)
+
+@contextmanager
+def mysql_slot():
+    """Hold one of the MYSQL_MAX_CONCURRENCY slots, yield False if none freed up in time"""
+    acquired = _mysql_slots.acquire(timeout=config.MYSQL_SLOT_WAIT)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            _mysql_slots.release()
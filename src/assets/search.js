@@ -0,0 +1,51 @@
+/*
+ * Incremental lookup for the order form: each <input data-search="products|users"> asks
+ * /api/search/{kind} for the typed prefix and fills its <datalist>; picking a suggestion
+ * sets the ID in the hidden input named by data-target.
+ */
+document.querySelectorAll("input[data-search]").forEach(function (input) {
+    var list = document.getElementById(input.getAttribute("list"));
+    var target = input.form.elements[input.dataset.target];
+    var ids = {};
+    var timer = null;
+    var controller = null;
+
+    function label(record) {
+        return record.sku ? record.name + " (" + record.sku + ") — $" + record.price : record.name + " <" + record.email + ">";
+    }
+
+    function lookup() {
+        if (controller) {
+            controller.abort();
+        }
+        controller = new AbortController();
+        var query = "q=" + encodeURIComponent(input.value.trim()) + "&limit=10";
+        fetch("/api/search/" + input.dataset.search + "?" + query, { signal: controller.signal })
+            .then(function (response) { return response.ok ? response.json() : []; })
+            .then(function (records) {
+                ids = {};
+                list.replaceChildren.apply(list, records.map(function (record) {
+                    var option = document.createElement("option");
+                    option.value = label(record);
+                    ids[option.value] = record.id;
+                    return option;
+                }));
+                select();
+            })
+            .catch(function () {});
+    }
+
+    function select() {
+        target.value = ids[input.value] || "";
+        input.setCustomValidity(target.value ? "" : "Choisissez une suggestion de la liste.");
+    }
+
+    input.addEventListener("input", function () {
+        select();
+        clearTimeout(timer);
+        if (input.value.trim() && !target.value) {
+            timer = setTimeout(lookup, 150);
+        }
+    });
+    select();
+});
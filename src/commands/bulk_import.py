@@ -0,0 +1,152 @@
+"""
+Bulk CSV import of users and products (write-only model)
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+The CSV is read as a stream and written in batches, one transaction and one executemany per batch.
+Rows whose email (users) or SKU (products) already exists update the existing record.
+After each committed batch, the records it imported are refreshed in the Redis cache and search index.
+"""
+import csv
+import logging
+import time
+from sqlalchemy import bindparam, text
+import config
+from db import engine
+from commands.write_stock import set_stock_levels
+from commands.write_user import add_users_to_redis
+from commands.write_product import add_products_to_redis
+
+logger = logging.getLogger(__name__)
+
+UPSERT_USERS_SQL = """
+    INSERT INTO users (name, email)
+    VALUES (:name, :email) AS new
+    ON DUPLICATE KEY UPDATE name = new.name
+"""
+
+# An empty stock column keeps the current stock level
+UPSERT_PRODUCTS_SQL = """
+    INSERT INTO products (name, sku, price, stock)
+    VALUES (:name, :sku, :price, :stock) AS new
+    ON DUPLICATE KEY UPDATE
+        name = new.name,
+        price = new.price,
+        stock = COALESCE(new.stock, products.stock)
+"""
+
+USERS_BY_EMAIL_SQL = text("SELECT id, name, email FROM users WHERE email IN :emails").bindparams(
+    bindparam("emails", expanding=True))
+
+PRODUCTS_BY_SKU_SQL = text("SELECT id, name, sku, price FROM products WHERE sku IN :skus").bindparams(
+    bindparam("skus", expanding=True))
+
+def _parse_user(row):
+    name, email = (row.get("name") or "").strip(), (row.get("email") or "").strip()
+    if not name or not email:
+        raise ValueError("Vous devez indiquer un nom et adresse courriel pour l'utilisateur.")
+    if len(name) > 100 or len(email) > 150 or "@" not in email:
+        raise ValueError("Le nom ou l'adresse courriel n'est pas valide.")
+    return {"name": name, "email": email}
+
+def _parse_product(row):
+    name, sku = (row.get("name") or "").strip(), (row.get("sku") or "").strip()
+    try:
+        price = float(row.get("price") or 0)
+    except ValueError:
+        price = 0
+    if not name or not sku or price <= 0:
+        raise ValueError("Vous devez indiquer un nom, numéro SKU et prix unitaire pour l'article.")
+    if len(name) > 150 or len(sku) > 64:
+        raise ValueError("Le nom ou le numéro SKU est trop long.")
+    stock = (row.get("stock") or "").strip()
+    if stock:
+        try:
+            stock = int(stock)
+        except ValueError:
+            raise ValueError("Le stock doit être un nombre entier.")
+        if stock < 0:
+            raise ValueError("Le stock ne peut pas être négatif.")
+    return {"name": name, "sku": sku, "price": round(price, 2), "stock": stock if stock != "" else None}
+
+def _refresh_imported_users(conn, rows):
+    """Give the imported users to the Redis cache and search index"""
+    add_users_to_redis(conn.execute(USERS_BY_EMAIL_SQL, {"emails": [row["email"] for row in rows]}).all())
+
+def _refresh_imported_products(conn, rows):
+    """Give the imported products to the Redis cache and search index, and their stock levels to Redis,
+    where the live stock is kept"""
+    products = conn.execute(PRODUCTS_BY_SKU_SQL, {"skus": [row["sku"] for row in rows]}).all()
+    add_products_to_redis(products)
+    stock_by_sku = {row["sku"]: row["stock"] for row in rows if row["stock"] is not None}
+    if stock_by_sku:
+        set_stock_levels({product.id: stock_by_sku[product.sku] for product in products if product.sku in stock_by_sku})
+
+# {kind: (required columns, parse a CSV row, upsert SQL, refresh of Redis after each committed batch)}
+IMPORT_KINDS = {
+    "users": (("name", "email"), _parse_user, UPSERT_USERS_SQL, _refresh_imported_users),
+    "products": (("name", "sku", "price"), _parse_product, UPSERT_PRODUCTS_SQL, _refresh_imported_products),
+}
+
+def import_csv(kind, lines, batch_size=None):
+    """
+    Import users or products from CSV text lines (a file, the body of a request...), with a header row.
+    Return a report: rows read, rows imported, rows per second and the errors as (line number, message).
+    """
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f"Type d'import inconnu : {kind}. Types disponibles : {', '.join(IMPORT_KINDS)}.")
+    columns, parse_row, sql, after_batch = IMPORT_KINDS[kind]
+    batch_size = batch_size or config.IMPORT_BATCH_SIZE
+
+    reader = csv.DictReader(lines)
+    fieldnames = [name.strip().lstrip("\ufeff").lower() for name in reader.fieldnames or []]
+    missing = [column for column in columns if column not in fieldnames]
+    if missing:
+        raise ValueError(f"Colonne(s) manquante(s) dans l'en-tête CSV : {', '.join(missing)}.")
+    reader.fieldnames = fieldnames
+
+    started = time.monotonic()
+    report = {"rows": 0, "imported": 0, "errors": [], "error_count": 0}
+
+    def add_error(line, message):
+        report["error_count"] += 1
+        if len(report["errors"]) < config.IMPORT_MAX_REPORTED_ERRORS:
+            report["errors"].append((line, message))
+
+    def flush(batch):
+        rows = [row for _, row in batch]
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(sql), rows)
+            report["imported"] += len(batch)
+        except Exception as e:
+            # The whole batch was rolled back: every row of it is reported
+            logger.warning("lot de %d lignes rejeté : %s", len(batch), e)
+            for line, _ in batch:
+                add_error(line, f"Lot rejeté par la base de données : {e.__class__.__name__}")
+            return
+        # On failure the readers fall back to MySQL for the records of the batch
+        try:
+            with engine.connect() as conn:
+                after_batch(conn, rows)
+        except Exception:
+            logger.exception("import : rafraîchissement de Redis après le lot échoué")
+
+    batch = []
+    for row in reader:
+        report["rows"] += 1
+        try:
+            batch.append((reader.line_num, parse_row(row)))
+        except ValueError as e:
+            add_error(reader.line_num, str(e))
+            continue
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    elapsed = time.monotonic() - started
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_sec"] = round(report["rows"] / elapsed, 1) if elapsed > 0 else None
+    return report
@@ -0,0 +1,67 @@
+"""
+Distinct buyers (write-only model): feeds the HyperLogLogs of queries/read_buyers.py
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+from sqlalchemy import text
+import config
+from db import get_redis_conn, get_streaming_engine
+from queries.read_buyers import buyers_day_key, buyers_product_key
+from queries.read_order import sales_bucket_ttl
+
+BACKFILL_PRODUCT_BUYERS_SQL = """
+    SELECT oi.product_id AS product_id, o.user_id AS user_id
+    FROM order_items oi JOIN orders o ON o.id = oi.order_id
+    UNION
+    SELECT oi.product_id, o.user_id
+    FROM order_items_archive oi JOIN orders_archive o ON o.id = oi.order_id
+    ORDER BY product_id
+"""
+
+BACKFILL_DAILY_BUYERS_SQL = """
+    SELECT DISTINCT DATE(created_at) AS day, user_id
+    FROM orders
+    WHERE created_at >= :start
+    ORDER BY day
+"""
+
+def add_distinct_buyers(pipe, day, user_id, items):
+    """Queue the PFADDs of an order in the given pipeline (idempotent, so a replayed event counts once)"""
+    if not user_id:
+        return
+    for product_id in {int(item["product_id"]) for item in items or []}:
+        pipe.pfadd(buyers_product_key(product_id), int(user_id))
+    # Daily buyers are kept as long as the daily sales buckets, the longest report window
+    if (datetime.utcnow().date() - day).days <= config.SALES_BUCKET_RETENTION_DAYS:
+        pipe.pfadd(buyers_day_key(day), int(user_id))
+        pipe.expire(buyers_day_key(day), sales_bucket_ttl(day))
+
+def _add_grouped(pipe, rows, key_of, ttl_of=None, batch_size=1000):
+    """PFADD rows sorted by key, several users per command; return the number of keys"""
+    keys = 0
+    for group, group_rows in groupby(rows, key=itemgetter(0)):
+        users = [int(row[1]) for row in group_rows]
+        for start in range(0, len(users), batch_size):
+            pipe.pfadd(key_of(group), *users[start:start + batch_size])
+        if ttl_of:
+            pipe.expire(key_of(group), ttl_of(group))
+        keys += 1
+        if keys % 100 == 0:
+            pipe.execute()
+    pipe.execute()
+    return keys
+
+def backfill_distinct_buyers():
+    """Populate the HyperLogLogs from the orders in MySQL, return (products, days) counted"""
+    pipe = get_redis_conn().pipeline(transaction=False)
+    start = datetime.combine(datetime.utcnow().date() - timedelta(days=config.SALES_BUCKET_RETENTION_DAYS),
+                             datetime.min.time())
+    with get_streaming_engine().connect() as conn:
+        streaming = conn.execution_options(stream_results=True, yield_per=config.EXPORT_BATCH_SIZE)
+        products = _add_grouped(pipe, streaming.execute(text(BACKFILL_PRODUCT_BUYERS_SQL)), buyers_product_key)
+        days = _add_grouped(pipe, streaming.execute(text(BACKFILL_DAILY_BUYERS_SQL), {"start": start}),
+                            buyers_day_key, sales_bucket_ttl)
+    return products, days
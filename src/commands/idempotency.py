@@ -0,0 +1,97 @@
+"""
+Idempotency keys (first writer wins, stored in Redis)
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+import json
+import logging
+import time
+import uuid
+from redis.exceptions import RedisError
+import config
+from db import get_redis_conn
+
+logger = logging.getLogger(__name__)
+
+PENDING_PREFIX = "pending:"
+
+# Only the caller holding the pending token may complete or release the key
+COMPLETE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return false
+"""
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+def idempotency_key(scope, key):
+    return f"idempotency:{scope}:{key}"
+
+def _release(r, redis_key, token):
+    """Free the key after a failed action, so a retry runs it; the action's own exception is the one raised"""
+    try:
+        r.register_script(RELEASE_SCRIPT)(keys=[redis_key], args=[token])
+    except RedisError as e:
+        logger.warning("Clé d'idempotence %s non libérée (%s), elle expire dans %ss",
+                       redis_key, e, config.IDEMPOTENCY_PENDING_TTL)
+
+def _complete(r, redis_key, token, result, seconds):
+    """Store the result of the action, which is already committed: a Redis failure must not turn it into an error"""
+    try:
+        stored = r.register_script(COMPLETE_SCRIPT)(
+            keys=[redis_key], args=[token, json.dumps(result), config.IDEMPOTENCY_TTL])
+    except RedisError as e:
+        logger.warning("Résultat de %s non enregistré (%s) : une reprise après %ss sera traitée à nouveau",
+                       redis_key, e, config.IDEMPOTENCY_PENDING_TTL)
+        return
+    if not stored:
+        # The pending key expired during the action: a duplicate may have run in the meantime
+        logger.warning("Clé d'idempotence %s expirée après %.1fs, IDEMPOTENCY_PENDING_TTL (%ss) est trop court",
+                       redis_key, seconds, config.IDEMPOTENCY_PENDING_TTL)
+
+def run_once(scope, key, action):
+    """
+    Run action() at most once per idempotency key and return its (JSON serializable) result.
+    Retries of a completed call get the stored result without running action() again;
+    concurrent duplicates wait for the call in flight, or take over if it failed.
+    """
+    r = get_redis_conn()
+    redis_key = idempotency_key(scope, key)
+    deadline = time.monotonic() + config.IDEMPOTENCY_WAIT_TIMEOUT
+
+    while True:
+        token = PENDING_PREFIX + uuid.uuid4().hex
+        try:
+            acquired = r.set(redis_key, token, nx=True, ex=config.IDEMPOTENCY_PENDING_TTL)
+        except RedisError as e:
+            # Without Redis, orders are still accepted rather than blocking every sale
+            logger.warning("Idempotence indisponible (%s), la requête est traitée sans déduplication", e)
+            return action()
+
+        if acquired:
+            started = time.monotonic()
+            try:
+                result = action()
+            except Exception:
+                _release(r, redis_key, token)
+                raise
+            _complete(r, redis_key, token, result, time.monotonic() - started)
+            return result
+
+        try:
+            value = r.get(redis_key)
+        except RedisError as e:
+            # Redis went away while waiting: the next SET NX fails too and the request goes on without deduplication
+            logger.warning("Idempotence indisponible (%s)", e)
+            continue
+        if value is not None and not value.startswith(PENDING_PREFIX):
+            return json.loads(value)
+        if time.monotonic() > deadline:
+            raise ValueError("Une requête identique est déjà en cours de traitement. Veuillez réessayer plus tard.")
+        # Still in flight (or just released after a failure): wait, then try again
+        time.sleep(0.05)
@@ -0,0 +1,72 @@
+"""
+Order archival: moves the cold orders and their items to the archive tables
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+Each batch is copied then deleted in its own short transaction, so the locks cover a few hundred
+orders for a few milliseconds. An interrupted run loses at most its current batch, rolled back,
+and the next run carries on: the orders already moved are no longer in the orders table.
+The report summaries and the Redis counters keep counting the archived orders.
+"""
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, text
+import config
+from db import engine
+
+# Oldest first along idx_orders_created; FOR UPDATE keeps the batch from changing until it is moved
+ARCHIVE_BATCH_SQL = text("""
+    SELECT id FROM orders
+    WHERE created_at < :cutoff
+    ORDER BY created_at, id
+    LIMIT :limit
+    FOR UPDATE
+""")
+
+COPY_ORDERS_SQL = text("""
+    INSERT INTO orders_archive (id, user_id, total_amount, created_at)
+    SELECT id, user_id, total_amount, created_at FROM orders WHERE id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+COPY_ORDER_ITEMS_SQL = text("""
+    INSERT INTO order_items_archive (id, order_id, product_id, quantity, unit_price)
+    SELECT id, order_id, product_id, quantity, unit_price FROM order_items WHERE order_id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+DELETE_ORDER_ITEMS_SQL = text("DELETE FROM order_items WHERE order_id IN :ids").bindparams(
+    bindparam("ids", expanding=True))
+
+DELETE_ORDERS_SQL = text("DELETE FROM orders WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+
+def archive_batch(cutoff, batch_size):
+    """Move the oldest batch of orders created before the cutoff, return (orders, items) moved"""
+    with engine.begin() as conn:
+        order_ids = list(conn.execute(ARCHIVE_BATCH_SQL, {"cutoff": cutoff, "limit": batch_size}).scalars())
+        if not order_ids:
+            return 0, 0
+        conn.execute(COPY_ORDERS_SQL, {"ids": order_ids})
+        items = conn.execute(COPY_ORDER_ITEMS_SQL, {"ids": order_ids}).rowcount
+        conn.execute(DELETE_ORDER_ITEMS_SQL, {"ids": order_ids})
+        conn.execute(DELETE_ORDERS_SQL, {"ids": order_ids})
+    return len(order_ids), items
+
+def archive_cold_orders(days=None, batch_size=None):
+    """Move the orders older than `days` (ORDER_ARCHIVE_AFTER_DAYS by default) to the archive tables,
+    batch by batch; return (orders, items) moved"""
+    days = days or config.ORDER_ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or config.ORDER_ARCHIVE_BATCH_SIZE
+    # The daily sales buckets are rebuilt from the live orders (see reconcile): they must all be there
+    if days <= config.SALES_BUCKET_RETENTION_DAYS:
+        raise ValueError(f"Les commandes doivent rester au moins {config.SALES_BUCKET_RETENTION_DAYS + 1} jours "
+                         f"avant d'être archivées (SALES_BUCKET_RETENTION_DAYS).")
+    cutoff = datetime.utcnow() - timedelta(days=days)
+
+    orders = items = 0
+    while True:
+        moved_orders, moved_items = archive_batch(cutoff, batch_size)
+        orders += moved_orders
+        items += moved_items
+        if moved_orders < batch_size:
+            return orders, items
+        # Lets the replicas apply the batch and the concurrent transactions take their locks
+        time.sleep(config.ORDER_ARCHIVE_PAUSE)
@@ -0,0 +1,107 @@
+"""
+Order projector: drains the order_events outbox into Redis
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+import config
+from models.order_event import OrderEvent
+from commands.write_order import project_order_event
+from db import get_sqlalchemy_session
+from queries.order_projection import get_projection_conn
+
+logger = logging.getLogger(__name__)
+
+def applied_event_key(event_id):
+    return f"outbox:applied:{event_id}"
+
+def project_pending_events(batch_size=None):
+    """Apply the oldest pending events to Redis in one pipeline, return how many were processed"""
+    batch_size = batch_size or config.OUTBOX_BATCH_SIZE
+    session = get_sqlalchemy_session()
+    try:
+        # FOR UPDATE (without SKIP LOCKED) makes concurrent projectors take turns, so events stay in order
+        events = (session.query(OrderEvent)
+                  .filter(OrderEvent.processed_at.is_(None))
+                  .order_by(OrderEvent.id)
+                  .limit(batch_size)
+                  .with_for_update()
+                  .all())
+        if not events:
+            session.commit()
+            return 0
+
+        r = get_projection_conn()
+        pipe = r.pipeline(transaction=False)
+        for event in events:
+            pipe.exists(applied_event_key(event.id))
+        already_applied = pipe.execute()
+
+        # Events and their markers are applied atomically: after a crash before the MySQL commit,
+        # the retry skips the events Redis already has instead of counting them twice.
+        # With several Redis nodes only the first one (markers and counters) is atomic: the order
+        # details written to the other nodes are simply written again by the retry
+        pipe = r.pipeline()
+        for event, applied in zip(events, already_applied):
+            if not applied:
+                project_order_event(pipe, event.event_type, event.order_id, event.payload)
+                pipe.set(applied_event_key(event.id), 1, ex=config.OUTBOX_APPLIED_TTL)
+        pipe.execute()
+
+        processed_at = datetime.utcnow()
+        for event in events:
+            event.processed_at = processed_at
+        session.commit()
+        return len(events)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def purge_processed_events(batch_size=None):
+    """Delete processed events older than the retention period"""
+    batch_size = batch_size or config.OUTBOX_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(hours=config.OUTBOX_RETENTION_HOURS)
+    session = get_sqlalchemy_session()
+    try:
+        result = session.execute(text("""
+            DELETE FROM order_events
+            WHERE processed_at < :cutoff
+            ORDER BY processed_at
+            LIMIT :limit
+        """), {"cutoff": cutoff, "limit": batch_size})
+        session.commit()
+        return result.rowcount
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def _run_projector():
+    failures = 0
+    while True:
+        try:
+            processed = project_pending_events()
+            failures = 0
+            if processed < config.OUTBOX_BATCH_SIZE:
+                purge_processed_events()
+                time.sleep(config.OUTBOX_POLL_INTERVAL)
+        except Exception:
+            # Redis or MySQL unavailable: the events stay pending and are retried with a growing delay
+            failures += 1
+            logger.exception("order_projector")
+            time.sleep(min(config.OUTBOX_POLL_INTERVAL * 2 ** failures, 30))
+
+def start_order_projector():
+    """Start the background thread that projects order events into Redis"""
+    thread = threading.Thread(target=_run_projector, name="order-projector", daemon=True)
+    thread.start()
+    return thread
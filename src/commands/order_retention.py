@@ -0,0 +1,63 @@
+"""
+Order retention: keeps only the hot window of orders in the Redis projection
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+Only the order details and their index entry are evicted: the sales counters and the spend
+leaderboard keep counting evicted orders, and get_order_by_id reads them through from MySQL.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+import config
+from queries.order_projection import ORDER_INDEX_KEY, get_projection_conn, remove_order_projection, to_timestamp
+
+logger = logging.getLogger(__name__)
+
+def _evict(r, order_ids):
+    pipe = r.pipeline(transaction=False)
+    for order_id in order_ids:
+        remove_order_projection(pipe, order_id)
+    pipe.execute()
+    return len(order_ids)
+
+def evict_cold_orders(batch_size=None):
+    """Remove from Redis the orders older than ORDER_RETENTION_DAYS or beyond the ORDER_RETENTION_MAX_ORDERS
+    most recent ones, in batches; return how many were evicted"""
+    batch_size = batch_size or config.ORDER_RETENTION_BATCH_SIZE
+    r = get_projection_conn()
+    evicted = 0
+
+    if config.ORDER_RETENTION_DAYS > 0:
+        cutoff = to_timestamp(datetime.utcnow() - timedelta(days=config.ORDER_RETENTION_DAYS))
+        while True:
+            order_ids = r.zrangebyscore(ORDER_INDEX_KEY, "-inf", f"({cutoff}", start=0, num=batch_size)
+            if not order_ids:
+                break
+            evicted += _evict(r, order_ids)
+
+    if config.ORDER_RETENTION_MAX_ORDERS > 0:
+        while True:
+            excess = r.zcard(ORDER_INDEX_KEY) - config.ORDER_RETENTION_MAX_ORDERS
+            if excess <= 0:
+                break
+            evicted += _evict(r, r.zrange(ORDER_INDEX_KEY, 0, min(excess, batch_size) - 1))
+
+    return evicted
+
+def _run_retention():
+    while True:
+        time.sleep(config.ORDER_RETENTION_INTERVAL)
+        try:
+            evict_cold_orders()
+        except Exception:
+            logger.exception("order_retention")
+
+def start_order_retention():
+    """Start the background thread that evicts cold orders from Redis, if a retention is configured"""
+    if config.ORDER_RETENTION_DAYS <= 0 and config.ORDER_RETENTION_MAX_ORDERS <= 0:
+        return None
+    thread = threading.Thread(target=_run_retention, name="order-retention", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,44 @@
+"""
+Rebalancing of the order details between the Redis nodes
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+After a node is added to (or removed from) REDIS_NODES, the keys whose owner changed on the
+ring are still on their former node: reads miss them and fall back to MySQL until they are moved.
+The move runs online. What the owner already holds was written after the ring change and wins
+over the copy being moved: hash fields and strings are only copied where they are missing.
+"""
+from queries.order_projection import get_projection_conn, order_detail_patterns
+
+def _copy_missing(client, owner, key):
+    """Copy a key to its owner without overwriting what the owner has, return False if it vanished meanwhile"""
+    kind = client.type(key)
+    if kind == b"hash":
+        fields = client.hgetall(key)
+        pipe = owner.pipeline(transaction=False)
+        for field, value in fields.items():
+            pipe.hsetnx(key, field, value)
+        pipe.execute()
+    elif kind == b"string":
+        value = client.get(key)
+        if value is None:
+            return False
+        owner.set(key, value, nx=True)
+    else:
+        return False
+    return True
+
+def rebalance_order_shards():
+    """Move the order details held by a node that no longer owns them to their owner, return how many keys moved"""
+    r = get_projection_conn(decode_responses=False)
+    moved = 0
+    for node, client in enumerate(r.clients):
+        for pattern in order_detail_patterns():
+            for key in client.scan_iter(match=pattern, count=1000):
+                owner = r.node_of(key.decode())
+                if owner == node:
+                    continue
+                if _copy_missing(client, r.clients[owner], key):
+                    moved += 1
+                client.delete(key)
+    return moved
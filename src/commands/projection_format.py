@@ -0,0 +1,51 @@
+"""
+Conversion of the orders projection from one storage format to the other
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+Changing ORDER_PROJECTION_FORMAT does not touch the orders already in Redis: the readers and the
+projector only see the new format's keys. This conversion rewrites the indexed orders in the new
+format, then deletes the keys of the former one. It runs with the server stopped: an order deleted
+by the projector during the conversion could otherwise be written back.
+"""
+from datetime import datetime
+import config
+from queries.order_projection import (HASH_FORMAT, PACKED_FORMAT, ORDER_INDEX_KEY, get_projection_conn,
+                                      order_detail_patterns, read_order_projections, write_order_projection)
+
+def _convert_orders(order_ids, source_fmt, target_fmt):
+    """Write the given orders, read in the source format, in the target format; return how many were found"""
+    pipe = get_projection_conn().pipeline(transaction=False)
+    converted = 0
+    for order_id, order in zip(order_ids, read_order_projections(order_ids, with_items=True, fmt=source_fmt)):
+        # Missing details are left to the reconciliation, which rebuilds them from MySQL
+        if order is None:
+            continue
+        write_order_projection(pipe, order_id, order["user_id"] or None, order["total"] or None, order["items"],
+                               datetime.fromisoformat(order["created_at"]), fmt=target_fmt)
+        converted += 1
+    pipe.execute()
+    return converted
+
+def _delete_format_keys(fmt, batch_size):
+    """Delete the order details kept in a format on every node, return how many keys were deleted"""
+    deleted = 0
+    for client in get_projection_conn(decode_responses=False).clients:
+        for pattern in order_detail_patterns(fmt):
+            keys = list(client.scan_iter(match=pattern, count=batch_size))
+            for start in range(0, len(keys), batch_size):
+                deleted += client.unlink(*keys[start:start + batch_size])
+    return deleted
+
+def convert_order_projection(source_fmt, batch_size=None):
+    """Move the projected orders from source_fmt to ORDER_PROJECTION_FORMAT, return (orders converted, keys deleted)"""
+    target_fmt = config.ORDER_PROJECTION_FORMAT
+    if source_fmt not in (HASH_FORMAT, PACKED_FORMAT) or source_fmt == target_fmt:
+        raise ValueError(f"Le format source doit être l'autre format que ORDER_PROJECTION_FORMAT ({target_fmt}).")
+    batch_size = batch_size or config.RECONCILE_CHUNK_SIZE
+
+    order_ids = [int(order_id) for order_id in get_projection_conn().zrange(ORDER_INDEX_KEY, 0, -1)]
+    converted = 0
+    for start in range(0, len(order_ids), batch_size):
+        converted += _convert_orders(order_ids[start:start + batch_size], source_fmt, target_fmt)
+    return converted, _delete_format_keys(source_fmt, batch_size)
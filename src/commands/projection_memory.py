@@ -0,0 +1,77 @@
+"""
+Memory report of the orders projection formats
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import text
+import config
+from db import engine, get_redis_conn
+from queries.order_projection import (HASH_FORMAT, PACKED_FORMAT, ORDER_INDEX_KEY, packed_location,
+                                      write_order_projection)
+
+def _load_sample_orders(sample_size):
+    """Get the most recent orders with their items from MySQL"""
+    with engine.connect() as conn:
+        orders = conn.execute(text("""
+            SELECT id, user_id, total_amount, created_at FROM orders ORDER BY id DESC LIMIT :limit
+        """), {"limit": sample_size}).mappings().all()
+        items = defaultdict(list)
+        if orders:
+            rows = conn.execute(text("""
+                SELECT order_id, product_id, quantity, unit_price FROM order_items
+                WHERE order_id BETWEEN :first AND :last
+            """), {"first": orders[-1]["id"], "last": orders[0]["id"]}).mappings()
+            # Built as the projector writes them: unit_price is a Decimal in MySQL, not JSON serializable
+            for row in rows:
+                items[row["order_id"]].append({"product_id": int(row["product_id"]), "quantity": int(row["quantity"]),
+                                               "unit_price": float(row["unit_price"])})
+    return orders, items
+
+def _projection_keys(order_ids, fmt):
+    """Get every key the given orders occupy in a format"""
+    if fmt == PACKED_FORMAT:
+        buckets = {packed_location(order_id)[0] for order_id in order_ids}
+        return [f"o:{bucket}" for bucket in buckets] + [f"oi:{bucket}" for bucket in buckets] + [ORDER_INDEX_KEY]
+    return [f"order:{order_id}" for order_id in order_ids] + [f"order:{order_id}:items" for order_id in order_ids] + [ORDER_INDEX_KEY]
+
+def measure_projection_memory(sample_size=1000):
+    """Write a sample of orders in each format to the scratch Redis DB and measure their MEMORY USAGE"""
+    if config.REDIS_SCRATCH_DB == config.REDIS_DB:
+        raise ValueError("REDIS_SCRATCH_DB doit être différente de REDIS_DB: ses clés sont supprimées après la mesure.")
+
+    orders, items = _load_sample_orders(sample_size)
+    if not orders:
+        return {}
+
+    scratch = get_redis_conn(decode_responses=False, db=config.REDIS_SCRATCH_DB)
+    order_ids = [order["id"] for order in orders]
+    report = {}
+    for fmt in (HASH_FORMAT, PACKED_FORMAT):
+        pipe = scratch.pipeline(transaction=False)
+        for order in orders:
+            write_order_projection(pipe, order["id"], order["user_id"], order["total_amount"],
+                                   items[order["id"]], order["created_at"] or datetime.utcnow(), fmt=fmt)
+        pipe.execute()
+
+        keys = [key for key in _projection_keys(order_ids, fmt) if scratch.exists(key)]
+        pipe = scratch.pipeline(transaction=False)
+        for key in keys:
+            pipe.memory_usage(key, samples=0)
+            pipe.object("encoding", key)
+        replies = pipe.execute()
+        total_bytes = sum(usage or 0 for usage in replies[0::2])
+        encodings = defaultdict(int)
+        for encoding in replies[1::2]:
+            encodings[encoding.decode() if isinstance(encoding, bytes) else encoding] += 1
+        scratch.delete(*keys)
+
+        report[fmt] = {
+            "orders": len(orders),
+            "keys": len(keys),
+            "bytes": total_bytes,
+            "bytes_per_order": total_bytes / len(orders),
+            "encodings": dict(encodings),
+        }
+    return report
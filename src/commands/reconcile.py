@@ -0,0 +1,412 @@
+"""
+Reconciliation of the Redis projection against MySQL
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+MySQL is the source of truth. Orders are compared by ID range: MySQL and each Redis node compute a
+digest of the range on their side (a sum of SHA1 prefixes over its orders and their items), and only
+a range whose digests differ is read and compared order by order. Then the Redis orders unknown to
+MySQL are removed, and the counters are rewritten from MySQL where they differ.
+
+Repairs run online: each one WATCHes the keys it rewrites, and leaves out the orders (or the counter
+members) that an event still waiting in the outbox will change, so it never overwrites a change made
+by the projector meanwhile. Orders outside the retention window (see order_retention) are not
+expected in Redis.
+"""
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, text
+from redis.exceptions import WatchError
+import config
+from db import engine, get_redis_conn
+from queries.order_projection import (ORDER_INDEX_KEY, PACKED_FORMAT, get_projection_conn, order_detail_keys,
+                                      packed_location, read_order_projections, remove_order_projection,
+                                      write_order_projection)
+from queries.read_order import SPEND_LEADERBOARD_KEY, sales_bucket_key, sales_bucket_ttl
+
+ORDERS_RANGE_SQL = text("""
+    SELECT id, user_id, total_amount, created_at FROM orders
+    WHERE id >= :first AND id < :last
+    ORDER BY id
+""")
+
+RANGE_IDS_SQL = """
+    SELECT o.id FROM orders o WHERE o.id >= :first AND o.id < :last {window}
+"""
+
+# One entry per order and per item, each hashed to 32 bits; the sum (not a XOR, under which two
+# identical items would cancel out) is compared with RANGE_DIGEST_SCRIPT's
+RANGE_DIGEST_SQL = """
+    SELECT COUNT(*) AS entries, COALESCE(SUM(CAST(CONV(LEFT(SHA1(entry), 8), 16, 10) AS UNSIGNED)), 0) AS digest
+    FROM (
+        SELECT CONCAT('o:', o.id, ':', COALESCE(o.user_id, 0), ':', ROUND(COALESCE(o.total_amount, 0) * 100)) AS entry
+        FROM orders o
+        WHERE o.id >= :first AND o.id < :last {window}
+        UNION ALL
+        SELECT CONCAT('i:', o.id, ':', oi.product_id, ':', oi.quantity, ':', ROUND(oi.unit_price * 100))
+        FROM orders o JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.id >= :first AND o.id < :last {window}
+    ) entries
+"""
+
+# Same entries as RANGE_DIGEST_SQL, read from the details of the orders given as
+# KEYS = (record key, items key) and ARGV = (format, then ID and field) per order
+RANGE_DIGEST_SCRIPT = """
+local function cents(value)
+    return math.floor((tonumber(value or 0) or 0) * 100 + 0.5)
+end
+local entries, digest = 0, 0
+local function add(entry)
+    entries = entries + 1
+    digest = (digest + tonumber(string.sub(redis.sha1hex(entry), 1, 8), 16)) % 4294967296
+end
+for i = 1, #KEYS / 2 do
+    local id, field = ARGV[2 * i], ARGV[2 * i + 1]
+    local user_id, total, items = nil, nil, {}
+    if ARGV[1] == 'packed' then
+        local record = redis.call('HGET', KEYS[2 * i - 1], field)
+        if record then
+            user_id, total = struct.unpack('<IdI', record)
+            local packed = redis.call('HGET', KEYS[2 * i], field) or ''
+            for pos = 1, #packed - 15, 16 do
+                local product_id, quantity, unit_price = struct.unpack('<IId', packed, pos)
+                items[#items + 1] = {product_id, quantity, unit_price}
+            end
+        end
+    else
+        local order = redis.call('HMGET', KEYS[2 * i - 1], 'user_id', 'total')
+        if order[1] then
+            user_id, total = tonumber(order[1]) or 0, order[2]
+            local encoded = redis.call('GET', KEYS[2 * i])
+            if encoded then
+                for _, item in ipairs(cjson.decode(encoded)) do
+                    items[#items + 1] = {item.product_id, item.quantity, item.unit_price}
+                end
+            end
+        end
+    end
+    if user_id then
+        add(string.format('o:%s:%d:%d', id, user_id, cents(total)))
+        for _, item in ipairs(items) do
+            add(string.format('i:%s:%d:%d:%d', id, item[1], item[2], cents(item[3])))
+        end
+    end
+end
+return {entries, digest}
+"""
+
+ORDER_ITEMS_SQL = text("""
+    SELECT order_id, product_id, quantity, unit_price FROM order_items WHERE order_id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+ORDERS_BY_IDS_SQL = text("""
+    SELECT id, user_id, total_amount, created_at FROM orders WHERE id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+# Archived orders still exist: the ones Redis may hold are not orphans
+EXISTING_ORDERS_SQL = text("""
+    SELECT id FROM orders WHERE id IN :ids
+    UNION ALL
+    SELECT id FROM orders_archive WHERE id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+PENDING_ORDER_EVENTS_SQL = text("""
+    SELECT DISTINCT order_id FROM order_events WHERE processed_at IS NULL AND order_id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+PENDING_PAYLOADS_SQL = text("SELECT payload FROM order_events WHERE processed_at IS NULL")
+
+def _buyer(payload):
+    return {str(payload["user_id"])}
+
+def _products(payload):
+    return {str(item["product_id"]) for item in payload["items"]}
+
+# {counter key: (Redis type, SQL giving (member, value) rows, members an order event changes)}
+ALL_TIME_COUNTERS = {
+    "product:sold_qty": ("hash", "SELECT product_id, units_sold FROM product_sales_summary WHERE units_sold > 0",
+                         _products),
+    SPEND_LEADERBOARD_KEY: ("zset", "SELECT user_id, total_spent FROM user_spend_summary WHERE total_spent > 0",
+                            _buyer),
+}
+
+DAILY_SPEND_SQL = """
+    SELECT user_id, SUM(total_amount) FROM orders
+    WHERE created_at >= :day AND created_at < :next_day
+    GROUP BY user_id
+"""
+
+DAILY_UNITS_SQL = """
+    SELECT oi.product_id, SUM(oi.quantity) FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    WHERE o.created_at >= :day AND o.created_at < :next_day
+    GROUP BY oi.product_id
+"""
+
+def _new_report():
+    return {
+        "ranges": 0,
+        "ranges_matching": 0,
+        "missing": 0,
+        "stale": 0,
+        "orphaned": 0,
+        "counters_drifted": [],
+        "repaired": 0,
+        # Repairs given up because the projector changed (or is about to change) the same keys: retried on the next run
+        "busy": 0,
+    }
+
+def _cents(amount):
+    return round(float(amount or 0) * 100)
+
+def _record(user_id, total, items):
+    """Comparable form of an order and its items on both sides"""
+    return int(user_id or 0), _cents(total), sorted(
+        (int(item["product_id"]), int(item["quantity"]), _cents(item.get("unit_price"))) for item in items)
+
+def _range_query(conn, sql, first, last, window_start):
+    window = "" if window_start is None else "AND o.created_at >= :window_start"
+    return conn.execute(text(sql.format(window=window)), {"first": first, "last": last, "window_start": window_start})
+
+def _mysql_digest(conn, first, last, window_start):
+    """Get (entries, digest) of the orders of [first, last) in the window, computed by MySQL"""
+    row = _range_query(conn, RANGE_DIGEST_SQL, first, last, window_start).one()
+    return int(row.entries), int(row.digest) % 2 ** 32
+
+def _redis_digest(r, order_ids):
+    """Get (entries, digest) of the given orders as projected, each node digesting the ones it holds"""
+    fmt = config.ORDER_PROJECTION_FORMAT
+    by_node = {}
+    for order_id in order_ids:
+        keys = order_detail_keys(order_id)
+        field = packed_location(order_id)[1] if fmt == PACKED_FORMAT else ""
+        node_keys, node_args = by_node.setdefault(r.node_of(keys[0]), ([], [fmt]))
+        node_keys.extend(keys)
+        node_args.extend((order_id, field))
+    entries, digest = 0, 0
+    for node, (keys, args) in by_node.items():
+        node_entries, node_digest = r.clients[node].eval(RANGE_DIGEST_SCRIPT, len(keys), *keys, *args)
+        entries += int(node_entries)
+        digest += int(node_digest)
+    return entries, digest % 2 ** 32
+
+def _hot_window_start(conn):
+    """Get the creation time of the oldest order Redis is expected to hold, None if it holds them all"""
+    starts = []
+    if config.ORDER_RETENTION_DAYS > 0:
+        starts.append(datetime.utcnow() - timedelta(days=config.ORDER_RETENTION_DAYS))
+    if config.ORDER_RETENTION_MAX_ORDERS > 0:
+        oldest_kept = conn.execute(text("SELECT created_at FROM orders ORDER BY created_at DESC LIMIT 1 OFFSET :offset"),
+                                   {"offset": config.ORDER_RETENTION_MAX_ORDERS - 1}).scalar()
+        if oldest_kept:
+            starts.append(oldest_kept)
+    return max(starts) if starts else None
+
+def _pending_orders(conn, order_ids):
+    """Get which of the given orders have an event still waiting in the outbox"""
+    return {row.order_id for row in conn.execute(PENDING_ORDER_EVENTS_SQL, {"ids": list(order_ids)})}
+
+def _pending_payloads(conn):
+    payloads = []
+    for (payload,) in conn.execute(PENDING_PAYLOADS_SQL):
+        payloads.append(json.loads(payload) if isinstance(payload, (str, bytes)) else payload)
+    return payloads
+
+def _repair_orders(report, order_ids):
+    """Rewrite the given orders in Redis from MySQL"""
+    with engine.connect() as conn, get_projection_conn().pipeline() as pipe:
+        try:
+            pipe.watch(*{key for order_id in order_ids for key in order_detail_keys(order_id)})
+            # The projector will rewrite these orders itself
+            pending = _pending_orders(conn, order_ids)
+            report["busy"] += len(pending)
+            order_ids = [order_id for order_id in order_ids if order_id not in pending]
+            if not order_ids:
+                return
+            orders = conn.execute(ORDERS_BY_IDS_SQL, {"ids": order_ids}).all()
+            items = {order.id: [] for order in orders}
+            for row in conn.execute(ORDER_ITEMS_SQL, {"ids": order_ids}):
+                items[row.order_id].append({"product_id": row.product_id, "quantity": int(row.quantity),
+                                            "unit_price": float(row.unit_price)})
+            pipe.multi()
+            for order in orders:
+                # Removed first, so that items no longer in MySQL do not stay behind
+                remove_order_projection(pipe, order.id)
+                write_order_projection(pipe, order.id, order.user_id, order.total_amount, items[order.id],
+                                       order.created_at or datetime.utcnow())
+            pipe.execute()
+            report["repaired"] += len(orders)
+        except WatchError:
+            report["busy"] += len(order_ids)
+
+def _compare_range(conn, first, last, window_start):
+    """Read the orders of a range on both sides, return (expected, actual) records by order ID"""
+    rows = conn.execute(ORDERS_RANGE_SQL, {"first": first, "last": last}).all()
+    rows = [row for row in rows if window_start is None or (row.created_at and row.created_at >= window_start)]
+    items = {row.id: [] for row in rows}
+    if items:
+        for item in conn.execute(ORDER_ITEMS_SQL, {"ids": list(items)}):
+            items[item.order_id].append({"product_id": item.product_id, "quantity": item.quantity,
+                                         "unit_price": item.unit_price})
+    expected = {row.id: _record(row.user_id, row.total_amount, items[row.id]) for row in rows}
+    projected = read_order_projections(list(expected), with_items=True)
+    actual = {order_id: _record(order["user_id"], order["total"], order["items"])
+              for order_id, order in zip(expected, projected) if order}
+    return expected, actual
+
+def reconcile_orders(report, chunk_size, repair):
+    """Compare the orders of MySQL and Redis by ID range, repair the missing and stale ones"""
+    with engine.connect() as conn:
+        first_id, last_id = conn.execute(text("SELECT MIN(id), MAX(id) FROM orders")).one()
+        window_start = _hot_window_start(conn)
+    if first_id is None:
+        return
+
+    r = get_projection_conn(decode_responses=False)
+    for first in range(first_id, last_id + 1, chunk_size):
+        last = first + chunk_size
+        report["ranges"] += 1
+        with engine.connect() as conn:
+            # Only the IDs are read to ask Redis for the same orders: the ones it holds beyond them
+            # are orphans, counted by remove_orphans
+            order_ids = _range_query(conn, RANGE_IDS_SQL, first, last, window_start).scalars().all()
+            if _mysql_digest(conn, first, last, window_start) == _redis_digest(r, order_ids):
+                report["ranges_matching"] += 1
+                continue
+            expected, actual = _compare_range(conn, first, last, window_start)
+
+        missing = [order_id for order_id in expected if order_id not in actual]
+        stale = [order_id for order_id in expected if order_id in actual and actual[order_id] != expected[order_id]]
+        report["missing"] += len(missing)
+        report["stale"] += len(stale)
+        if repair and (missing or stale):
+            _repair_orders(report, missing + stale)
+
+def _scan_projected_ids(r):
+    """Yield batches of the order IDs Redis holds, from the index and from the detail keys"""
+    batch = set()
+    for member, _ in r.zscan_iter(ORDER_INDEX_KEY, count=1000):
+        batch.add(int(member))
+        if len(batch) >= 1000:
+            yield batch
+            batch = set()
+    for client in r.clients:
+        if config.ORDER_PROJECTION_FORMAT == PACKED_FORMAT:
+            for key in client.scan_iter(match="o:*", count=1000):
+                bucket = int(key.split(":")[1])
+                batch.update(bucket * config.ORDER_BUCKET_SIZE + int(field) for field in client.hkeys(key))
+                if len(batch) >= 1000:
+                    yield batch
+                    batch = set()
+        else:
+            for key in client.scan_iter(match="order:*", count=1000):
+                parts = key.split(":")
+                if parts[1].isdigit():
+                    batch.add(int(parts[1]))
+                if len(batch) >= 1000:
+                    yield batch
+                    batch = set()
+    if batch:
+        yield batch
+
+def remove_orphans(report, repair):
+    """Remove from Redis the orders that no longer exist in MySQL"""
+    r = get_projection_conn()
+    seen = set()
+    for batch in _scan_projected_ids(r):
+        batch -= seen
+        seen |= batch
+        if not batch:
+            continue
+        with engine.connect() as conn:
+            existing = {row.id for row in conn.execute(EXISTING_ORDERS_SQL, {"ids": list(batch)})}
+        orphans = sorted(batch - existing)
+        report["orphaned"] += len(orphans)
+        if not repair or not orphans:
+            continue
+        with engine.connect() as conn, r.pipeline() as pipe:
+            try:
+                pipe.watch(*{key for order_id in orphans for key in order_detail_keys(order_id)})
+                # An order inserted meanwhile is not an orphan anymore, one being deleted is left to the projector
+                still_missing = set(orphans) - {row.id for row in conn.execute(EXISTING_ORDERS_SQL, {"ids": orphans})}
+                pending = _pending_orders(conn, still_missing) if still_missing else set()
+                report["busy"] += len(pending)
+                still_missing -= pending
+                pipe.multi()
+                for order_id in still_missing:
+                    remove_order_projection(pipe, order_id)
+                pipe.execute()
+                report["repaired"] += len(still_missing)
+            except WatchError:
+                report["busy"] += len(orphans)
+
+def _reconcile_counter(report, key, kind, sql, params, repair, pending_members, ttl=None):
+    """Compare a counter with its MySQL aggregate and rewrite the members that differ, except the
+    pending_members an event waiting in the outbox will change"""
+    with engine.connect() as conn, get_redis_conn().pipeline() as pipe:
+        try:
+            # WATCH before reading MySQL: a projection applied after the read makes the rewrite fail
+            pipe.watch(key)
+            actual = pipe.hgetall(key) if kind == "hash" else dict(pipe.zrange(key, 0, -1, withscores=True))
+            actual = {str(member): round(float(value), 2) for member, value in actual.items() if float(value) > 0}
+            expected = {str(member): round(float(value), 2) for member, value in conn.execute(text(sql), params)
+                        if value and float(value) > 0}
+            if actual == expected:
+                return
+            report["counters_drifted"].append(key)
+            if not repair:
+                return
+            drifted = {member for member in actual.keys() | expected.keys() if actual.get(member) != expected.get(member)}
+            busy = drifted & pending_members
+            report["busy"] += len(busy)
+            drifted -= busy
+            if not drifted:
+                return
+            removed = [member for member in drifted if member not in expected]
+            updated = {member: expected[member] for member in drifted if member in expected}
+            pipe.multi()
+            if kind == "hash":
+                if removed:
+                    pipe.hdel(key, *removed)
+                if updated:
+                    pipe.hset(key, mapping={member: int(value) for member, value in updated.items()})
+            else:
+                if removed:
+                    pipe.zrem(key, *removed)
+                if updated:
+                    pipe.zadd(key, updated)
+            if updated and ttl:
+                pipe.expire(key, ttl)
+            pipe.execute()
+            report["repaired"] += len(drifted)
+        except WatchError:
+            report["busy"] += 1
+
+def reconcile_counters(report, repair):
+    """Compare the all-time counters and the daily sales buckets with MySQL"""
+    with engine.connect() as conn:
+        pending = _pending_payloads(conn)
+
+    for key, (kind, sql, members_of) in ALL_TIME_COUNTERS.items():
+        pending_members = {member for payload in pending for member in members_of(payload)}
+        _reconcile_counter(report, key, kind, sql, {}, repair, pending_members)
+
+    today = datetime.utcnow().date()
+    for offset in range(config.SALES_BUCKET_RETENTION_DAYS + 1):
+        day = today - timedelta(days=offset)
+        params = {"day": day, "next_day": day + timedelta(days=1)}
+        day_pending = [payload for payload in pending if datetime.fromisoformat(payload["created_at"]).date() == day]
+        _reconcile_counter(report, sales_bucket_key("spend", day), "zset", DAILY_SPEND_SQL, params, repair,
+                           {member for payload in day_pending for member in _buyer(payload)},
+                           ttl=sales_bucket_ttl(day))
+        _reconcile_counter(report, sales_bucket_key("units", day), "zset", DAILY_UNITS_SQL, params, repair,
+                           {member for payload in day_pending for member in _products(payload)},
+                           ttl=sales_bucket_ttl(day))
+
+def reconcile(chunk_size=None, repair=True):
+    """Diff the whole Redis projection against MySQL, repair the drift unless repair=False, return a drift report"""
+    report = _new_report()
+    reconcile_orders(report, chunk_size or config.RECONCILE_CHUNK_SIZE, repair)
+    remove_orphans(report, repair)
+    reconcile_counters(report, repair)
+    return report
@@ -0,0 +1,64 @@
+"""
+Prefix search index (write-only model), read by queries/search.py
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+from db import get_redis_conn
+from queries.search import search_key, search_members, search_terms_key
+
+def product_search_texts(product):
+    return product.name, product.sku
+
+def user_search_texts(user):
+    return user.name, user.email
+
+def index_search_entries(kind, records):
+    """Index new or changed records given as (ID, texts), replacing the members they had,
+    with one read and one pipeline for all of them"""
+    if not records:
+        return
+    r = get_redis_conn()
+    previous = r.hmget(search_terms_key(kind), [record_id for record_id, _ in records])
+    pipe = r.pipeline()
+    for (record_id, texts), old_members in zip(records, previous):
+        members = search_members(record_id, texts)
+        if old_members:
+            pipe.zrem(search_key(kind), *old_members.split("\n"))
+        pipe.zadd(search_key(kind), dict.fromkeys(members, 0))
+        pipe.hset(search_terms_key(kind), record_id, "\n".join(members))
+    pipe.execute()
+
+def remove_search_entry(kind, record_id):
+    r = get_redis_conn()
+    previous = r.hget(search_terms_key(kind), record_id)
+    pipe = r.pipeline()
+    if previous:
+        pipe.zrem(search_key(kind), *previous.split("\n"))
+    pipe.hdel(search_terms_key(kind), record_id)
+    pipe.execute()
+
+class SearchIndexBuilder:
+    """Builds a whole index beside the live one and swaps it in at the end, so searches never see a partial index"""
+    def __init__(self, pipe, kind):
+        self.pipe = pipe
+        self.kind = kind
+        self.key = f"{search_key(kind)}:building"
+        self.terms_key = f"{search_terms_key(kind)}:building"
+        self.count = 0
+        pipe.delete(self.key, self.terms_key)
+
+    def add(self, record_id, texts):
+        """Queue the members of a record in the pipeline"""
+        members = search_members(record_id, texts)
+        if members:
+            self.pipe.zadd(self.key, dict.fromkeys(members, 0))
+            self.pipe.hset(self.terms_key, record_id, "\n".join(members))
+            self.count += 1
+
+    def finish(self):
+        """Queue the swap of the new index with the live one"""
+        if self.count:
+            self.pipe.rename(self.key, search_key(self.kind))
+            self.pipe.rename(self.terms_key, search_terms_key(self.kind))
+        else:
+            self.pipe.delete(search_key(self.kind), search_terms_key(self.kind))
@@ -3,20 +3,62 @@ Orders (write-only model)
 SPDX - License - Identifier: LGPL - 3.0 - or -later
 Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
 """
-import json
-from datetime import datetime
+import logging
+from datetime import datetime, timedelta
 
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
+import config
 from models.product import Product
 from models.order_item import OrderItem
 from models.order import Order
-from queries.read_order import get_orders_from_mysql
-from db import get_sqlalchemy_session, get_redis_conn, engine
+from models.order_event import OrderEvent
+from queries.read_order import get_orders_from_mysql, sales_bucket_key, sales_bucket_ttl, SPEND_LEADERBOARD_KEY
+from queries.order_projection import (ORDER_INDEX_KEY, ORDER_SYNC_MARKER_KEY, write_order_projection,
+                                      remove_order_projection, read_order_projections, get_projection_conn)
+from commands.write_report import update_report_summaries
+from commands.idempotency import run_once
+from commands.write_stock import reserve_stock, release_stock
+from commands.distinct_buyers import add_distinct_buyers
+from commands.reconcile import DAILY_SPEND_SQL, DAILY_UNITS_SQL
+from db import get_sqlalchemy_session, engine
+
+logger = logging.getLogger(__name__)
+
+# {window}: the retention of the projection (see _sync_window), Redis only gets the orders it would keep
+SYNC_ORDERS_SQL = """
+    SELECT
+        o.id,
+        o.user_id,
+        o.created_at,
+        COALESCE(o.total_amount, SUM(oi.quantity * oi.unit_price)) AS total
+    FROM orders o
+    LEFT JOIN order_items oi ON oi.order_id = o.id
+    {where}
+    GROUP BY o.id, o.user_id, o.created_at, o.total_amount
+    {limit}
+"""
+
+# The projection may hold only the recent orders, but the leaderboard is all-time (archive included)
+SYNC_ITEMS_SQL = text("""
+    SELECT order_id, product_id, quantity, unit_price FROM order_items WHERE order_id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+SYNC_SPEND_SQL = "SELECT user_id, total_spent FROM user_spend_summary WHERE total_spent > 0"
+SYNC_SOLD_QTY_SQL = "SELECT product_id, units_sold FROM product_sales_summary WHERE units_sold > 0"
+
+ORDER_CREATED = "OrderCreated"
+ORDER_DELETED = "OrderDeleted"
 
+def add_order(user_id: int, items: list, idempotency_key: str = None):
+    """Insert order with items in MySQL, Redis is kept in sync through the outbox.
+    Calls repeated with the same idempotency key return the ID of the first order."""
+    if idempotency_key:
+        return run_once("order", idempotency_key, lambda: _insert_order(user_id, items))
+    return _insert_order(user_id, items)
 
-def add_order(user_id: int, items: list):
-    """Insert order with items in MySQL, keep Redis in sync"""
+
+def _insert_order(user_id: int, items: list):
     if not user_id or not items:
         raise ValueError("Vous devez indiquer au moins 1 utilisateur et 1 item pour chaque commande.")
 
@@ -26,6 +68,7 @@ def add_order(user_id: int, items: list):
         raise ValueError("L'ID Article n'est pas valide dans la liste des items.")
 
     session = get_sqlalchemy_session()
+    reserved_items = None
 
     try:
         products_query = session.query(Product).filter(Product.id.in_(product_ids)).all()
@@ -36,10 +79,11 @@ def add_order(user_id: int, items: list):
 
         for item in items:
             pid = int(item["product_id"])
+            # order_items.quantity and the summaries count whole units
             try:
-                qty = float(item["quantity"])
+                qty = int(item["quantity"])
             except Exception:
-                raise ValueError("La quantité doit être un nombre.")
+                raise ValueError("La quantité doit être un nombre entier.")
 
             if qty <= 0:
                 raise ValueError("Vous devez indiquer une quantité superieure à zéro.")
@@ -55,7 +99,12 @@ def add_order(user_id: int, items: list):
                 "unit_price": unit_price,
             })
 
-        new_order = Order(user_id=user_id, total_amount=total_amount)
+        # Stock is taken in Redis before the transaction, so hot products are never locked in MySQL
+        reserved = reserve_stock(order_items_data)
+        reserved_items = [item for item in order_items_data if item["product_id"] in reserved]
+
+        created_at = datetime.utcnow()
+        new_order = Order(user_id=user_id, total_amount=total_amount, created_at=created_at)
         session.add(new_order)
         session.flush()
 
@@ -66,110 +115,218 @@ def add_order(user_id: int, items: list):
                 product_id=item_data["product_id"],
                 quantity=item_data["quantity"],
                 unit_price=item_data["unit_price"],
+                stock_reserved=item_data["product_id"] in reserved,
             )
             session.add(order_item)
 
+        update_report_summaries(session, user_id, total_amount, order_items_data)
+        session.add(_order_event(order_id, ORDER_CREATED, user_id, total_amount, order_items_data, created_at))
         session.commit()
 
-        add_order_to_redis(order_id, user_id, total_amount, items)
-
         return order_id
 
-    except Exception as e:
+    except Exception:
         session.rollback()
-        print(e)
-        return "Une erreur s'est produite lors de la création de l'enregistrement. Veuillez consulter les logs pour plus d'informations."
+        if reserved_items:
+            release_stock(reserved_items)
+        raise
     finally:
         session.close()
 
 
 def delete_order(order_id: int):
-    """Delete order in MySQL, keep Redis in sync"""
+    """Delete order in MySQL, Redis is kept in sync through the outbox"""
     session = get_sqlalchemy_session()
     try:
         order = session.query(Order).filter(Order.id == order_id).first()
         if order:
+            items = [
+                {"product_id": item.product_id, "quantity": item.quantity, "unit_price": item.unit_price}
+                for item in order.order_items
+            ]
+            update_report_summaries(session, order.user_id, order.total_amount, items, sign=-1)
+            session.add(_order_event(order.id, ORDER_DELETED, order.user_id, order.total_amount, items,
+                                     order.created_at or datetime.utcnow()))
+            # Only the stock the order took is given back (see write_stock.release_stock)
+            reserved_items = [{"product_id": item.product_id, "quantity": item.quantity}
+                              for item in order.order_items if item.stock_reserved]
             session.delete(order)
             session.commit()
-            delete_order_from_redis(order_id)
+            try:
+                release_stock(reserved_items)
+            except Exception:
+                logger.exception("libération du stock de la commande %s échouée", order_id)
             return 1
         else:
             return 0
-    except Exception as e:
+    except Exception:
         session.rollback()
-        print(e)
         raise
     finally:
         session.close()
 
 
-def add_order_to_redis(order_id, user_id, total_amount, items):
-    r = get_redis_conn()
-    mapping = {
-        "id": str(order_id),
-        "user_id": "" if user_id is None else str(user_id),
-        "total": "" if total_amount is None else str(float(total_amount)),
-        "created_at": datetime.utcnow().isoformat(),
-    }
-    r.hset(f"order:{order_id}", mapping=mapping)
-    r.sadd("orders", order_id)
-
-    if items:
-        r.set(f"order:{order_id}:items", json.dumps(items))
-        for it in items:
-            pid = int(it["product_id"])
-            qty = int(it["quantity"])
-            r.hincrby("product:sold_qty", pid, qty)
-
+def _order_event(order_id, event_type, user_id, total_amount, items, created_at):
+    """Build the outbox event carrying everything the Redis projection needs"""
+    return OrderEvent(order_id=order_id, event_type=event_type, payload={
+        "user_id": int(user_id),
+        "total": float(total_amount),
+        "items": [{
+            "product_id": int(item["product_id"]),
+            "quantity": int(item["quantity"]),
+            "unit_price": float(item["unit_price"]),
+        } for item in items],
+        "created_at": created_at.isoformat(),
+    })
+
+
+def project_order_event(pipe, event_type, order_id, payload):
+    """Apply an outbox event to the Redis projection through the given pipeline"""
+    created_at = datetime.fromisoformat(payload["created_at"])
+    if event_type == ORDER_CREATED:
+        _write_order_projection(pipe, order_id, payload["user_id"], payload["total"], payload["items"], created_at)
+    elif event_type == ORDER_DELETED:
+        _remove_order_projection(pipe, order_id, payload["user_id"], payload["total"], payload["items"], created_at)
+
+
+def add_order_to_redis(order_id, user_id, total_amount, items, created_at=None):
+    pipe = get_projection_conn().pipeline()
+    _write_order_projection(pipe, order_id, user_id, total_amount, items, created_at or datetime.utcnow())
+    pipe.execute()
     return True
 
 
 def delete_order_from_redis(order_id):
-    r = get_redis_conn()
-    deleted = r.delete(f"order:{order_id}")
-    r.srem("orders", order_id)
-    r.delete(f"order:{order_id}:items")
+    order = read_order_projections([order_id], with_items=True)[0] or {}
+    created_at = datetime.fromisoformat(order["created_at"]) if order.get("created_at") else None
+
+    pipe = get_projection_conn().pipeline()
+    _remove_order_projection(pipe, order_id, order.get("user_id"), order.get("total"), order.get("items"), created_at)
+    deleted = pipe.execute()[0]
     return deleted > 0
 
 
+def _write_order_projection(pipe, order_id, user_id, total_amount, items, created_at):
+    write_order_projection(pipe, order_id, user_id, total_amount, items, created_at)
+    _update_sales_counters(pipe, created_at.date(), user_id, total_amount, items)
+    add_distinct_buyers(pipe, created_at.date(), user_id, items)
+
+
+def _remove_order_projection(pipe, order_id, user_id, total_amount, items, created_at):
+    remove_order_projection(pipe, order_id)
+    if created_at:
+        _update_sales_counters(pipe, created_at.date(), user_id, total_amount, items, sign=-1)
+
+
+def _update_sales_counters(pipe, day, user_id, total_amount, items, sign=1):
+    """Apply an order (sign=1) or its removal (sign=-1) to the all-time and daily sales counters"""
+    for it in items or []:
+        pipe.hincrby("product:sold_qty", int(it["product_id"]), sign * int(it["quantity"]))
+    if user_id and total_amount:
+        pipe.zincrby(SPEND_LEADERBOARD_KEY, sign * float(total_amount), user_id)
+        if sign < 0:
+            pipe.zremrangebyscore(SPEND_LEADERBOARD_KEY, "-inf", 0)
+
+    if (datetime.utcnow().date() - day).days > config.SALES_BUCKET_RETENTION_DAYS:
+        return
+
+    buckets = []
+    if user_id and total_amount:
+        spend_key = sales_bucket_key("spend", day)
+        pipe.zincrby(spend_key, sign * float(total_amount), user_id)
+        buckets.append(spend_key)
+    if items:
+        units_key = sales_bucket_key("units", day)
+        for it in items:
+            pipe.zincrby(units_key, sign * int(it["quantity"]), int(it["product_id"]))
+        buckets.append(units_key)
+
+    for key in buckets:
+        if sign < 0:
+            pipe.zremrangebyscore(key, "-inf", 0)
+        pipe.expire(key, sales_bucket_ttl(day))
+
+
+def _sync_window():
+    """Get the SQL clauses and parameters selecting the orders the retention keeps in Redis"""
+    where, limit, params = "", "", {}
+    if config.ORDER_RETENTION_DAYS > 0:
+        where = "WHERE o.created_at >= :since"
+        params["since"] = datetime.utcnow() - timedelta(days=config.ORDER_RETENTION_DAYS)
+    if config.ORDER_RETENTION_MAX_ORDERS > 0:
+        limit = "ORDER BY o.created_at DESC, o.id DESC LIMIT :limit"
+        params["limit"] = config.ORDER_RETENTION_MAX_ORDERS
+    return SYNC_ORDERS_SQL.format(where=where, limit=limit), params
+
+def _sync_items(conn, order_ids):
+    """Get the items of the given orders, as the projection stores them, by order ID"""
+    items = {order_id: [] for order_id in order_ids}
+    for row in conn.execute(SYNC_ITEMS_SQL, {"ids": order_ids}).mappings():
+        items[row["order_id"]].append({"product_id": int(row["product_id"]), "quantity": int(row["quantity"]),
+                                       "unit_price": float(row["unit_price"])})
+    return items
+
+def _sync_sales_counters(conn, pipe):
+    """Load the all-time counters from the report summaries and the daily buckets from the orders"""
+    for row in conn.execute(text(SYNC_SPEND_SQL)).mappings():
+        pipe.zadd(SPEND_LEADERBOARD_KEY, {row["user_id"]: float(row["total_spent"])})
+    for row in conn.execute(text(SYNC_SOLD_QTY_SQL)).mappings():
+        pipe.hset("product:sold_qty", row["product_id"], int(row["units_sold"]))
+
+    today = datetime.utcnow().date()
+    for offset in range(config.SALES_BUCKET_RETENTION_DAYS + 1):
+        day = today - timedelta(days=offset)
+        params = {"day": day, "next_day": day + timedelta(days=1)}
+        for kind, sql in (("spend", DAILY_SPEND_SQL), ("units", DAILY_UNITS_SQL)):
+            scores = {member: float(value) for member, value in conn.execute(text(sql), params) if value and value > 0}
+            if scores:
+                pipe.zadd(sales_bucket_key(kind, day), scores)
+                pipe.expire(sales_bucket_key(kind, day), sales_bucket_ttl(day))
+
+def _sales_counter_keys():
+    today = datetime.utcnow().date()
+    days = [today - timedelta(days=offset) for offset in range(config.SALES_BUCKET_RETENTION_DAYS + 1)]
+    return [SPEND_LEADERBOARD_KEY, "product:sold_qty"] + [sales_bucket_key(kind, day) for day in days
+                                                          for kind in ("spend", "units")]
+
 def sync_all_orders_to_redis():
     """Sync orders from MySQL to Redis (utilise l'engine partagé, pas d'engine local)."""
-    r = get_redis_conn()
-    existing = r.keys("order:*")
+    r = get_projection_conn()
+    existing = r.zcard(ORDER_INDEX_KEY)
+    # The marker outlives the orders evicted by the retention, which may leave the index empty
+    if r.exists(ORDER_SYNC_MARKER_KEY):
+        logger.debug("Redis already contains orders, no need to sync!")
+        return existing
     if existing:
-        print("Redis already contains orders, no need to sync!")
-        return len(existing)
+        # Synced before the marker existed
+        r.set(ORDER_SYNC_MARKER_KEY, datetime.utcnow().isoformat())
+        return existing
+    # Leftovers of a partial sync, or of the former "orders" set index: the counters are rebuilt whole,
+    # so that the events projected later add to (or remove from) the right totals
+    r.delete("orders", *_sales_counter_keys())
 
     rows_added = 0
     try:
+        sql, params = _sync_window()
         with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT
-                    o.id,
-                    o.user_id,
-                    o.created_at,
-                    COALESCE(o.total_amount, SUM(oi.quantity * oi.unit_price)) AS total
-                FROM orders o
-                LEFT JOIN order_items oi ON oi.order_id = o.id
-                GROUP BY o.id, o.user_id, o.created_at, o.total_amount
-            """))
-
-            for row in result.mappings():
-                order_id = row["id"]
-                key = f"order:{order_id}"
-                mapping = {
-                    "id": str(row["id"]),
-                    "user_id": "" if row["user_id"] is None else str(row["user_id"]),
-                    "total": "" if row["total"] is None else str(float(row["total"])),
-                    "created_at": "" if row["created_at"] is None else str(row["created_at"]),
-                }
-                r.hset(key, mapping=mapping)
-                r.sadd("orders", order_id)
-                rows_added += 1
-                print(f"Inserted {key} -> {mapping}")
-
+            result = conn.execute(text(sql), params)
+            for rows in result.mappings().partitions(1000):
+                items = _sync_items(conn, [row["id"] for row in rows])
+                pipe = r.pipeline(transaction=False)
+                for row in rows:
+                    write_order_projection(pipe, row["id"], row["user_id"], row["total"], items[row["id"]],
+                                           row["created_at"] or datetime.utcnow())
+                pipe.execute()
+                rows_added += len(rows)
+
+            pipe = r.pipeline(transaction=False)
+            _sync_sales_counters(conn, pipe)
+            pipe.set(ORDER_SYNC_MARKER_KEY, datetime.utcnow().isoformat())
+            pipe.execute()
+
+        logger.info("%d commandes synchronisées dans Redis", rows_added)
         return rows_added
 
-    except Exception as e:
-        print(e)
+    except Exception:
+        logger.exception("synchronisation des commandes dans Redis échouée")
         return 0
@@ -4,22 +4,38 @@ SPDX - License - Identifier: LGPL - 3.0 - or -later
 Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
 """
 
+import logging
 from sqlalchemy import desc
 from models.product import Product
-from db import get_sqlalchemy_session
+from queries.read_product import product_cache_key, product_cache_mapping
+from commands.write_stock import set_stock
+from commands.search_index import SearchIndexBuilder, index_search_entries, remove_search_entry, product_search_texts
+from db import get_sqlalchemy_session, get_redis_conn
 
-def add_product(name: str, sku: str, price: float):
-    """Insert product with items in MySQL"""
+logger = logging.getLogger(__name__)
+
+def add_product(name: str, sku: str, price: float, stock: int = None):
+    """Insert product with items in MySQL, stock=None for a product whose stock isn't tracked"""
     if not name or not sku or not price or float(price) <= 0:
         raise ValueError("Vous devez indiquer un nom, numéro SKU et prix unitaire pour l'article.")
+    if stock is not None:
+        try:
+            stock = int(stock)
+        except ValueError:
+            raise ValueError("Le stock doit être un nombre entier.")
+        if stock < 0:
+            raise ValueError("Le stock ne peut pas être négatif.")
     
     session = get_sqlalchemy_session()
 
     try: 
-        new_product = Product(name=name, sku=sku, price=price)
+        new_product = Product(name=name, sku=sku, price=price, stock=stock)
         session.add(new_product)
         session.flush() 
         session.commit()
+        add_product_to_redis(new_product)
+        if stock is not None:
+            set_stock(new_product.id, stock)
         return new_product.id
     except Exception as e:
         session.rollback()
@@ -37,6 +53,8 @@ def delete_product_by_id(product_id: int):
         if product:
             session.delete(product)
             session.commit()
+            delete_product_from_redis(product_id)
+            set_stock(product_id, None)
             return 1  
         else:
             return 0  
@@ -47,3 +65,44 @@ def delete_product_by_id(product_id: int):
     finally:
         session.close()
 
+def add_product_to_redis(product):
+    """Mirror product attributes in Redis; on failure the readers fall back to MySQL"""
+    try:
+        add_products_to_redis([product])
+    except Exception:
+        logger.exception("mise en cache du produit %s échouée", product.id)
+
+def add_products_to_redis(products):
+    """Mirror the attributes of several products (models or rows) in Redis and index them, in one pipeline"""
+    pipe = get_redis_conn().pipeline(transaction=False)
+    for product in products:
+        pipe.hset(product_cache_key(product.id), mapping=product_cache_mapping(product))
+    pipe.execute()
+    index_search_entries("products", [(product.id, product_search_texts(product)) for product in products])
+
+def delete_product_from_redis(product_id):
+    try:
+        get_redis_conn().delete(product_cache_key(product_id))
+        remove_search_entry("products", product_id)
+    except Exception:
+        logger.exception("retrait du produit %s du cache échoué", product_id)
+
+def sync_all_products_to_redis(batch_size=1000):
+    """Load every product from MySQL into Redis with its search index, one pipeline per batch"""
+    r = get_redis_conn()
+    session = get_sqlalchemy_session()
+    rows_added = 0
+    try:
+        pipe = r.pipeline(transaction=False)
+        index = SearchIndexBuilder(pipe, "products")
+        for product in session.query(Product).yield_per(batch_size):
+            pipe.hset(product_cache_key(product.id), mapping=product_cache_mapping(product))
+            index.add(product.id, product_search_texts(product))
+            rows_added += 1
+            if rows_added % batch_size == 0:
+                pipe.execute()
+        index.finish()
+        pipe.execute()
+        return rows_added
+    finally:
+        session.close()
@@ -0,0 +1,69 @@
+"""
+Report summaries (write-only model)
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+from sqlalchemy import text
+from db import engine
+
+UPSERT_USER_SPEND_SQL = """
+    INSERT INTO user_spend_summary (user_id, total_spent, order_count)
+    VALUES (:user_id, :amount, :orders) AS new
+    ON DUPLICATE KEY UPDATE
+        total_spent = user_spend_summary.total_spent + new.total_spent,
+        order_count = user_spend_summary.order_count + new.order_count
+"""
+
+UPSERT_PRODUCT_SALES_SQL = """
+    INSERT INTO product_sales_summary (product_id, units_sold, revenue)
+    VALUES (:product_id, :units, :revenue) AS new
+    ON DUPLICATE KEY UPDATE
+        units_sold = product_sales_summary.units_sold + new.units_sold,
+        revenue = product_sales_summary.revenue + new.revenue
+"""
+
+# The summaries are all-time: the archived orders count as much as the live ones
+BACKFILL_USER_SPEND_SQL = """
+    INSERT INTO user_spend_summary (user_id, total_spent, order_count)
+    SELECT o.user_id, SUM(o.total_amount), COUNT(*)
+    FROM (
+        SELECT user_id, total_amount FROM orders
+        UNION ALL
+        SELECT user_id, total_amount FROM orders_archive
+    ) o
+    GROUP BY o.user_id
+"""
+
+BACKFILL_PRODUCT_SALES_SQL = """
+    INSERT INTO product_sales_summary (product_id, units_sold, revenue)
+    SELECT oi.product_id, SUM(oi.quantity), SUM(oi.quantity * oi.unit_price)
+    FROM (
+        SELECT product_id, quantity, unit_price FROM order_items
+        UNION ALL
+        SELECT product_id, quantity, unit_price FROM order_items_archive
+    ) oi
+    GROUP BY oi.product_id
+"""
+
+def update_report_summaries(session, user_id, total_amount, items, sign=1):
+    """Apply an order (sign=1) or its removal (sign=-1) to the summary tables, in the caller's transaction"""
+    session.execute(text(UPSERT_USER_SPEND_SQL), {
+        "user_id": int(user_id),
+        "amount": sign * float(total_amount),
+        "orders": sign,
+    })
+    if items:
+        session.execute(text(UPSERT_PRODUCT_SALES_SQL), [{
+            "product_id": int(item["product_id"]),
+            "units": sign * int(item["quantity"]),
+            "revenue": sign * int(item["quantity"]) * float(item["unit_price"]),
+        } for item in items])
+
+def rebuild_report_summaries():
+    """Recompute the summary tables from the live and archived orders in a single transaction"""
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM user_spend_summary"))
+        conn.execute(text("DELETE FROM product_sales_summary"))
+        users = conn.execute(text(BACKFILL_USER_SPEND_SQL)).rowcount
+        products = conn.execute(text(BACKFILL_PRODUCT_SALES_SQL)).rowcount
+    return users, products
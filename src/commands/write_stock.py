@@ -0,0 +1,150 @@
+"""
+Product stock (write-only model)
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+The live stock level of a product is the Redis key stock:{product_id}; a product without
+this key is not tracked and never runs out. MySQL products.stock is a periodic copy.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from sqlalchemy import text
+import config
+from db import get_redis_conn, engine
+
+logger = logging.getLogger(__name__)
+
+DIRTY_STOCK_KEY = "stock:dirty"
+
+# KEYS: stock keys of the order, then stock:dirty. ARGV: quantities, then product IDs.
+# All-or-nothing: returns {0, IDs of the tracked products} if every tracked product had enough stock,
+# else {1-based index of the first one short}.
+RESERVE_SCRIPT = """
+local n = #KEYS - 1
+for i = 1, n do
+    local level = redis.call('GET', KEYS[i])
+    if level and tonumber(level) < tonumber(ARGV[i]) then
+        return {i}
+    end
+end
+local reserved = {0}
+for i = 1, n do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('DECRBY', KEYS[i], ARGV[i])
+        redis.call('SADD', KEYS[n + 1], ARGV[n + i])
+        reserved[#reserved + 1] = ARGV[n + i]
+    end
+end
+return reserved
+"""
+
+# Same KEYS/ARGV layout: gives the quantities back to the tracked products
+RELEASE_SCRIPT = """
+local n = #KEYS - 1
+for i = 1, n do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('INCRBY', KEYS[i], ARGV[i])
+        redis.call('SADD', KEYS[n + 1], ARGV[n + i])
+    end
+end
+return {0}
+"""
+
+def stock_key(product_id):
+    return f"stock:{product_id}"
+
+def _quantities_by_product(items):
+    quantities = Counter()
+    for item in items:
+        quantities[int(item["product_id"])] += int(item["quantity"])
+    return quantities
+
+def _run_stock_script(script, quantities):
+    product_ids = list(quantities)
+    keys = [stock_key(pid) for pid in product_ids] + [DIRTY_STOCK_KEY]
+    args = [quantities[pid] for pid in product_ids] + product_ids
+    result = get_redis_conn().register_script(script)(keys=keys, args=args)
+    return product_ids, int(result[0]), {int(product_id) for product_id in result[1:]}
+
+def reserve_stock(items):
+    """Atomically take the quantities of every item from stock, or nothing if one product is short.
+    Return the IDs of the products whose stock is tracked, the only ones taken from"""
+    product_ids, short, reserved = _run_stock_script(RESERVE_SCRIPT, _quantities_by_product(items))
+    if short:
+        raise ValueError(f"Stock insuffisant pour l'article ID {product_ids[short - 1]}.")
+    return reserved
+
+def release_stock(items):
+    """Give the quantities of the items back to stock: only pass the items reserve_stock took from,
+    a product tracked since would otherwise get units it never gave"""
+    if items:
+        _run_stock_script(RELEASE_SCRIPT, _quantities_by_product(items))
+
+def set_stock(product_id, stock):
+    """Set the stock level of a product, None to stop tracking it"""
+    r = get_redis_conn()
+    if stock is None:
+        r.delete(stock_key(product_id))
+    else:
+        r.set(stock_key(product_id), int(stock))
+    r.sadd(DIRTY_STOCK_KEY, product_id)
+
+def set_stock_levels(levels):
+    """Set the stock levels of many products, {product_id: stock}, in one pipeline"""
+    if not levels:
+        return
+    pipe = get_redis_conn().pipeline()
+    for product_id, stock in levels.items():
+        pipe.set(stock_key(product_id), int(stock))
+    pipe.sadd(DIRTY_STOCK_KEY, *levels)
+    pipe.execute()
+
+def load_stock_levels():
+    """Copy MySQL stock levels into Redis for the tracked products Redis doesn't know yet"""
+    r = get_redis_conn()
+    loaded = 0
+    with engine.connect() as conn:
+        pipe = r.pipeline(transaction=False)
+        for product_id, stock in conn.execute(text("SELECT id, stock FROM products WHERE stock IS NOT NULL")):
+            # NX: a level already in Redis is newer than the last flush
+            pipe.set(stock_key(product_id), stock, nx=True)
+            loaded += 1
+        pipe.execute()
+    return loaded
+
+def flush_stock_levels(batch_size=None):
+    """Write the levels changed since the last flush to MySQL, in batches"""
+    batch_size = batch_size or config.STOCK_FLUSH_BATCH_SIZE
+    r = get_redis_conn()
+    flushed = 0
+    while True:
+        product_ids = r.spop(DIRTY_STOCK_KEY, batch_size)
+        if not product_ids:
+            return flushed
+        levels = r.mget([stock_key(pid) for pid in product_ids])
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("UPDATE products SET stock = :stock WHERE id = :id"), [
+                    {"id": int(pid), "stock": None if level is None else int(level)}
+                    for pid, level in zip(product_ids, levels)
+                ])
+        except Exception:
+            r.sadd(DIRTY_STOCK_KEY, *product_ids)
+            raise
+        flushed += len(product_ids)
+
+def _run_stock_flusher():
+    while True:
+        time.sleep(config.STOCK_FLUSH_INTERVAL)
+        try:
+            flush_stock_levels()
+        except Exception:
+            logger.exception("stock_flusher")
+
+def start_stock_flusher():
+    """Start the background thread that copies stock levels to MySQL"""
+    thread = threading.Thread(target=_run_stock_flusher, name="stock-flusher", daemon=True)
+    thread.start()
+    return thread
@@ -4,9 +4,14 @@ SPDX - License - Identifier: LGPL - 3.0 - or -later
 Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
 """
 
+import logging
 from sqlalchemy import desc
 from models.user import User
-from db import get_sqlalchemy_session
+from queries.read_user import user_cache_key, user_cache_mapping
+from commands.search_index import SearchIndexBuilder, index_search_entries, remove_search_entry, user_search_texts
+from db import get_sqlalchemy_session, get_redis_conn
+
+logger = logging.getLogger(__name__)
 
 def add_user(name: str, email: str):
     """Insert user with items in MySQL"""
@@ -20,6 +25,7 @@ def add_user(name: str, email: str):
         session.add(new_user)
         session.flush() 
         session.commit()
+        add_user_to_redis(new_user)
         return new_user.id
     except Exception as e:
         session.rollback()
@@ -35,6 +41,7 @@ def delete_user_by_id(user_id: int):
         if user:
             session.delete(user)
             session.commit()
+            delete_user_from_redis(user_id)
             return 1  
         else:
             return 0  
@@ -45,3 +52,44 @@ def delete_user_by_id(user_id: int):
     finally:
         session.close()
 
+def add_user_to_redis(user):
+    """Mirror user attributes in Redis; on failure the readers fall back to MySQL"""
+    try:
+        add_users_to_redis([user])
+    except Exception:
+        logger.exception("mise en cache de l'utilisateur %s échouée", user.id)
+
+def add_users_to_redis(users):
+    """Mirror the attributes of several users (models or rows) in Redis and index them, in one pipeline"""
+    pipe = get_redis_conn().pipeline(transaction=False)
+    for user in users:
+        pipe.hset(user_cache_key(user.id), mapping=user_cache_mapping(user))
+    pipe.execute()
+    index_search_entries("users", [(user.id, user_search_texts(user)) for user in users])
+
+def delete_user_from_redis(user_id):
+    try:
+        get_redis_conn().delete(user_cache_key(user_id))
+        remove_search_entry("users", user_id)
+    except Exception:
+        logger.exception("retrait de l'utilisateur %s du cache échoué", user_id)
+
+def sync_all_users_to_redis(batch_size=1000):
+    """Load every user from MySQL into Redis with its search index, one pipeline per batch"""
+    r = get_redis_conn()
+    session = get_sqlalchemy_session()
+    rows_added = 0
+    try:
+        pipe = r.pipeline(transaction=False)
+        index = SearchIndexBuilder(pipe, "users")
+        for user in session.query(User).yield_per(batch_size):
+            pipe.hset(user_cache_key(user.id), mapping=user_cache_mapping(user))
+            index.add(user.id, user_search_texts(user))
+            rows_added += 1
+            if rows_added % batch_size == 0:
+                pipe.execute()
+        index.finish()
+        pipe.execute()
+        return rows_added
+    finally:
+        session.close()
@@ -20,4 +20,122 @@ DB_NAME = os.getenv("DB_NAME", "test")
 # Redis
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
-REDIS_DB = int(os.getenv("REDIS_DB", "0"))
\ No newline at end of file
+REDIS_DB = int(os.getenv("REDIS_DB", "0"))
+# Nœuds Redis ("hôte:port/db" séparés par des virgules) entre lesquels les commandes sont réparties;
+# le premier garde aussi les agrégats et les caches. Vide = un seul nœud, REDIS_HOST:REDIS_PORT/REDIS_DB
+REDIS_NODES = ([node.strip() for node in os.getenv("REDIS_NODES", "").split(",") if node.strip()]
+               or [f"{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"])
+# Points de chaque nœud sur l'anneau de hachage cohérent (plus de points = répartition plus égale)
+REDIS_RING_POINTS = int(os.getenv("REDIS_RING_POINTS", "160"))
+
+# Fan-out (requêtes indépendantes exécutées en parallèle)
+FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "8"))
+FANOUT_TIMEOUT = float(os.getenv("FANOUT_TIMEOUT", "2.0"))
+
+# Rapports par fenêtre de temps (compteurs Redis journaliers)
+SALES_BUCKET_RETENTION_DAYS = int(os.getenv("SALES_BUCKET_RETENTION_DAYS", "90"))
+REPORT_WINDOW_CACHE_TTL = int(os.getenv("REPORT_WINDOW_CACHE_TTL", "60"))
+
+# Migrations du schéma (fichiers VNNN__description.sql)
+MIGRATIONS_DIR = os.getenv("MIGRATIONS_DIR", os.path.join(os.path.dirname(__file__), "..", "db-init", "migrations"))
+
+# Outbox des événements de commande, projetés dans Redis en arrière-plan
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "0.2"))
+OUTBOX_APPLIED_TTL = int(os.getenv("OUTBOX_APPLIED_TTL", "86400"))
+OUTBOX_RETENTION_HOURS = int(os.getenv("OUTBOX_RETENTION_HOURS", "24"))
+
+# Clés d'idempotence des commandes
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# Doit dépasser la durée maximale d'une création de commande (attente du pool MySQL comprise) :
+# une clé en attente qui expire avant la fin de la création laisse passer un doublon
+IDEMPOTENCY_PENDING_TTL = int(os.getenv("IDEMPOTENCY_PENDING_TTL", "30"))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "10"))
+
+# Contrôle d'admission: seau à jetons par client et par classe de route (jetons/seconde, rafale)
+RATE_LIMITS = {
+    "read": (float(os.getenv("RATE_LIMIT_READ_PER_SEC", "20")), int(os.getenv("RATE_LIMIT_READ_BURST", "40"))),
+    "write": (float(os.getenv("RATE_LIMIT_WRITE_PER_SEC", "2")), int(os.getenv("RATE_LIMIT_WRITE_BURST", "10"))),
+    "report": (float(os.getenv("RATE_LIMIT_REPORT_PER_SEC", "1")), int(os.getenv("RATE_LIMIT_REPORT_BURST", "5"))),
+}
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+MYSQL_MAX_CONCURRENCY = int(os.getenv("MYSQL_MAX_CONCURRENCY", "16"))
+MYSQL_SLOT_WAIT = float(os.getenv("MYSQL_SLOT_WAIT", "0.5"))
+
+# Stock des articles (niveaux en direct dans Redis, recopiés dans MySQL périodiquement)
+STOCK_FLUSH_INTERVAL = float(os.getenv("STOCK_FLUSH_INTERVAL", "5"))
+STOCK_FLUSH_BATCH_SIZE = int(os.getenv("STOCK_FLUSH_BATCH_SIZE", "500"))
+
+# Format de la projection des commandes dans Redis: "hash" (lisible) ou "packed" (binaire compact)
+# Après un changement de format : manage.py convert-orders --from <ancien format>, serveur arrêté
+ORDER_PROJECTION_FORMAT = os.getenv("ORDER_PROJECTION_FORMAT", "hash")
+# Commandes par hash en format "packed"; rester sous hash-max-listpack-entries (128 par défaut)
+ORDER_BUCKET_SIZE = int(os.getenv("ORDER_BUCKET_SIZE", "100"))
+# Base Redis de travail, vidée de ses clés après chaque mesure de mémoire
+REDIS_SCRATCH_DB = int(os.getenv("REDIS_SCRATCH_DB", "15"))
+
+# Rétention de la projection des commandes (0 = illimitée); les commandes plus anciennes sont lues dans MySQL
+ORDER_RETENTION_DAYS = int(os.getenv("ORDER_RETENTION_DAYS", "0"))
+ORDER_RETENTION_MAX_ORDERS = int(os.getenv("ORDER_RETENTION_MAX_ORDERS", "0"))
+ORDER_RETENTION_INTERVAL = float(os.getenv("ORDER_RETENTION_INTERVAL", "300"))
+ORDER_RETENTION_BATCH_SIZE = int(os.getenv("ORDER_RETENTION_BATCH_SIZE", "1000"))
+ORDER_REWARM_ON_READ = os.getenv("ORDER_REWARM_ON_READ", "false").lower() == "true"
+
+# Réplicas MySQL en lecture (URLs SQLAlchemy séparées par des virgules, vide = tout sur le primaire)
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+# Retard de réplication maximal en secondes avant de lire sur le primaire (-1 = pas de vérification du retard)
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+
+# API JSON
+API_DEFAULT_LIMIT = int(os.getenv("API_DEFAULT_LIMIT", "100"))
+API_MAX_LIMIT = int(os.getenv("API_MAX_LIMIT", "1000"))
+
+# Export des commandes en flux
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "65536"))
+# Délai d'envoi au client avant d'abandonner l'export (le curseur MySQL reste ouvert pendant ce temps)
+EXPORT_SEND_TIMEOUT = float(os.getenv("EXPORT_SEND_TIMEOUT", "60"))
+
+# Import CSV en lot
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "100"))
+
+# Pool de connexions MySQL (par moteur : primaire, chaque réplica, lectures en flux)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# Doit rester sous wait_timeout de MySQL
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_USE_LIFO = os.getenv("DB_POOL_USE_LIFO", "true").lower() == "true"
+# Ping à chaque emprunt de connexion; par défaut remplacé par la vérification périodique des connexions inactives
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+DB_POOL_LIVENESS_INTERVAL = float(os.getenv("DB_POOL_LIVENESS_INTERVAL", "30"))
+
+# Politiques des routes HTTP
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "5"))
+ASSETS_MAX_AGE = int(os.getenv("ASSETS_MAX_AGE", "3600"))
+
+# Réconciliation de la projection Redis avec MySQL
+RECONCILE_CHUNK_SIZE = int(os.getenv("RECONCILE_CHUNK_SIZE", "500"))
+
+# Archivage des commandes froides dans orders_archive / order_items_archive (manage.py archive-orders)
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "365"))
+ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv("ORDER_ARCHIVE_BATCH_SIZE", "500"))
+# Pause en secondes entre deux lots
+ORDER_ARCHIVE_PAUSE = float(os.getenv("ORDER_ARCHIVE_PAUSE", "0.1"))
+
+# Recherche par préfixe (index lexicographique Redis)
+SEARCH_DEFAULT_LIMIT = int(os.getenv("SEARCH_DEFAULT_LIMIT", "10"))
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "50"))
+# Longueur maximale des termes indexés (les préfixes plus longs ne trouvent rien)
+SEARCH_MAX_TERM_LENGTH = int(os.getenv("SEARCH_MAX_TERM_LENGTH", "64"))
+
+# Journalisation structurée (lignes JSON écrites par un thread en arrière-plan)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Proportion des requêtes réussies et rapides journalisées (les erreurs et les requêtes lentes le sont toujours)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_SLOW_REQUEST_MS = float(os.getenv("LOG_SLOW_REQUEST_MS", "500"))
+# Au-delà, les enregistrements sont abandonnés plutôt que de bloquer la requête
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
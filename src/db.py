@@ -4,11 +4,23 @@ SPDX - License - Identifier: LGPL - 3.0 - or -later
 Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
 """
 
+import contextvars
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+import logging
 import mysql.connector
 import redis
+import redis.client
 import config
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
+import db_pool
+from logs import record_backend_call
+from redis_shards import HashRing
+
+logger = logging.getLogger(__name__)
 
 def get_mysql_conn():
     """Get a MySQL connection using env variables (auth plugin forced)."""
@@ -22,25 +34,72 @@ def get_mysql_conn():
     )
 
 
-def get_redis_conn():
-    """Get a Redis connection using env variables."""
-    return redis.Redis(
-        host=config.REDIS_HOST,
-        port=config.REDIS_PORT,
-        db=config.REDIS_DB,
-        decode_responses=True,
+def _parse_redis_node(node):
+    """Get (host, port, db) of a "host:port/db" node of REDIS_NODES"""
+    address, _, node_db = node.partition("/")
+    host, _, port = address.partition(":")
+    return host, int(port or 6379), int(node_db or 0)
+
+class _TimedRedis(redis.Redis):
+    """Redis client counting its round trips in the current request (see logs.py)"""
+    def execute_command(self, *args, **options):
+        started = time.monotonic()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            record_backend_call("redis", time.monotonic() - started)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return _TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+class _TimedPipeline(redis.client.Pipeline):
+    """Pipeline counting each execute() as one round trip, however many commands it sends"""
+    def execute(self, raise_on_error=True):
+        started = time.monotonic()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            record_backend_call("redis", time.monotonic() - started)
+
+redis_nodes = [_parse_redis_node(node) for node in config.REDIS_NODES]
+redis_ring = HashRing(config.REDIS_NODES, config.REDIS_RING_POINTS)
+
+def get_redis_conn(decode_responses=True, db=None, node=0):
+    """Get a Redis connection using env variables (decode_responses=False for binary values).
+    The first node of REDIS_NODES by default, see queries.order_projection for the sharded orders."""
+    host, port, node_db = redis_nodes[node]
+    return _TimedRedis(
+        host=host,
+        port=port,
+        db=node_db if db is None else db,
+        decode_responses=decode_responses,
     )
 _CONNECTION_STRING = (
     f"mysql+mysqlconnector://{config.DB_USER}:{config.DB_PASS}"
     f"@{config.DB_HOST}:{config.DB_PORT}/{config.DB_NAME}"
 )
-engine = create_engine(
-    _CONNECTION_STRING,
-    echo=False,
-    future=True,
-    pool_pre_ping=True,
-    connect_args={"auth_plugin": "caching_sha2_password"},
-)
+
+# Every engine of the process by name, for the pool statistics and the liveness checks
+engines = {}
+
+def _create_engine(url, name):
+    connect_args = {"auth_plugin": "caching_sha2_password"} if str(url).startswith("mysql+mysqlconnector") else {}
+    engines[name] = db_pool.instrument(
+        create_engine(url, echo=False, future=True, connect_args=connect_args, **db_pool.pool_options()))
+    _time_statements(engines[name])
+    return engines[name]
+
+def _time_statements(candidate):
+    """Count each statement of the engine as a MySQL call of the current request (see logs.py)"""
+    @event.listens_for(candidate, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info["statement_started"] = time.monotonic()
+
+    @event.listens_for(candidate, "after_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        record_backend_call("mysql", time.monotonic() - conn.info.pop("statement_started", time.monotonic()))
+
+engine = _create_engine(_CONNECTION_STRING, "primary")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -49,3 +108,108 @@ def get_sqlalchemy_session():
     return SessionLocal()
 
 db_session = SessionLocal()
+
+# Read/write splitting: reads go to the replicas in turn, unless the current request already
+# wrote to the primary (it must read its own writes) or no replica is healthy and caught up
+_wrote_to_primary = contextvars.ContextVar("wrote_to_primary", default=False)
+
+@event.listens_for(engine, "commit")
+def _pin_to_primary(conn):
+    _wrote_to_primary.set(True)
+
+@contextmanager
+def read_your_writes():
+    """Scope (e.g. an HTTP request) in which the reads that follow a write go to the primary"""
+    token = _wrote_to_primary.set(False)
+    try:
+        yield
+    finally:
+        _wrote_to_primary.reset(token)
+
+class Replica:
+    def __init__(self, url, name):
+        self.engine = _create_engine(url, name)
+        self.usable = False
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def check(self):
+        """Check that the replica answers and that its replication lag is within DB_REPLICA_MAX_LAG"""
+        try:
+            with self.engine.connect() as conn:
+                if config.DB_REPLICA_MAX_LAG < 0:
+                    conn.execute(text("SELECT 1"))
+                    return True
+                status = conn.execute(text("SHOW REPLICA STATUS")).mappings().first()
+            lag = status["Seconds_Behind_Source"] if status else None
+            # NULL lag: the replication threads are stopped, the data may be arbitrarily old
+            return lag is not None and lag <= config.DB_REPLICA_MAX_LAG
+        except Exception as e:
+            logger.warning("réplica %r indisponible : %s", self.engine.url, e)
+            return False
+
+    def is_usable(self):
+        """Cached result of check(), refreshed every DB_REPLICA_CHECK_INTERVAL by one thread at a time"""
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= config.DB_REPLICA_CHECK_INTERVAL:
+            if self.lock.acquire(blocking=self.checked_at is None):
+                try:
+                    self.usable = self.check()
+                    self.checked_at = time.monotonic()
+                finally:
+                    self.lock.release()
+        return self.usable
+
+replicas = [Replica(url, f"replica{index}") for index, url in enumerate(config.DB_REPLICA_URLS, 1)]
+_next_replica = itertools.count()
+
+def get_read_engine():
+    """Return the engine for a read: the next usable replica, or the primary"""
+    if replicas and not _wrote_to_primary.get():
+        start = next(_next_replica)
+        for offset in range(len(replicas)):
+            replica = replicas[(start + offset) % len(replicas)]
+            if replica.is_usable():
+                return replica.engine
+    return engine
+
+def get_read_session():
+    """Return a new SQLAlchemy ORM session for reads, bound to a replica when possible."""
+    return SessionLocal(bind=get_read_engine())
+
+_streaming_engines = {}
+_streaming_engines_lock = threading.Lock()
+
+def get_streaming_engine():
+    """Return an engine able to stream rows from a server-side cursor, for the current read target.
+    mysql-connector only has buffered cursors in SQLAlchemy, so the same database is reached through PyMySQL."""
+    read_engine = get_read_engine()
+    if read_engine.dialect.supports_server_side_cursors or read_engine.url.get_backend_name() != "mysql":
+        return read_engine
+    with _streaming_engines_lock:
+        if read_engine not in _streaming_engines:
+            name = next(name for name, candidate in engines.items() if candidate is read_engine)
+            _streaming_engines[read_engine] = _create_engine(read_engine.url.set(drivername="mysql+pymysql"),
+                                                             f"{name}-streaming")
+        return _streaming_engines[read_engine]
+
+def get_pool_stats():
+    """State and counters of the connection pool of every engine, by engine name"""
+    return {name: db_pool.get_stats(candidate) for name, candidate in list(engines.items())}
+
+def _run_pool_liveness_check():
+    while True:
+        time.sleep(config.DB_POOL_LIVENESS_INTERVAL)
+        for name, candidate in list(engines.items()):
+            try:
+                db_pool.check_idle_connections(candidate)
+            except Exception:
+                logger.exception("pool_liveness %s", name)
+
+def start_pool_liveness_check():
+    """Start the background thread that pings idle pooled connections, if enabled"""
+    if config.DB_POOL_LIVENESS_INTERVAL <= 0:
+        return None
+    thread = threading.Thread(target=_run_pool_liveness_check, name="pool-liveness", daemon=True)
+    thread.start()
+    return thread
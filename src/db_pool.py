@@ -0,0 +1,124 @@
+"""
+Connection pool instrumentation and liveness checks
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+import config
+
+class PoolStats:
+    """Counters of a pool since startup (the pool's own gauges give its current state)"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0             # checkouts that waited for a connection or opened one
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.liveness_failures = 0
+
+    def record_checkout(self, seconds):
+        with self.lock:
+            self.checkouts += 1
+            if seconds >= 0.001:
+                self.waits += 1
+                self.wait_seconds += seconds
+                self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def increment(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool measuring how long each checkout waits for a connection"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.increment("timeouts")
+            raise
+        self.stats.record_checkout(time.monotonic() - started)
+        return connection
+
+    def recreate(self):
+        # Called when the whole pool is invalidated: the counters carry over to the new pool
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+def pool_options():
+    """create_engine() arguments of the configured pool"""
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_use_lifo": config.DB_POOL_USE_LIFO,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+def instrument(engine):
+    """Count the connections opened and invalidated by the engine's pool"""
+    event.listen(engine, "connect", lambda dbapi_connection, record: engine.pool.stats.increment("connects"))
+    event.listen(engine, "invalidate", lambda dbapi_connection, record, error: engine.pool.stats.increment("invalidations"))
+    return engine
+
+def get_stats(engine):
+    """Current state and counters of an engine's pool"""
+    pool = engine.pool
+    stats = pool.stats
+    with stats.lock:
+        return {
+            "size": pool.size(),
+            "max_overflow": config.DB_MAX_OVERFLOW,
+            # Connections this pool may open at most: the sum over every pool and process must stay below max_connections
+            "capacity": pool.size() + config.DB_MAX_OVERFLOW,
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "checkouts": stats.checkouts,
+            "waits": stats.waits,
+            "avg_wait_ms": round(stats.wait_seconds / stats.waits * 1000, 2) if stats.waits else 0.0,
+            "max_wait_ms": round(stats.max_wait_seconds * 1000, 2),
+            "timeouts": stats.timeouts,
+            "connects": stats.connects,
+            "invalidations": stats.invalidations,
+            "liveness_failures": stats.liveness_failures,
+        }
+
+def check_idle_connections(engine):
+    """Ping the connections idle in the pool and invalidate the dead ones, so requests don't pay a pre-ping"""
+    pool = engine.pool
+    checked = []
+    try:
+        # Only the connections idle right now are taken, so the check never makes a request wait or opens new ones
+        for _ in range(pool.checkedin()):
+            if pool.checkedin() == 0:
+                break
+            connection = pool.connect()
+            checked.append(connection)
+            try:
+                cursor = connection.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+            except Exception:
+                pool.stats.increment("liveness_failures")
+                connection.invalidate()
+    finally:
+        for connection in checked:
+            connection.close()
+        with pool.stats.lock:
+            pool.stats.checkouts -= len(checked)
+    return len(checked)
@@ -0,0 +1,55 @@
+"""
+Fan-out of independent data fetches
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import config
+
+logger = logging.getLogger(__name__)
+
+# Shared by every view so the number of threads hitting the backends stays bounded
+_executor = ThreadPoolExecutor(max_workers=config.FANOUT_MAX_WORKERS, thread_name_prefix="fanout")
+
+def fetch_all(calls, defaults=None, timeouts=None, timeout=None):
+    """
+    Run independent fetches concurrently and return their results by name.
+    calls: {name: callable without arguments}
+    defaults: {name: value returned if the call fails or times out}, None otherwise
+    timeouts: {name: seconds} overrides the common timeout for a given call
+    The total wait is bounded by the slowest timeout, not by the sum of the calls.
+    A result whose type differs from its default (e.g. the error message a controller returns
+    instead of raising) is replaced by the default, so the caller can use it as is.
+    A call that times out is only abandoned: if it had started, it keeps its worker until it returns.
+    """
+    defaults = defaults or {}
+    timeouts = timeouts or {}
+    timeout = config.FANOUT_TIMEOUT if timeout is None else timeout
+
+    started = time.monotonic()
+    # Each call runs in the caller's context, so it sees the request's read routing (see db.read_your_writes)
+    futures = {name: _executor.submit(contextvars.copy_context().run, call) for name, call in calls.items()}
+
+    results = {}
+    for name, future in futures.items():
+        remaining = timeouts.get(name, timeout) - (time.monotonic() - started)
+        try:
+            result = future.result(timeout=max(remaining, 0))
+        except FutureTimeoutError:
+            # Only dequeues a call that has not started yet: a running call cannot be interrupted
+            future.cancel()
+            logger.warning("fetch_all: '%s' a dépassé le délai de %ss", name, timeouts.get(name, timeout))
+            results[name] = defaults.get(name)
+        except Exception:
+            logger.exception("fetch_all: '%s' a échoué", name)
+            results[name] = defaults.get(name)
+        else:
+            default = defaults.get(name)
+            if default is not None and not isinstance(result, type(default)):
+                logger.warning("fetch_all: '%s' a renvoyé %r", name, result)
+                result = default
+            results[name] = result
+    return results
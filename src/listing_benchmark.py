@@ -0,0 +1,56 @@
+"""
+Benchmark of the listing queries: ORM entities against Core selects mapped to row tuples
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+Runs on an in-memory SQLite database, so the numbers isolate the Python-side cost
+(row materialization and memory) from the network and MySQL.
+"""
+import time
+import tracemalloc
+from sqlalchemy import create_engine, desc, insert
+from sqlalchemy.orm import Session
+from models.product import Product
+from queries.read_product import PRODUCT_LISTING, ProductRow
+
+def _seed(engine, rows):
+    Product.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Product), [
+            {"name": f"Article {i}", "sku": f"SKU-{i:08d}", "price": 9.99 + i % 100, "stock": i % 50}
+            for i in range(rows)
+        ])
+
+def _list_orm(engine, rows):
+    with Session(engine) as session:
+        products = session.query(Product).order_by(desc(Product.id)).limit(rows).all()
+        # Read the fields the views read, so lazy attribute work is counted
+        return [(product.id, product.name, product.price) for product in products], products
+
+def _list_core(engine, rows):
+    with engine.connect() as conn:
+        products = list(map(ProductRow._make, conn.execute(PRODUCT_LISTING.limit(rows))))
+    return [(product.id, product.name, product.price) for product in products], products
+
+def _measure(list_rows, engine, rows, repeat):
+    cpu = []
+    for _ in range(repeat):
+        started = time.process_time()
+        list_rows(engine, rows)
+        cpu.append(time.process_time() - started)
+    tracemalloc.start()
+    result = list_rows(engine, rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    best = min(cpu)
+    return {"cpu_us_per_row": best / rows * 1e6, "peak_bytes_per_row": peak / rows}
+
+def benchmark_listings(rows=10000, repeat=5):
+    """Measure the best CPU time and the peak memory per row of each listing path"""
+    engine = create_engine("sqlite://")
+    _seed(engine, rows)
+    return {
+        "orm": _measure(_list_orm, engine, rows, repeat),
+        "core": _measure(_list_core, engine, rows, repeat),
+    }
@@ -0,0 +1,181 @@
+"""
+Structured logging: JSON lines written by a background thread
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+The thread that logs only puts the record on a bounded queue; a single listener thread formats it
+and writes it to stdout (stderr for manage.py), so a request never waits on the terminal or on the
+log collector. When the queue is full the record is dropped, and the next line written tells how
+many were lost.
+The records logged while handling an HTTP request carry its ID and route, and the request ends with
+one "requête" record: status, duration, number and time of its MySQL and Redis calls. The records of
+fast successful requests are sampled (LOG_SAMPLE_RATE); errors and slow requests are always written.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import config
+
+BACKENDS = ("mysql", "redis")
+
+# Attributes of every LogRecord: the others come from extra={...} and are written as fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_access_log = logging.getLogger("access")
+
+# What a request ID received from the client may contain: it is sent back in a header and written to the logs
+_REQUEST_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+class RequestContext:
+    """Identity and backend counters of the HTTP request being handled"""
+    def __init__(self, request_id, method, path):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status = None
+        self.started = time.monotonic()
+        # The fan-out threads run in a copy of the request's context and count in the same object
+        self.lock = threading.Lock()
+        self.calls = {backend: [0, 0.0] for backend in BACKENDS}
+
+    def record_call(self, backend, seconds):
+        with self.lock:
+            counters = self.calls.setdefault(backend, [0, 0.0])
+            counters[0] += 1
+            counters[1] += seconds
+
+_current_request = contextvars.ContextVar("current_request", default=None)
+
+def current_request():
+    """Get the RequestContext of the request being handled, None outside of a request"""
+    return _current_request.get()
+
+def record_backend_call(backend, seconds):
+    """Count a MySQL or Redis round trip in the current request, if any"""
+    context = _current_request.get()
+    if context is not None:
+        context.record_call(backend, seconds)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, then the extra fields"""
+    def __init__(self, queue_handler=None):
+        super().__init__()
+        self.queue_handler = queue_handler
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((name, value) for name, value in vars(record).items() if name not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        dropped = self.queue_handler.take_dropped() if self.queue_handler else 0
+        if dropped:
+            entry["records_dropped"] = dropped
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops the record when the queue is full, rather than waiting or raising"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.dropped_lock = threading.Lock()
+
+    def prepare(self, record):
+        # The message and the traceback are rendered here, while their objects still have the logged state;
+        # the JSON itself is left to the listener thread
+        context = _current_request.get()
+        if context is not None:
+            record.__dict__.setdefault("request_id", context.request_id)
+            record.__dict__.setdefault("route", context.route or context.path)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.dropped_lock:
+                self.dropped += 1
+
+    def take_dropped(self):
+        """Get the number of records dropped since the previous call"""
+        with self.dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
+_listener = None
+
+def configure_logging(stream=None):
+    """Send the records of every logger through the queue to the writer thread, which writes them to
+    stream, stdout by default (once per process)"""
+    global _listener
+    if _listener is not None:
+        return
+    handler = NonBlockingQueueHandler(queue.Queue(config.LOG_QUEUE_SIZE))
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter(handler))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(config.LOG_LEVEL)
+    _listener = logging.handlers.QueueListener(handler.queue, writer)
+    _listener.start()
+    # Writes what is still queued when the process exits
+    atexit.register(_listener.stop)
+
+def _is_sampled(context, duration_ms):
+    if context.status is None or context.status >= 500 or duration_ms >= config.LOG_SLOW_REQUEST_MS:
+        return True
+    return random.random() < config.LOG_SAMPLE_RATE
+
+def _log_request(context):
+    duration_ms = (time.monotonic() - context.started) * 1000
+    if not _is_sampled(context, duration_ms):
+        return
+    fields = {"method": context.method, "path": context.path, "status": context.status,
+              "duration_ms": round(duration_ms, 1)}
+    with context.lock:
+        for backend, (calls, seconds) in context.calls.items():
+            fields[f"{backend}_calls"] = calls
+            fields[f"{backend}_ms"] = round(seconds * 1000, 1)
+    level = logging.WARNING if context.status is None or context.status >= 500 else logging.INFO
+    _access_log.log(level, "requête", extra=fields)
+
+@contextmanager
+def request_scope(method, path, request_id=None):
+    """Scope of an HTTP request: its records carry its ID, and its summary is logged when it ends.
+    A request_id that is missing or not made of 1 to 64 letters, digits, ".", "_" or "-" is replaced by a new one"""
+    if not request_id or not _REQUEST_ID.fullmatch(request_id):
+        request_id = uuid.uuid4().hex[:16]
+    context = RequestContext(request_id, method, path)
+    token = _current_request.set(context)
+    try:
+        yield context
+    except Exception:
+        _access_log.exception("requête en échec")
+        context.status = context.status or 500
+        raise
+    finally:
+        _log_request(context)
+        _current_request.reset(token)
@@ -0,0 +1,179 @@
+"""
+Maintenance commands
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+Usage: python src/manage.py <commande>
+"""
+import argparse
+import sys
+import time
+from commands.write_report import rebuild_report_summaries
+from commands.write_user import sync_all_users_to_redis
+from commands.write_product import sync_all_products_to_redis
+from commands.projection_memory import measure_projection_memory
+from commands.order_retention import evict_cold_orders
+from queries.export_orders import EXPORT_FORMATS, export_orders
+from commands.bulk_import import IMPORT_KINDS, import_csv
+from listing_benchmark import benchmark_listings
+from commands.reconcile import reconcile
+from commands.order_shards import rebalance_order_shards
+from commands.projection_format import convert_order_projection
+from commands.order_archival import archive_cold_orders
+from commands.distinct_buyers import backfill_distinct_buyers
+from migrations import run_migrations
+from logs import configure_logging
+
+def backfill_report_summaries(args):
+    """ Rebuild report summary tables from existing orders """
+    users, products = rebuild_report_summaries()
+    print(f"Résumés reconstruits : {users} utilisateurs, {products} articles")
+
+def migrate(args):
+    """ Apply pending schema migrations """
+    applied = run_migrations()
+    print(f"{len(applied)} migration(s) appliquée(s)")
+
+def sync_dimensions(args):
+    """ Mirror all users and products into Redis """
+    users = sync_all_users_to_redis()
+    products = sync_all_products_to_redis()
+    print(f"Redis : {users} utilisateurs, {products} articles chargés")
+
+def memory_report(args):
+    """ Report the Redis memory used per order in each projection format """
+    report = measure_projection_memory(args.sample)
+    if not report:
+        print("Aucune commande dans MySQL")
+    for fmt, usage in report.items():
+        print(f"{fmt:>6} : {usage['bytes_per_order']:.1f} octets/commande "
+              f"({usage['bytes']} octets, {usage['keys']} clés, {usage['orders']} commandes, encodages {usage['encodings']})")
+
+def convert_orders(args):
+    """ Rewrite the projected orders from their former format to ORDER_PROJECTION_FORMAT """
+    converted, deleted = convert_order_projection(args.source, args.batch_size)
+    print(f"{converted} commande(s) converties, {deleted} clé(s) de l'ancien format supprimée(s)")
+
+def evict_orders(args):
+    """ Evict the orders outside the retention window from Redis """
+    evicted = evict_cold_orders()
+    print(f"{evicted} commande(s) retirée(s) de Redis")
+
+def export(args):
+    """ Stream orders with their items to a file or stdout """
+    started = time.monotonic()
+    output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        output.writelines(export_orders(args.format, args.start, args.end, args.include_archive))
+    finally:
+        if args.output:
+            output.close()
+    if args.output:
+        print(f"Export terminé en {time.monotonic() - started:.1f}s : {args.output}")
+
+def import_file(args):
+    """ Import users or products from a CSV file """
+    with open(args.file, encoding="utf-8-sig", newline="") as lines:
+        report = import_csv(args.kind, lines, args.batch_size)
+    print(f"{report['imported']}/{report['rows']} ligne(s) importée(s) en {report['seconds']}s "
+          f"({report['rows_per_sec']} lignes/s), {report['error_count']} erreur(s)")
+    for line, message in report["errors"]:
+        print(f"  ligne {line} : {message}")
+
+def benchmark(args):
+    """ Compare the ORM and Core listing paths """
+    results = benchmark_listings(args.rows, args.repeat)
+    for path, result in results.items():
+        print(f"{path:>4} : {result['cpu_us_per_row']:.2f} µs CPU/ligne, {result['peak_bytes_per_row']:.0f} octets/ligne (pic)")
+
+def reconcile_projection(args):
+    """ Diff the Redis projection against MySQL and repair the drift """
+    report = reconcile(args.chunk_size, repair=not args.dry_run)
+    print(f"Plages : {report['ranges']} ({report['ranges_matching']} identiques)")
+    print(f"Commandes manquantes : {report['missing']}, périmées : {report['stale']}, orphelines : {report['orphaned']}")
+    print(f"Compteurs divergents : {', '.join(report['counters_drifted']) or 'aucun'}")
+    print(f"Réparations : {report['repaired']}, reportées (projection en cours) : {report['busy']}")
+
+def rebalance_orders(args):
+    """ Move the order details to the Redis node owning them after a change of REDIS_NODES """
+    moved = rebalance_order_shards()
+    print(f"{moved} clé(s) déplacée(s) entre les nœuds Redis")
+
+def archive_orders(args):
+    """ Move the cold orders and their items to the archive tables """
+    started = time.monotonic()
+    orders, items = archive_cold_orders(args.days, args.batch_size)
+    print(f"{orders} commande(s) et {items} article(s) archivé(s) en {time.monotonic() - started:.1f}s")
+
+def backfill_buyers(args):
+    """ Populate the distinct buyers HyperLogLogs from the orders in MySQL """
+    products, days = backfill_distinct_buyers()
+    print(f"Acheteurs distincts chargés : {products} articles, {days} jours")
+
+def main():
+    parser = argparse.ArgumentParser(description="Commandes de maintenance du magasin")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill = subparsers.add_parser("backfill-report-summaries", help="Reconstruire les tables de résumé des rapports")
+    backfill.set_defaults(handler=backfill_report_summaries)
+
+    migrate_parser = subparsers.add_parser("migrate", help="Appliquer les migrations du schéma")
+    migrate_parser.set_defaults(handler=migrate)
+
+    dimensions = subparsers.add_parser("sync-dimensions", help="Charger les utilisateurs et articles dans Redis, avec leur index de recherche")
+    dimensions.set_defaults(handler=sync_dimensions)
+
+    memory = subparsers.add_parser("memory-report", help="Mesurer la mémoire Redis par commande dans chaque format")
+    memory.add_argument("--sample", type=int, default=1000, help="Nombre de commandes récentes à mesurer")
+    memory.set_defaults(handler=memory_report)
+
+    convert_parser = subparsers.add_parser("convert-orders", help="Convertir les commandes de Redis vers ORDER_PROJECTION_FORMAT (serveur arrêté)")
+    convert_parser.add_argument("--from", dest="source", required=True, choices=["hash", "packed"], help="Ancien format")
+    convert_parser.add_argument("--batch-size", type=int, default=None, help="Commandes par pipeline")
+    convert_parser.set_defaults(handler=convert_orders)
+
+    evict = subparsers.add_parser("evict-orders", help="Retirer de Redis les commandes hors de la fenêtre de rétention")
+    evict.set_defaults(handler=evict_orders)
+
+    export_parser = subparsers.add_parser("export-orders", help="Exporter les commandes et leurs articles (NDJSON ou CSV)")
+    export_parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="ndjson")
+    export_parser.add_argument("--start", help="Date de début incluse (AAAA-MM-JJ)")
+    export_parser.add_argument("--end", help="Date de fin incluse (AAAA-MM-JJ)")
+    export_parser.add_argument("--output", help="Fichier de sortie, la sortie standard par défaut")
+    export_parser.add_argument("--include-archive", action="store_true", help="Inclure les commandes archivées")
+    export_parser.set_defaults(handler=export)
+
+    import_parser = subparsers.add_parser("import-csv", help="Importer des utilisateurs ou des articles depuis un CSV")
+    import_parser.add_argument("kind", choices=list(IMPORT_KINDS))
+    import_parser.add_argument("file", help="Fichier CSV avec en-tête (users : name,email ; products : name,sku,price[,stock])")
+    import_parser.add_argument("--batch-size", type=int, default=None, help="Lignes par transaction")
+    import_parser.set_defaults(handler=import_file)
+
+    benchmark_parser = subparsers.add_parser("benchmark-listings", help="Comparer les listes ORM et Core (SQLite en mémoire)")
+    benchmark_parser.add_argument("--rows", type=int, default=10000)
+    benchmark_parser.add_argument("--repeat", type=int, default=5)
+    benchmark_parser.set_defaults(handler=benchmark)
+
+    reconcile_parser = subparsers.add_parser("reconcile", help="Comparer la projection Redis à MySQL et corriger les écarts")
+    reconcile_parser.add_argument("--chunk-size", type=int, default=None, help="Commandes par plage d'ID")
+    reconcile_parser.add_argument("--dry-run", action="store_true", help="Rapporter les écarts sans les corriger")
+    reconcile_parser.set_defaults(handler=reconcile_projection)
+
+    rebalance_parser = subparsers.add_parser("rebalance-orders", help="Déplacer les commandes vers leur nœud Redis après un changement de REDIS_NODES")
+    rebalance_parser.set_defaults(handler=rebalance_orders)
+
+    archive_parser = subparsers.add_parser("archive-orders", help="Déplacer les commandes anciennes vers les tables d'archive")
+    archive_parser.add_argument("--days", type=int, default=None, help="Âge minimal des commandes archivées, en jours")
+    archive_parser.add_argument("--batch-size", type=int, default=None, help="Commandes par transaction")
+    archive_parser.set_defaults(handler=archive_orders)
+
+    buyers_parser = subparsers.add_parser("backfill-distinct-buyers", help="Charger les acheteurs distincts (HyperLogLog) depuis MySQL")
+    buyers_parser.set_defaults(handler=backfill_buyers)
+
+    args = parser.parse_args()
+    # On stderr: export-orders may write its export to stdout
+    configure_logging(sys.stderr)
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
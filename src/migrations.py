@@ -0,0 +1,65 @@
+"""
+Versioned schema migrations
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+import logging
+import os
+import re
+from sqlalchemy import text
+import config
+from db import engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_FILE_PATTERN = re.compile(r"^V(\d+)__(\w+)\.sql$")
+
+def get_migrations(directory=None):
+    """Get (version, name, path) of every migration file, in version order"""
+    directory = directory or config.MIGRATIONS_DIR
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    return sorted(migrations)
+
+def split_statements(sql):
+    """Split a migration script into statements, dropping comment lines"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+def run_migrations(directory=None):
+    """Apply pending migrations, return the versions applied"""
+    applied_now = []
+    with engine.connect() as conn:
+        # Several workers may start at once, only one of them migrates
+        if not conn.execute(text("SELECT GET_LOCK('schema_migrations', 60)")).scalar():
+            raise RuntimeError("Impossible d'obtenir le verrou des migrations.")
+        try:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    name VARCHAR(150) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """))
+            applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+            for version, name, path in get_migrations(directory):
+                if version in applied:
+                    continue
+                with open(path, "r") as file:
+                    statements = split_statements(file.read())
+                # MySQL commits DDL implicitly: the version is only recorded once every statement succeeded
+                for statement in statements:
+                    conn.execute(text(statement))
+                conn.execute(text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                             {"version": version, "name": name})
+                conn.commit()
+                applied_now.append(version)
+                logger.info("Migration V%03d %s appliquée", version, name)
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK('schema_migrations')"))
+            conn.commit()
+    return applied_now
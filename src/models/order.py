@@ -4,7 +4,7 @@ SPDX - License - Identifier: LGPL - 3.0 - or -later
 Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
 """
 
-from sqlalchemy import Column, Integer, Float
+from sqlalchemy import Column, Integer, Float, DateTime
 from sqlalchemy.orm import relationship
 from models.base import Base
 
@@ -14,6 +14,7 @@ class Order(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, nullable=False)
     total_amount = Column(Float, nullable=False)
+    created_at = Column(DateTime)
     
     # Relationship to order items
     order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
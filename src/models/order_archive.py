@@ -0,0 +1,26 @@
+"""
+Archived order and order item classes (value objects)
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from models.base import Base
+
+class OrderArchive(Base):
+    __tablename__ = 'orders_archive'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=False)
+    total_amount = Column(Float, nullable=False)
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime)
+
+class OrderItemArchive(Base):
+    __tablename__ = 'order_items_archive'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    order_id = Column(Integer, ForeignKey('orders_archive.id'), nullable=False)
+    product_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=False)
@@ -0,0 +1,17 @@
+"""
+Order event class (transactional outbox)
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, JSON
+from models.base import Base
+
+class OrderEvent(Base):
+    __tablename__ = 'order_events'
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    order_id = Column(Integer, nullable=False)
+    event_type = Column(String(32), nullable=False)
+    payload = Column(JSON, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
@@ -4,7 +4,7 @@ SPDX - License - Identifier: LGPL - 3.0 - or -later
 Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
 """
 
-from sqlalchemy import Column, Integer, Float, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, Float, ForeignKey
 from sqlalchemy.orm import relationship
 from models.base import Base
 
@@ -16,6 +16,8 @@ class OrderItem(Base):
     product_id = Column(Integer, nullable=False)
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Float, nullable=False)
+    # Taken from a tracked stock level: given back when the order is deleted
+    stock_reserved = Column(Boolean, nullable=False, default=False)
     
     # Relationship back to order
     order = relationship("Order", back_populates="order_items")
\ No newline at end of file
@@ -13,4 +13,5 @@ class Product(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, nullable=False)
     sku = Column(String, nullable=False)
-    price = Column(Float, nullable=False)
\ No newline at end of file
+    price = Column(Float, nullable=False)
+    stock = Column(Integer, nullable=True)
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Orders export (read-only model)
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+Orders are streamed from a server-side cursor and formatted on the fly: nothing holds more than
+one fetch batch in memory, and a slow consumer simply pauses the cursor.
+"""
+import csv
+import heapq
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+from sqlalchemy import text
+import config
+from db import get_streaming_engine
+
+NDJSON_FORMAT = "ndjson"
+CSV_FORMAT = "csv"
+EXPORT_FORMATS = {NDJSON_FORMAT: "application/x-ndjson", CSV_FORMAT: "text/csv"}
+CSV_COLUMNS = ("order_id", "user_id", "total", "created_at", "product_id", "quantity", "unit_price")
+
+# Walking idx_orders_created returns the rows already sorted: MySQL starts sending them without a filesort
+EXPORT_ORDERS_SQL = """
+    SELECT o.id, o.user_id, o.total_amount, o.created_at, oi.product_id, oi.quantity, oi.unit_price
+    FROM {orders} o FORCE INDEX (idx_{orders}_created)
+    LEFT JOIN {items} oi ON oi.order_id = o.id
+    {where}
+    ORDER BY o.created_at, o.id
+"""
+
+# (orders table, items table) of the live and of the archived orders
+LIVE_TABLES = ("orders", "order_items")
+ARCHIVE_TABLES = ("orders_archive", "order_items_archive")
+
+def parse_date_range(start=None, end=None):
+    """Get the [start, end) datetimes of an export from optional YYYY-MM-DD dates, the end date being included"""
+    try:
+        start_at = datetime.combine(date.fromisoformat(start), time.min) if start else None
+        end_at = datetime.combine(date.fromisoformat(end) + timedelta(days=1), time.min) if end else None
+    except ValueError:
+        raise ValueError("Les dates doivent être au format AAAA-MM-JJ.")
+    if start_at and end_at and start_at >= end_at:
+        raise ValueError("La date de début doit précéder la date de fin.")
+    return start_at, end_at
+
+def iter_orders(start_at=None, end_at=None, batch_size=None, tables=LIVE_TABLES):
+    """Yield orders created in [start_at, end_at) as dicts with their items, oldest first"""
+    conditions, params = [], {}
+    if start_at:
+        conditions.append("o.created_at >= :start")
+        params["start"] = start_at
+    if end_at:
+        conditions.append("o.created_at < :end")
+        params["end"] = end_at
+    sql = EXPORT_ORDERS_SQL.format(orders=tables[0], items=tables[1],
+                                   where=f"WHERE {' AND '.join(conditions)}" if conditions else "")
+
+    with get_streaming_engine().connect() as conn:
+        rows = conn.execution_options(stream_results=True, yield_per=batch_size or config.EXPORT_BATCH_SIZE) \
+            .execute(text(sql), params)
+        # The rows of an order are consecutive, so one order at a time is assembled
+        for order_id, order_rows in groupby(rows, key=itemgetter(0)):
+            first = next(order_rows)
+            order = {
+                "id": order_id,
+                "user_id": first.user_id,
+                "total": None if first.total_amount is None else float(first.total_amount),
+                "created_at": first.created_at.isoformat() if first.created_at else None,
+                "items": [],
+            }
+            for row in (first, *order_rows):
+                if row.product_id is not None:
+                    order["items"].append({
+                        "product_id": row.product_id,
+                        "quantity": row.quantity,
+                        "unit_price": float(row.unit_price),
+                    })
+            yield order
+
+def format_ndjson(orders):
+    """Yield one JSON line per order"""
+    encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+    for order in orders:
+        yield encoder.encode(order) + "\n"
+
+def format_csv(orders):
+    """Yield the CSV header, then one line per order item (one line with empty item columns for an order without items)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    # Yielded on its own, so an empty range still exports a header-only CSV
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for order in orders:
+        head = (order["id"], order["user_id"], order["total"], order["created_at"])
+        for item in order["items"] or [None]:
+            writer.writerow(head + ((item["product_id"], item["quantity"], item["unit_price"]) if item else ("", "", "")))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def _export_order_key(order):
+    return order["created_at"] or "", order["id"]
+
+def export_orders(fmt=NDJSON_FORMAT, start=None, end=None, include_archive=False):
+    """Yield the orders of the date range as text in the given format, the archived ones too if asked"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu : {fmt}. Formats disponibles : {', '.join(EXPORT_FORMATS)}.")
+    start_at, end_at = parse_date_range(start, end)
+    orders = iter_orders(start_at, end_at)
+    if include_archive:
+        # Both streams are sorted by creation date: merging them keeps the export sorted without buffering
+        orders = heapq.merge(iter_orders(start_at, end_at, tables=ARCHIVE_TABLES), orders, key=_export_order_key)
+    return format_csv(orders) if fmt == CSV_FORMAT else format_ndjson(orders)
+
+def iter_chunks(lines, chunk_size=None):
+    """Group text lines into encoded chunks of about chunk_size bytes"""
+    chunk_size = chunk_size or config.EXPORT_CHUNK_SIZE
+    parts, size = [], 0
+    for line in lines:
+        data = line.encode("utf-8")
+        parts.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield b"".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b"".join(parts)
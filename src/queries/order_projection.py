@@ -0,0 +1,165 @@
+"""
+Orders projection in Redis: storage formats
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+"hash": one hash order:{id} of strings per order, plus the items as JSON in order:{id}:items.
+"packed": orders grouped by ORDER_BUCKET_SIZE in small hashes o:{bucket} that Redis keeps
+listpack-encoded, one fixed-size binary record per order; items packed the same way in oi:{bucket}.
+Both formats index order IDs in the sorted set "orders:by_date", scored by creation time.
+
+A hash stays listpack-encoded only while each of its values fits in hash-max-listpack-value
+(64 bytes by default). The order records (16 bytes) always do; an items record takes 16 bytes per
+item, so a single order of more than 4 items turns its whole oi:{bucket} into a hashtable. Raise
+hash-max-listpack-value in redis.conf (e.g. 256) when orders have more items, and check the
+encodings with "manage.py memory-report".
+Switching ORDER_PROJECTION_FORMAT leaves the orders in the former format behind: convert them
+with "manage.py convert-orders --from <former format>" (see commands/projection_format.py).
+
+With several REDIS_NODES, the order details are spread over the nodes by consistent hashing
+on the order ID (on the bucket when packed, so a bucket stays whole). The index, the counters
+and the leaderboards stay on the first node, where they can be read with a single command.
+"""
+import calendar
+import json
+import struct
+from datetime import datetime
+import config
+from db import get_redis_conn, redis_ring
+from redis_shards import ShardedRedis
+
+HASH_FORMAT = "hash"
+PACKED_FORMAT = "packed"
+ORDER_INDEX_KEY = "orders:by_date"
+# Set once the orders were loaded from MySQL; never evicted, unlike the orders themselves
+ORDER_SYNC_MARKER_KEY = "orders:synced"
+
+ORDER_RECORD = struct.Struct("<IdI")       # user_id, total, created_at (epoch seconds, UTC)
+ORDER_ITEM_RECORD = struct.Struct("<IId")  # product_id, quantity, unit_price
+
+def packed_location(order_id):
+    """Get the bucket and the field of an order in the packed format"""
+    bucket, field = divmod(int(order_id), config.ORDER_BUCKET_SIZE)
+    return bucket, str(field)
+
+def order_shard_token(key):
+    """Get what places a key on the ring: the order ID, or the bucket when packed; None for the first node"""
+    prefix, _, rest = key.partition(":")
+    if prefix in ("order", "o", "oi"):
+        return rest.partition(":")[0]
+    return None
+
+# One client per node and per decode_responses, shared by the whole process: each has its connection pool
+_projection_conns = {}
+
+def get_projection_conn(decode_responses=True):
+    """Get the Redis client of the projection, sending the order details to their node"""
+    if decode_responses not in _projection_conns:
+        clients = [get_redis_conn(decode_responses, node=node) for node in range(len(redis_ring.nodes))]
+        _projection_conns.setdefault(decode_responses, ShardedRedis(clients, redis_ring, order_shard_token))
+    return _projection_conns[decode_responses]
+
+def order_detail_patterns(fmt=None):
+    """Get the SCAN patterns of the keys holding order details"""
+    if (fmt or config.ORDER_PROJECTION_FORMAT) == PACKED_FORMAT:
+        return ["o:*", "oi:*"]
+    return ["order:*"]
+
+def to_timestamp(created_at):
+    return calendar.timegm(created_at.utctimetuple())
+
+def pack_order(user_id, total_amount, created_at):
+    return ORDER_RECORD.pack(int(user_id or 0), float(total_amount or 0), to_timestamp(created_at))
+
+def unpack_order(order_id, record):
+    user_id, total_amount, created_at = ORDER_RECORD.unpack(record)
+    return {
+        "id": str(order_id),
+        "user_id": str(user_id),
+        "total": str(total_amount),
+        "created_at": datetime.utcfromtimestamp(created_at).isoformat(),
+    }
+
+def pack_items(items):
+    return b"".join(
+        ORDER_ITEM_RECORD.pack(int(item["product_id"]), int(item["quantity"]), float(item.get("unit_price") or 0))
+        for item in items
+    )
+
+def unpack_items(record):
+    return [
+        {"product_id": product_id, "quantity": quantity, "unit_price": unit_price}
+        for product_id, quantity, unit_price in ORDER_ITEM_RECORD.iter_unpack(record)
+    ]
+
+def order_detail_keys(order_id, fmt=None):
+    """Get the keys holding the details of an order (shared with the orders of the same bucket when packed)"""
+    if (fmt or config.ORDER_PROJECTION_FORMAT) == PACKED_FORMAT:
+        bucket, _ = packed_location(order_id)
+        return [f"o:{bucket}", f"oi:{bucket}"]
+    return [f"order:{order_id}", f"order:{order_id}:items"]
+
+def write_order_projection(pipe, order_id, user_id, total_amount, items, created_at, fmt=None):
+    """Queue the writes of an order in the given pipeline"""
+    if (fmt or config.ORDER_PROJECTION_FORMAT) == PACKED_FORMAT:
+        bucket, field = packed_location(order_id)
+        pipe.hset(f"o:{bucket}", field, pack_order(user_id, total_amount, created_at))
+        if items:
+            pipe.hset(f"oi:{bucket}", field, pack_items(items))
+    else:
+        pipe.hset(f"order:{order_id}", mapping={
+            "id": str(order_id),
+            "user_id": "" if user_id is None else str(user_id),
+            "total": "" if total_amount is None else str(float(total_amount)),
+            "created_at": created_at.isoformat(),
+        })
+        if items:
+            pipe.set(f"order:{order_id}:items", json.dumps(items))
+    pipe.zadd(ORDER_INDEX_KEY, {order_id: to_timestamp(created_at)})
+
+def remove_order_projection(pipe, order_id, fmt=None):
+    """Queue the removal of an order in the given pipeline; the first command returns 1 if it existed"""
+    if (fmt or config.ORDER_PROJECTION_FORMAT) == PACKED_FORMAT:
+        bucket, field = packed_location(order_id)
+        pipe.hdel(f"o:{bucket}", field)
+        pipe.hdel(f"oi:{bucket}", field)
+    else:
+        pipe.delete(f"order:{order_id}")
+        pipe.delete(f"order:{order_id}:items")
+    pipe.zrem(ORDER_INDEX_KEY, order_id)
+
+def read_order_projections(order_ids, with_items=False, fmt=None):
+    """Get orders by IDs with one pipeline, as dicts of strings (plus "items" if asked); None for missing orders"""
+    order_ids = [int(order_id) for order_id in order_ids]
+    if (fmt or config.ORDER_PROJECTION_FORMAT) == PACKED_FORMAT:
+        pipe = get_projection_conn(decode_responses=False).pipeline(transaction=False)
+        for order_id in order_ids:
+            bucket, field = packed_location(order_id)
+            pipe.hget(f"o:{bucket}", field)
+            if with_items:
+                pipe.hget(f"oi:{bucket}", field)
+        replies = iter(pipe.execute())
+        orders = []
+        for order_id in order_ids:
+            record = next(replies)
+            items = next(replies) if with_items else None
+            order = unpack_order(order_id, record) if record else None
+            if order and with_items:
+                order["items"] = unpack_items(items or b"")
+            orders.append(order)
+        return orders
+
+    pipe = get_projection_conn().pipeline(transaction=False)
+    for order_id in order_ids:
+        pipe.hgetall(f"order:{order_id}")
+        if with_items:
+            pipe.get(f"order:{order_id}:items")
+    replies = iter(pipe.execute())
+    orders = []
+    for _ in order_ids:
+        order = next(replies) or None
+        items = next(replies) if with_items else None
+        if order and with_items:
+            order["items"] = json.loads(items or "[]")
+        orders.append(order)
+    return orders
@@ -0,0 +1,74 @@
+"""
+Distinct buyers (read-only model)
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+Redis keeps a HyperLogLog of the buyers of each product (all-time) and of each day (over the
+report windows): at most 12 KB per key however many buyers, counted in O(1) with a standard
+error of 0.81%, and the union of several days is counted server-side by one PFCOUNT.
+A HyperLogLog never forgets a buyer: deleting an order does not lower the counts.
+The exact counts come from MySQL with COUNT(DISTINCT), to validate the estimates.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from db import get_read_engine, get_redis_conn
+
+PRODUCT_BUYERS_SQL = """
+    SELECT COUNT(DISTINCT buyers.user_id) FROM (
+        SELECT o.user_id FROM order_items oi JOIN orders o ON o.id = oi.order_id
+        WHERE oi.product_id = :product_id
+        UNION ALL
+        SELECT o.user_id FROM order_items_archive oi JOIN orders_archive o ON o.id = oi.order_id
+        WHERE oi.product_id = :product_id
+    ) buyers
+"""
+
+# The report windows are shorter than the archival cutoff: the live orders are enough
+DAILY_BUYERS_SQL = """
+    SELECT DATE(created_at) AS day, COUNT(DISTINCT user_id) AS buyers
+    FROM orders
+    WHERE created_at >= :start
+    GROUP BY DATE(created_at)
+"""
+
+WINDOW_BUYERS_SQL = "SELECT COUNT(DISTINCT user_id) FROM orders WHERE created_at >= :start"
+
+def buyers_product_key(product_id):
+    return f"buyers:product:{int(product_id)}"
+
+def buyers_day_key(day):
+    return f"buyers:day:{day:%Y%m%d}"
+
+def _window_days(days):
+    """Get the days of a window, most recent first"""
+    today = datetime.utcnow().date()
+    return [today - timedelta(days=offset) for offset in range(days)]
+
+def get_product_buyers(product_id):
+    """Estimate the number of distinct buyers of a product"""
+    return get_redis_conn().pfcount(buyers_product_key(product_id))
+
+def get_daily_buyers(days):
+    """Estimate the distinct buyers of each of the last X days, most recent first, and of the whole window"""
+    window = _window_days(days)
+    keys = [buyers_day_key(day) for day in window]
+    pipe = get_redis_conn().pipeline(transaction=False)
+    for key in keys:
+        pipe.pfcount(key)
+    pipe.pfcount(*keys)
+    counts = pipe.execute()
+    return [(day.isoformat(), count) for day, count in zip(window, counts)], counts[-1]
+
+def get_product_buyers_from_mysql(product_id):
+    """Count the distinct buyers of a product exactly, archived orders included"""
+    with get_read_engine().connect() as conn:
+        return conn.execute(text(PRODUCT_BUYERS_SQL), {"product_id": int(product_id)}).scalar() or 0
+
+def get_daily_buyers_from_mysql(days):
+    """Count exactly the distinct buyers of each of the last X days, and of the whole window"""
+    window = _window_days(days)
+    start = datetime.combine(window[-1], datetime.min.time())
+    with get_read_engine().connect() as conn:
+        by_day = {str(row.day): row.buyers for row in conn.execute(text(DAILY_BUYERS_SQL), {"start": start})}
+        total = conn.execute(text(WINDOW_BUYERS_SQL), {"start": start}).scalar() or 0
+    return [(day.isoformat(), by_day.get(day.isoformat(), 0)) for day in window], total
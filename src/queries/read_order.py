@@ -3,58 +3,136 @@ Orders (read-only model)
 SPDX - License - Identifier: LGPL - 3.0 - or -later
 Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
 """
-from collections import defaultdict
-from db import get_sqlalchemy_session, get_redis_conn
-from sqlalchemy import desc
+import heapq
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from sqlalchemy import desc, select
+import config
+from db import get_read_engine, get_read_session, get_redis_conn
 from models.order import Order
+from models.order_item import OrderItem
+from models.order_archive import OrderArchive, OrderItemArchive
+from queries.order_projection import ORDER_INDEX_KEY, get_projection_conn, read_order_projections, write_order_projection
 
-def get_order_by_id(order_id):
-    """Get order by ID from Redis"""
-    r = get_redis_conn()
-    return r.hgetall(order_id)
+# Row of the MySQL orders listing (same Core select pattern as UserRow)
+class OrderRow(NamedTuple):
+    id: int
+    user_id: int
+    total_amount: float
+    created_at: Optional[datetime]
 
-def get_orders_from_mysql(limit=9999):
-    """Get last X orders"""
-    session = get_sqlalchemy_session()
-    return session.query(Order).order_by(desc(Order.id)).limit(limit).all()
+ORDER_LISTING = select(Order.id, Order.user_id, Order.total_amount, Order.created_at).order_by(desc(Order.id))
+ARCHIVED_ORDER_LISTING = select(OrderArchive.id, OrderArchive.user_id, OrderArchive.total_amount,
+                                OrderArchive.created_at).order_by(desc(OrderArchive.id))
 
-def get_orders_from_redis(limit=9999):
-    all_fields = self.r.hgetall("orders:index")
-    orders = []
-    for _, raw in all_fields.items():
-        orders.append(json.loads(raw.decode("utf-8")))
-    return orders
-
-def get_highest_spending_users(limit=10):
-    """Get report of highest spending users from Redis"""
-    r = get_redis_conn()
-    orders_keys = r.keys("order:*")
-    expenses_by_user = defaultdict(float)
+# All-time spend per user; unlike the order details it is never evicted from Redis
+SPEND_LEADERBOARD_KEY = "leaderboard:spend"
+
+# Named report windows, in days
+REPORT_WINDOWS = {"day": 1, "week": 7, "month": 30}
+
+def parse_window(window):
+    """Get the number of days of a report window ("week", "7", ...), None for all-time"""
+    if not window:
+        return None
+    if window in REPORT_WINDOWS:
+        return REPORT_WINDOWS[window]
+    try:
+        days = int(window)
+    except ValueError:
+        return None
+    return min(days, config.SALES_BUCKET_RETENTION_DAYS) if days > 0 else None
+
+def sales_bucket_key(kind, day):
+    """Get the key of the daily sorted set for 'units' (per product) or 'spend' (per user)"""
+    return f"sales:{kind}:{day:%Y%m%d}"
+
+def sales_bucket_ttl(day):
+    """Get the remaining lifetime in seconds of a daily bucket, anchored on its day"""
+    expires_at = datetime.combine(day, datetime.min.time()) + timedelta(days=config.SALES_BUCKET_RETENTION_DAYS + 1)
+    return max(int((expires_at - datetime.utcnow()).total_seconds()), 1)
 
-    for key in orders_keys:
-        order = r.hgetall(key)
+def _get_window_key(r, kind, days):
+    """Merge the daily buckets of the window server-side into a short-lived key"""
+    today = datetime.utcnow().date()
+    dest = f"sales:{kind}:last{days}d:{today:%Y%m%d}"
+    if not r.exists(dest):
+        buckets = [sales_bucket_key(kind, today - timedelta(days=offset)) for offset in range(days)]
+        pipe = r.pipeline()
+        pipe.zunionstore(dest, buckets)
+        pipe.expire(dest, config.REPORT_WINDOW_CACHE_TTL)
+        pipe.execute()
+    return dest
+
+def get_order_by_id(order_id, include_archive=True):
+    """Get order by ID from Redis, or from MySQL if it was evicted from Redis (re-warmed if configured),
+    or from the archive tables"""
+    order = read_order_projections([order_id], with_items=True)[0]
+    if order:
+        return order
+
+    session = get_read_session()
+    try:
+        order_class, item_class = Order, OrderItem
+        order = session.query(Order).filter(Order.id == order_id).first()
+        if not order and include_archive:
+            order_class, item_class = OrderArchive, OrderItemArchive
+            order = session.query(OrderArchive).filter(OrderArchive.id == order_id).first()
         if not order:
-            continue
-        user_id = order.get(b"user_id")
-        total = order.get(b"total")
-        if user_id and total:
-            expenses_by_user[user_id.decode()] += float(total.decode())
+            return {}
+        items = [
+            {"product_id": item.product_id, "quantity": item.quantity, "unit_price": item.unit_price}
+            for item in session.query(item_class).filter(item_class.order_id == order.id)
+        ]
+        created_at = order.created_at or datetime.utcnow()
+        # Archived orders are cold by definition: they are not brought back into Redis
+        if config.ORDER_REWARM_ON_READ and order_class is Order:
+            pipe = get_projection_conn().pipeline()
+            write_order_projection(pipe, order.id, order.user_id, order.total_amount, items, created_at)
+            pipe.execute()
+        return {
+            "id": str(order.id),
+            "user_id": str(order.user_id),
+            "total": str(float(order.total_amount)),
+            "created_at": created_at.isoformat(),
+            "items": items,
+        }
+    finally:
+        session.close()
 
-    top = sorted(expenses_by_user.items(), key=lambda kv: kv[1], reverse=True)
-    return top[:limit]
+def get_orders_from_mysql(limit=9999, include_archive=False):
+    """Get last X orders, live and optionally archived"""
+    with get_read_engine().connect() as conn:
+        orders = list(map(OrderRow._make, conn.execute(ORDER_LISTING.limit(limit))))
+        if not include_archive:
+            return orders
+        archived = list(map(OrderRow._make, conn.execute(ARCHIVED_ORDER_LISTING.limit(limit))))
+    return list(heapq.merge(orders, archived, key=lambda order: -order.id))[:limit]
 
+def get_orders_from_redis(limit=9999):
+    """Get last X orders from Redis"""
+    r = get_redis_conn()
+    order_ids = r.zrevrange(ORDER_INDEX_KEY, 0, limit - 1)
+    return [order for order in read_order_projections(order_ids) if order]
 
-def get_most_sold_products(top=10):
-    """Get report of best selling products from Redis"""
+def get_highest_spending_users(limit=10, window=None):
+    """Get report of highest spending users from Redis, all-time or over the last X days"""
     r = get_redis_conn()
-    product_ids = r.smembers("products:ids")
-    sales = []
+    days = parse_window(window)
+    if days:
+        return r.zrevrange(_get_window_key(r, "spend", days), 0, limit - 1, withscores=True)
 
-    for pid_b in product_ids:
-        pid = pid_b.decode()
-        count = int(r.get(f"product:{pid}:sold") or 0)
-        sales.append((pid, count))
+    return r.zrevrange(SPEND_LEADERBOARD_KEY, 0, limit - 1, withscores=True)
+
+
+def get_most_sold_products(top=10, window=None):
+    """Get report of best selling products from Redis, all-time or over the last X days"""
+    r = get_redis_conn()
+    days = parse_window(window)
+    if days:
+        return r.zrevrange(_get_window_key(r, "units", days), 0, top - 1, withscores=True)
 
+    sales = [(pid, int(count)) for pid, count in r.hgetall("product:sold_qty").items() if int(count) > 0]
     sales.sort(key=lambda x: x[1], reverse=True)
     return sales[:top]
     
\ No newline at end of file
@@ -4,13 +4,33 @@ SPDX - License - Identifier: LGPL - 3.0 - or -later
 Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
 """
 
-from sqlalchemy import desc
-from db import get_sqlalchemy_session
+from typing import NamedTuple, Optional
+from sqlalchemy import desc, select
+from db import get_read_engine, get_read_session, get_redis_conn
 from models.product import Product
 
+# Columns of the product listings, as a plain tuple rather than an ORM instance
+class ProductRow(NamedTuple):
+    id: int
+    name: str
+    sku: str
+    price: float
+    stock: Optional[int]
+
+PRODUCT_LISTING = select(Product.id, Product.name, Product.sku, Product.price, Product.stock).order_by(desc(Product.id))
+
+# Products are mirrored in Redis hashes product:{id} so reports can resolve names without MySQL
+PRODUCT_CACHE_FIELDS = ("name", "sku", "price")
+
+def product_cache_key(product_id):
+    return f"product:{product_id}"
+
+def product_cache_mapping(product):
+    return {"name": product.name, "sku": product.sku, "price": str(float(product.price))}
+
 def get_product_by_id(product_id):
     """Get product by ID """
-    session = get_sqlalchemy_session()
+    session = get_read_session()
     result = session.query(Product).filter_by(id=product_id).all()
 
     if len(result):
@@ -25,5 +45,34 @@ def get_product_by_id(product_id):
 
 def get_products(limit=9999):
     """Get last X products"""
-    session = get_sqlalchemy_session()
-    return session.query(Product).order_by(desc(Product.id)).limit(limit).all()
\ No newline at end of file
+    with get_read_engine().connect() as conn:
+        return list(map(ProductRow._make, conn.execute(PRODUCT_LISTING.limit(limit))))
+
+def get_products_by_ids(product_ids):
+    """Get products by IDs from Redis with one pipelined HMGET, MySQL only for the ones missing from Redis"""
+    product_ids = list(dict.fromkeys(int(product_id) for product_id in product_ids))
+    r = get_redis_conn()
+    pipe = r.pipeline(transaction=False)
+    for product_id in product_ids:
+        pipe.hmget(product_cache_key(product_id), PRODUCT_CACHE_FIELDS)
+
+    products = {}
+    missing = []
+    for product_id, values in zip(product_ids, pipe.execute()):
+        if values[0] is None:
+            missing.append(product_id)
+        else:
+            product = dict(zip(PRODUCT_CACHE_FIELDS, values))
+            products[product_id] = {"id": product_id, **product, "price": float(product["price"])}
+
+    if missing:
+        session = get_read_session()
+        try:
+            pipe = r.pipeline(transaction=False)
+            for product in session.query(Product).filter(Product.id.in_(missing)).all():
+                products[product.id] = {"id": product.id, "name": product.name, "sku": product.sku, "price": float(product.price)}
+                pipe.hset(product_cache_key(product.id), mapping=product_cache_mapping(product))
+            pipe.execute()
+        finally:
+            session.close()
+    return products
@@ -0,0 +1,36 @@
+"""
+Report summaries (read-only model)
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+from sqlalchemy import text
+from db import get_read_engine
+
+HIGHEST_SPENDING_USERS_SQL = """
+    SELECT u.name AS user_name, s.total_spent AS spent
+    FROM user_spend_summary s
+    JOIN users u ON u.id = s.user_id
+    ORDER BY s.total_spent DESC
+    LIMIT :limit
+"""
+
+MOST_SOLD_PRODUCTS_SQL = """
+    SELECT p.name AS product_name, s.units_sold AS sold
+    FROM product_sales_summary s
+    JOIN products p ON p.id = s.product_id
+    WHERE s.units_sold > 0
+    ORDER BY s.units_sold DESC
+    LIMIT :limit
+"""
+
+def get_highest_spending_users_from_mysql(limit=10):
+    """Get report of highest spending users from the MySQL summary table"""
+    with get_read_engine().connect() as conn:
+        res = conn.execute(text(HIGHEST_SPENDING_USERS_SQL), {"limit": limit})
+        return [(row["user_name"], float(row["spent"])) for row in res.mappings()]
+
+def get_most_sold_products_from_mysql(limit=10):
+    """Get report of best selling products from the MySQL summary table"""
+    with get_read_engine().connect() as conn:
+        res = conn.execute(text(MOST_SOLD_PRODUCTS_SQL), {"limit": limit})
+        return [(row["product_name"], int(row["sold"])) for row in res.mappings()]
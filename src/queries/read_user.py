@@ -4,13 +4,31 @@ SPDX - License - Identifier: LGPL - 3.0 - or -later
 Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
 """
 
-from sqlalchemy import desc
-from db import get_sqlalchemy_session
+from typing import NamedTuple
+from sqlalchemy import desc, select
+from db import get_read_engine, get_read_session, get_redis_conn
 from models.user import User
 
+# Listings read only these columns with a Core select: no ORM instances, identity map or attribute instrumentation
+class UserRow(NamedTuple):
+    id: int
+    name: str
+    email: str
+
+USER_LISTING = select(User.id, User.name, User.email).order_by(desc(User.id))
+
+# Users are mirrored in Redis hashes user:{id} so reports can resolve names without MySQL
+USER_CACHE_FIELDS = ("name", "email")
+
+def user_cache_key(user_id):
+    return f"user:{user_id}"
+
+def user_cache_mapping(user):
+    return {"name": user.name, "email": user.email}
+
 def get_user_by_id(user_id):
     """Get user by ID """
-    session = get_sqlalchemy_session()
+    session = get_read_session()
     result = session.query(User).filter_by(id=user_id).all()
 
     if len(result):
@@ -24,6 +42,33 @@ def get_user_by_id(user_id):
 
 def get_users(limit=9999):
     """Get last X users"""
-    session = get_sqlalchemy_session()
-    return session.query(User).order_by(desc(User.id)).limit(limit).all()
+    with get_read_engine().connect() as conn:
+        return list(map(UserRow._make, conn.execute(USER_LISTING.limit(limit))))
+
+def get_users_by_ids(user_ids):
+    """Get users by IDs from Redis with one pipelined HMGET, MySQL only for the ones missing from Redis"""
+    user_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids))
+    r = get_redis_conn()
+    pipe = r.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.hmget(user_cache_key(user_id), USER_CACHE_FIELDS)
+
+    users = {}
+    missing = []
+    for user_id, values in zip(user_ids, pipe.execute()):
+        if values[0] is None:
+            missing.append(user_id)
+        else:
+            users[user_id] = {"id": user_id, **dict(zip(USER_CACHE_FIELDS, values))}
 
+    if missing:
+        session = get_read_session()
+        try:
+            pipe = r.pipeline(transaction=False)
+            for user in session.query(User).filter(User.id.in_(missing)).all():
+                users[user.id] = {"id": user.id, **user_cache_mapping(user)}
+                pipe.hset(user_cache_key(user.id), mapping=user_cache_mapping(user))
+            pipe.execute()
+        finally:
+            session.close()
+    return users
@@ -0,0 +1,77 @@
+"""
+Prefix search over products (name, SKU) and users (name, email)
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+Each searchable text is normalized (case and accents folded) and stored as a member
+"{term}\\x00{id}" of a sorted set whose scores are all 0: Redis then orders the members
+lexicographically, and ZRANGEBYLEX returns the ones starting with a prefix in O(log N + limit).
+Besides the whole text, every word is a term, so "abc" finds "Laptop ABC".
+The index is maintained by commands/search_index.py.
+"""
+import unicodedata
+import config
+from db import get_redis_conn
+from queries.read_product import get_products_by_ids
+from queries.read_user import get_users_by_ids
+
+SEARCH_KINDS = {"products": get_products_by_ids, "users": get_users_by_ids}
+
+def search_key(kind):
+    return f"search:{kind}"
+
+def search_terms_key(kind):
+    """Hash of the members indexed for each ID, to remove them when the record changes"""
+    return f"search:{kind}:terms"
+
+def normalize(text):
+    """Fold case and accents, collapse whitespace"""
+    decomposed = unicodedata.normalize("NFKD", str(text or ""))
+    return " ".join("".join(char for char in decomposed if not unicodedata.combining(char)).casefold().split())
+
+def search_members(record_id, texts):
+    """Get the index members of a record: each text from its start and from each of its words"""
+    members = set()
+    for text in texts:
+        words = normalize(text).split(" ")
+        for start in range(len(words)):
+            term = " ".join(words[start:])[:config.SEARCH_MAX_TERM_LENGTH]
+            if term:
+                members.add(f"{term}\x00{record_id}")
+    return members
+
+def _prefix_range(prefix):
+    """Get the ZRANGEBYLEX bounds of the members starting with a prefix"""
+    # The exclusive upper bound is the prefix with its last character incremented: UTF-8 keeps code point order
+    return f"[{prefix}", f"({prefix[:-1]}{chr(ord(prefix[-1]) + 1)}"
+
+def search_ids(kind, prefix, limit):
+    """Get the IDs of the records having a term starting with the prefix, at most limit, in term order"""
+    prefix = normalize(prefix)
+    if not prefix:
+        return []
+    r = get_redis_conn()
+    low, high = _prefix_range(prefix)
+    ids = []
+    offset = 0
+    # A record may match through several of its terms: read on until limit distinct IDs are found
+    while len(ids) < limit:
+        members = r.zrangebylex(search_key(kind), low, high, start=offset, num=limit)
+        for member in members:
+            record_id = int(member.rpartition("\x00")[2])
+            if record_id not in ids:
+                ids.append(record_id)
+        if len(members) < limit:
+            break
+        offset += limit
+    return ids[:limit]
+
+def search(kind, prefix, limit=None):
+    """Get the records (dicts with their id) whose name or code starts with the prefix"""
+    if kind not in SEARCH_KINDS:
+        raise ValueError(f"Recherche inconnue : {kind}. Recherches disponibles : {', '.join(SEARCH_KINDS)}.")
+    limit = min(limit or config.SEARCH_DEFAULT_LIMIT, config.SEARCH_MAX_LIMIT)
+    ids = search_ids(kind, prefix, limit)
+    records = SEARCH_KINDS[kind](ids) if ids else {}
+    # IDs left in the index by a failed removal have no record anymore and are skipped
+    return [records[record_id] for record_id in ids if record_id in records]
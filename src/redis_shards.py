@@ -0,0 +1,149 @@
+"""
+Client-side sharding of Redis keys over several nodes
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+Keys are placed on a consistent hash ring: each node owns many points of the ring and a key
+goes to the node owning the first point after the hash of its shard token. Adding a node only
+moves the keys falling on its new points, about 1/N of them, the others stay where they are.
+A route function gives the shard token of a key (e.g. the order ID of order:{id}); the keys
+it returns None for stay on the first node, the home of the aggregates.
+A command runs on the node of its keys: a multi-key command (DEL, RENAME, ZUNIONSTORE...) whose
+keys live on different nodes raises a ValueError rather than silently running on one of them.
+"""
+import bisect
+import hashlib
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+def _key_list(keys, more_keys=()):
+    """Get the keys given as one key, a list or a mapping, followed by more keys (as redis-py takes them)"""
+    keys = [keys] if isinstance(keys, (str, bytes)) else list(keys)
+    return keys + list(more_keys)
+
+# Where the keys are among the arguments of the commands taking several keys; every other command
+# takes a single key, as its first argument
+MULTI_KEY_COMMANDS = {
+    **dict.fromkeys(("delete", "unlink", "exists", "touch", "pfcount", "pfmerge"),
+                    lambda *keys: list(keys)),
+    **dict.fromkeys(("mget", "sinter", "sunion", "sdiff"),
+                    lambda keys, *more_keys: _key_list(keys, more_keys)),
+    **dict.fromkeys(("zunion", "zinter", "zdiff", "blpop", "brpop", "bzpopmin", "bzpopmax"),
+                    lambda keys, *args, **kwargs: _key_list(keys)),
+    **dict.fromkeys(("sinterstore", "sunionstore", "sdiffstore"),
+                    lambda dest, keys, *more_keys: [dest] + _key_list(keys, more_keys)),
+    **dict.fromkeys(("zunionstore", "zinterstore", "zdiffstore"),
+                    lambda dest, keys, *args, **kwargs: [dest] + _key_list(keys)),
+    **dict.fromkeys(("rename", "renamenx", "copy", "smove", "rpoplpush", "lmove", "blmove", "zrangestore"),
+                    lambda source, dest, *args, **kwargs: [source, dest]),
+    **dict.fromkeys(("mset", "msetnx"),
+                    lambda mapping: list(mapping)),
+}
+
+class HashRing:
+    def __init__(self, nodes, points_per_node):
+        # Points come from the node names, not their positions: reordering the list moves no keys
+        points = sorted((_hash(f"{node}#{index}"), position)
+                        for position, node in enumerate(nodes) for index in range(points_per_node))
+        self.nodes = list(nodes)
+        self._hashes = [point for point, _ in points]
+        self._owners = [position for _, position in points]
+
+    def node_for(self, token):
+        """Get the position of the node owning a shard token"""
+        index = bisect.bisect(self._hashes, _hash(token)) % len(self._hashes)
+        return self._owners[index]
+
+class ShardedRedis:
+    """Redis client running each command on the node owning its keys"""
+    def __init__(self, clients, ring, route):
+        self.clients = clients
+        self.ring = ring
+        self.route = route
+
+    def node_of(self, key):
+        token = self.route(key) if len(self.clients) > 1 else None
+        return 0 if token is None else self.ring.node_for(token)
+
+    def command_node(self, name, args, kwargs):
+        """Get the node of the keys of a command, which must all live on the same node"""
+        keys = MULTI_KEY_COMMANDS[name](*args, **kwargs) if name in MULTI_KEY_COMMANDS else args[:1]
+        nodes = {self.node_of(key) for key in keys}
+        if len(nodes) > 1:
+            raise ValueError(f"{name}: the keys {', '.join(map(str, keys))} live on different Redis nodes")
+        return nodes.pop() if nodes else 0
+
+    def pipeline(self, transaction=True):
+        return ShardedPipeline(self, transaction)
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            return getattr(self.clients[self.command_node(name, args, kwargs)], name)(*args, **kwargs)
+        return command
+
+class ShardedPipeline:
+    """One pipeline per node, behind the interface of a redis-py pipeline: execute() returns the
+    replies in the order the commands were queued. Transactions and WATCH hold per node only."""
+    def __init__(self, sharded, transaction):
+        self._sharded = sharded
+        self._transaction = transaction
+        self._pipes = {}
+        self._queued = []    # node of each queued command
+        self._watching = False
+
+    def _pipe(self, node):
+        if node not in self._pipes:
+            self._pipes[node] = self._sharded.clients[node].pipeline(transaction=self._transaction)
+        return self._pipes[node]
+
+    def watch(self, *keys):
+        by_node = {}
+        for key in keys:
+            by_node.setdefault(self._sharded.node_of(key), []).append(key)
+        for node, node_keys in by_node.items():
+            self._pipe(node).watch(*node_keys)
+        self._watching = True
+
+    def multi(self):
+        for pipe in self._pipes.values():
+            if pipe.watching:
+                pipe.multi()
+        self._watching = False
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            node = self._sharded.command_node(name, args, kwargs)
+            if self._watching:
+                # Between WATCH and MULTI commands run immediately, as in a redis-py pipeline
+                pipe = self._pipes.get(node)
+                target = pipe if pipe is not None and pipe.watching else self._sharded.clients[node]
+                return getattr(target, name)(*args, **kwargs)
+            getattr(self._pipe(node), name)(*args, **kwargs)
+            self._queued.append(node)
+            return self
+        return command
+
+    def execute(self):
+        # The first node holds the idempotency markers and the counters, which are not idempotent:
+        # it runs last, so if another node fails nothing was counted and the whole batch can be retried
+        replies = {}
+        try:
+            for node in sorted(self._pipes, key=lambda node: node == 0):
+                replies[node] = iter(self._pipes[node].execute())
+            return [next(replies[node]) for node in self._queued]
+        finally:
+            self.reset()
+
+    def reset(self):
+        for pipe in self._pipes.values():
+            pipe.reset()
+        self._pipes = {}
+        self._queued = []
+        self._watching = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.reset()
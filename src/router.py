@@ -0,0 +1,129 @@
+"""
+Route table of the HTTP server
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+Routes are declared with a pattern such as "/orders/remove/{order_id:int}" and compiled once:
+patterns without parameters go in a dict of exact paths, the others in a trie of path segments.
+A lookup costs one dict access, or one trie step per segment, whatever the number of routes.
+Parameter types: int, str (one segment), path (every remaining segment, last in the pattern).
+"""
+
+CONVERTERS = {"int": int, "str": str, "path": str}
+
+class Route:
+    """A route and its policies: rate limiting class (None for no backend work, e.g. assets),
+    Cache-Control header, gzip compression of the response, socket timeout of the request"""
+    def __init__(self, method, pattern, handler, rate_class="read", cache=None, compress=False, timeout=None):
+        self.method = method
+        self.pattern = pattern
+        self.handler = handler
+        self.rate_class = rate_class
+        self.cache = cache
+        self.compress = compress
+        self.timeout = timeout
+
+class _Node:
+    def __init__(self):
+        self.children = {}      # literal segment -> _Node
+        self.param = None       # (name, converter, _Node) for a {name:type} segment
+        self.rest = None        # (name, {method: Route}) for a trailing {name:path}
+        self.routes = {}        # method -> Route ending at this node
+
+def _parse_segment(segment):
+    """Get (name, type) of a {name:type} segment, None for a literal one"""
+    if segment.startswith("{") and segment.endswith("}"):
+        name, _, kind = segment[1:-1].partition(":")
+        kind = kind or "str"
+        if kind not in CONVERTERS:
+            raise ValueError(f"Unknown parameter type '{kind}' in route segment {segment}")
+        return name, kind
+    return None
+
+def _split(path):
+    return [segment for segment in path.split("/") if segment]
+
+class Router:
+    def __init__(self):
+        self._routes = []
+        self._exact = {}
+        self._root = _Node()
+
+    def add(self, method, pattern, handler, **policies):
+        self._routes.append(Route(method, pattern, handler, **policies))
+
+    def get(self, pattern, handler, **policies):
+        self.add("GET", pattern, handler, **policies)
+
+    def post(self, pattern, handler, **policies):
+        self.add("POST", pattern, handler, **policies)
+
+    def compile(self):
+        """Build the exact-path dict and the trie from the declared routes"""
+        self._exact, self._root = {}, _Node()
+        for route in self._routes:
+            segments = _split(route.pattern)
+            if not any(_parse_segment(segment) for segment in segments):
+                self._exact.setdefault("/" + "/".join(segments), {})[route.method] = route
+                continue
+            node = self._root
+            for index, segment in enumerate(segments):
+                parsed = _parse_segment(segment)
+                if parsed is None:
+                    node = node.children.setdefault(segment, _Node())
+                elif parsed[1] == "path":
+                    if index != len(segments) - 1:
+                        raise ValueError(f"A path parameter must end the route: {route.pattern}")
+                    if node.rest is None:
+                        node.rest = (parsed[0], {})
+                    node.rest[1][route.method] = route
+                    break
+                else:
+                    if node.param is None:
+                        node.param = (parsed[0], CONVERTERS[parsed[1]], _Node())
+                    elif node.param[:2] != (parsed[0], CONVERTERS[parsed[1]]):
+                        raise ValueError(f"Conflicting parameters at the same position: {route.pattern}")
+                    node = node.param[2]
+            else:
+                node.routes[route.method] = route
+        return self
+
+    def _lookup(self, path):
+        """Get ({method: Route}, params) of a path, ({}, {}) if no route matches it"""
+        routes = self._exact.get(path if path == "/" else path.rstrip("/"))
+        if routes:
+            return routes, {}
+        return self._walk(self._root, _split(path), 0, {})
+
+    def _walk(self, node, segments, index, params):
+        if index == len(segments):
+            if node.routes:
+                return node.routes, params
+            return {}, {}
+        segment = segments[index]
+        # Literal segments take precedence over parameters, and parameters over a trailing path
+        child = node.children.get(segment)
+        if child is not None:
+            routes, found = self._walk(child, segments, index + 1, params)
+            if routes:
+                return routes, found
+        if node.param is not None:
+            name, convert, child = node.param
+            try:
+                value = convert(segment)
+            except ValueError:
+                value = None
+            if value is not None:
+                routes, found = self._walk(child, segments, index + 1, {**params, name: value})
+                if routes:
+                    return routes, found
+        if node.rest is not None:
+            name, routes = node.rest
+            return routes, {**params, name: "/".join(segments[index:])}
+        return {}, {}
+
+    def match(self, method, path):
+        """Get (route, params, allowed methods) of a request; route is None if the path or the method doesn't match"""
+        routes, params = self._lookup(path)
+        route = routes.get(method)
+        return route, (params if route else {}), sorted(routes)
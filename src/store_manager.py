@@ -3,75 +3,158 @@ Store manager application
 SPDX - License - Identifier: LGPL - 3.0 - or -later
 Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
 """
+import gzip
+import itertools
+import json
+import logging
+import math
 import os
-from urllib.parse import parse_qs
-from http.server import BaseHTTPRequestHandler, HTTPServer
-from views.template_view import show_main_menu, show_404_page
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config
+from admission import check_rate_limit, mysql_slot
+from router import Router
+from db import read_your_writes, start_pool_liveness_check
+from logs import configure_logging, current_request, request_scope
+from views.template_view import show_main_menu, show_404_page, get_template, get_param
 from views.user_view import show_user_form, register_user, remove_user
 from views.product_view import show_product_form, register_product, remove_product
 from views.order_view import show_order_form, register_order, remove_order
-from views.report_view import show_highest_spending_users, show_best_sellers
+from views.report_view import show_highest_spending_users, show_best_sellers, show_distinct_buyers
+from views.api_view import handle_api_request
+from queries.export_orders import EXPORT_FORMATS, export_orders, iter_chunks
+from commands.bulk_import import IMPORT_KINDS, import_csv
 from commands.write_order import sync_all_orders_to_redis
+from commands.write_user import sync_all_users_to_redis
+from commands.write_product import sync_all_products_to_redis
+from commands.order_projector import start_order_projector
+from commands.write_stock import load_stock_levels, start_stock_flusher
+from commands.order_retention import start_order_retention
+from migrations import run_migrations
+
+logger = logging.getLogger(__name__)
 
 class StoreManager(BaseHTTPRequestHandler):
     def do_GET(self):
         """ Handle GET requests received by the http.server """
-        id = self.path.split("/")[-1]
-        if self.path == "/" or self.path == "/home":
-            self._send_html(show_main_menu())
-            return
-        if self.path == "/users":
-            self._send_html(show_user_form())
-        elif self.path.startswith("/users/remove/"):
-            response = remove_user(id)
-            self._send_html(response)
-        elif self.path == "/products":
-            self._send_html(show_product_form())
-        elif self.path.startswith("/products/remove/"):
-            response = remove_product(id)
-            self._send_html(response)
-        elif self.path == "/orders":
-            self._send_html(show_order_form())
-        elif self.path.startswith("/orders/remove/"):
-            response = remove_order(id)
-            self._send_html(response)
-        elif self.path == "/orders/reports/highest_spenders":
-            self._send_html(show_highest_spending_users())
-        elif self.path == "/orders/reports/best_sellers":
-            self._send_html(show_best_sellers())
-        elif "/assets" in self.path: # load assets such as images, CSS, etc.
-            self.load_asset()      
-        else:
-            self._send_html(show_404_page(), status=404)
+        self._dispatch()
 
     def do_POST(self):
         """ Handle POST requests received by the http.server """
+        self._dispatch()
+
+    def _dispatch(self):
+        """ Find the route of the request, apply its policies, then call its handler """
+        url = urlparse(self.path)
+        # A valid request ID set by the proxy or the client is kept, so its logs can be joined with theirs
+        with request_scope(self.command, url.path, self.headers.get("X-Request-ID")):
+            self._dispatch_url(url)
+
+    def _dispatch_url(self, url):
+        self.route, params, allowed = ROUTER.match(self.command, url.path)
+        if self.route is None:
+            if allowed:
+                self._send_html(get_template("<h2>405 Méthode non permise</h2>"), status=405,
+                                headers={"Allow": ", ".join(allowed)})
+            else:
+                self._send_html(show_404_page(), status=404)
+            return
+        current_request().route = self.route.pattern
+        if self.route.timeout:
+            self.connection.settimeout(self.route.timeout)
+        self._admit_and_handle(lambda: self.route.handler(self, params, parse_qs(url.query)))
+
+    def _admit_and_handle(self, handler):
+        """ Apply the client's rate limit and the MySQL concurrency cap before any backend work """
+        if self.route.rate_class is None:
+            with read_your_writes():
+                handler()
+            return
+        retry_after = check_rate_limit(self._get_client_id(), self.route.rate_class)
+        if retry_after is None:
+            with mysql_slot() as acquired:
+                if acquired:
+                    with read_your_writes():
+                        handler()
+                    return
+            retry_after = config.MYSQL_SLOT_WAIT
+        self._send_html(get_template("<h2>429 Trop de requêtes</h2><p>Veuillez réessayer dans quelques instants.</p>"),
+                        status=429, headers={"Retry-After": str(math.ceil(retry_after))})
+
+    def send_response(self, code, message=None):
+        """ Record the status of the request for its log record, and tell the client its request ID """
+        super().send_response(code, message)
+        context = current_request()
+        if context is not None:
+            context.status = code
+            self.send_header("X-Request-ID", context.request_id)
+
+    def log_request(self, code="-", size="-"):
+        """ The request is logged by logs.request_scope, with its timing """
+
+    def log_message(self, format, *args):
+        """ Send the messages of http.server (e.g. malformed requests) to the logging queue rather than stderr """
+        logger.warning(format, *args, extra={"client": self.address_string()})
+
+    def _get_client_id(self):
+        """ Get the client IP address, from the proxy header if it is trusted """
+        forwarded_for = self.headers.get("X-Forwarded-For")
+        if config.TRUST_PROXY_HEADERS and forwarded_for:
+            return forwarded_for.split(",")[0].strip()
+        return self.client_address[0]
+
+    def _read_form(self):
+        """ Read the url-encoded form sent as the request body """
         content_length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(content_length).decode("utf-8")
-        params = parse_qs(body)
-        if self.path == "/users/add":
-            response = register_user(params)
-            self._send_html(response)
-        elif self.path == "/products/add":
-            response = register_product(params)
-            self._send_html(response)
-        elif self.path == "/orders/add":
-            response = register_order(params)
-            self._send_html(response)
+        return parse_qs(self.rfile.read(content_length).decode("utf-8"))
+
+    def _add_order(self):
+        params = self._read_form()
+        # Terminals may send their retry key as a header rather than a form field
+        if self.headers.get("Idempotency-Key"):
+            params.setdefault("idempotency_key", [self.headers.get("Idempotency-Key")])
+        self._send_html(register_order(params))
+
+    def _send_api(self, resource, query):
+        status, body, headers = handle_api_request(f"/api/{resource}", query, self.headers.get("If-None-Match"))
+        self._send_json(body, status, headers)
+
+    def _handle_import(self, kind):
+        """ Import the CSV sent as the request body (e.g. curl --data-binary @products.csv), reply with a JSON report """
+        lines = self._iter_body_lines()
+        if kind not in IMPORT_KINDS:
+            status, report = 404, {"error": "Type d'import inconnu."}
         else:
-            self._send_html(show_404_page(), status=404)
+            try:
+                status, report = 200, import_csv(kind, lines)
+            except ValueError as e:
+                status, report = 400, {"error": str(e)}
+        for _ in lines:
+            pass  # read what a rejected import left of the body before answering
+        self._send_json(json.dumps(report, ensure_ascii=False).encode("utf-8"), status)
 
-    def load_asset(self):
+    def _iter_body_lines(self):
+        """ Read the request body line by line, without loading it in memory """
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining > 0:
+            line = self.rfile.readline(remaining)
+            if not line:
+                return
+            remaining -= len(line)
+            yield line.decode("utf-8")
+
+    def load_asset(self, asset_path):
         """ Load assets from disk based on requested path, then send file contents as a response to the client """
-        path_parts = self.path.split(".")
-        extension = path_parts[1] if len(path_parts) >= 2 else None
-        base_directory = os.path.dirname(__file__)
-        with open(base_directory + self.path, "r") as file:
-            css = "".join(file.readlines())
-            self.send_response(200)
-            self.send_header("Content-type", self.get_mimetype(extension))
-            self.end_headers()
-            self.wfile.write(css.encode("utf-8"))
+        if any(part in ("", ".", "..") for part in asset_path.split("/")):
+            self._send_html(show_404_page(), status=404)
+            return
+        extension = os.path.splitext(asset_path)[1].lstrip(".") or None
+        file_path = os.path.join(os.path.dirname(__file__), "assets", *asset_path.split("/"))
+        if not os.path.isfile(file_path):
+            self._send_html(show_404_page(), status=404)
+            return
+        with open(file_path, "rb") as file:
+            self._send_body(file.read(), 200, self.get_mimetype(extension))
 
     def get_mimetype(self, extension):
         """ Get mimetype (https://developer.mozilla.org/en-US/docs/Web/HTTP/Guides/MIME_types/Common_types) """
@@ -81,22 +164,137 @@ class StoreManager(BaseHTTPRequestHandler):
             return "text/css"
         elif (extension == "js"):
             return "text/javascript"
+        elif (extension == "json"):
+            return "application/json"
         elif (extension == "svg"):
             return "image/svg+xml"
         else:
             return "application/octet-stream"
 
-    def _send_html(self, html, status=200):
+    def _send_html(self, html, status=200, headers=None):
         """ Send given HTML string as a response to the client """
+        self._send_body(html.encode("utf-8"), status, self.get_mimetype("html"), headers)
+
+    def _send_body(self, body, status, content_type, headers=None):
+        """ Send a complete response, with the Cache-Control and compression policies of the route """
+        route = getattr(self, "route", None)
+        headers = dict(headers or {})
+        if route and route.cache and status == 200:
+            headers.setdefault("Cache-Control", route.cache)
+        if route and route.compress and len(body) >= config.COMPRESS_MIN_SIZE \
+                and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=config.COMPRESS_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
         self.send_response(status)
-        self.send_header("Content-type", self.get_mimetype("html"))
+        self.send_header("Content-type", content_type)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
         self.end_headers()
-        self.wfile.write(html.encode("utf-8"))
+        if status != 304:
+            self.wfile.write(body)
+
+    def _send_export(self, query):
+        """ Stream an orders export (?format=ndjson|csv&start=AAAA-MM-JJ&end=AAAA-MM-JJ&archive=1) in chunks """
+        fmt = get_param(query, "format") or "ndjson"
+        try:
+            lines = export_orders(fmt, get_param(query, "start") or None, get_param(query, "end") or None,
+                                  include_archive=get_param(query, "archive") == "1")
+        except ValueError as e:
+            self._send_html(get_template(f"<h2>400 Requête invalide</h2><p>{e}</p>"), status=400)
+            return
+        # The first chunk is read before the status line, so a failing query still gets a 500
+        chunks = iter_chunks(lines)
+        try:
+            first_chunk = next(chunks, b"")
+        except Exception:
+            logger.exception("export en échec")
+            lines.close()
+            self._send_html(get_template("<h2>500 Erreur</h2><p>L'export a échoué. Veuillez consulter les logs pour plus d'informations.</p>"), status=500)
+            return
+
+        # Chunked transfer needs HTTP/1.1; an HTTP/1.0 client reads until the connection closes
+        chunked = self.request_version == "HTTP/1.1"
+        if chunked:
+            self.protocol_version = "HTTP/1.1"
+        self.send_response(200)
+        self.send_header("Content-type", EXPORT_FORMATS[fmt])
+        self.send_header("Content-Disposition", f'attachment; filename="orders.{fmt}"')
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        # Each write blocks while the client's socket buffer is full, which pauses the MySQL cursor:
+        # a slow client slows the export down instead of growing a buffer (the route's timeout drops stalled clients)
+        try:
+            for chunk in itertools.chain((first_chunk,) if first_chunk else (), chunks):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk) if chunked else chunk)
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+        except (ConnectionError, TimeoutError) as e:
+            logger.warning("export interrompu : %s", e)
+        except Exception:
+            # The status line is already sent: closing without the last chunk tells the client the export is incomplete
+            logger.exception("export en échec")
+        finally:
+            lines.close()
+
+    def _send_json(self, body, status=200, headers=None):
+        """ Send given JSON bytes as a response to the client (no body for 304) """
+        self._send_body(body, status, self.get_mimetype("json"), headers)
+
+# Rate classes: "read", "write" (changes data), "report" (aggregations and exports), None (no backend work)
+ROUTER = Router()
+ROUTER.get("/", lambda request, params, query: request._send_html(show_main_menu()), compress=True)
+ROUTER.get("/home", lambda request, params, query: request._send_html(show_main_menu()), compress=True)
+ROUTER.get("/users", lambda request, params, query: request._send_html(show_user_form()), compress=True)
+ROUTER.get("/users/remove/{user_id:int}", lambda request, params, query: request._send_html(remove_user(params["user_id"])),
+           rate_class="write")
+ROUTER.post("/users/add", lambda request, params, query: request._send_html(register_user(request._read_form())),
+            rate_class="write")
+ROUTER.get("/products", lambda request, params, query: request._send_html(show_product_form()), compress=True)
+ROUTER.get("/products/remove/{product_id:int}",
+           lambda request, params, query: request._send_html(remove_product(params["product_id"])), rate_class="write")
+ROUTER.post("/products/add", lambda request, params, query: request._send_html(register_product(request._read_form())),
+            rate_class="write")
+ROUTER.get("/orders", lambda request, params, query: request._send_html(show_order_form(query)), compress=True)
+ROUTER.get("/orders/remove/{order_id:int}", lambda request, params, query: request._send_html(remove_order(params["order_id"])),
+           rate_class="write")
+ROUTER.post("/orders/add", lambda request, params, query: request._add_order(), rate_class="write")
+ROUTER.get("/orders/reports/highest_spenders",
+           lambda request, params, query: request._send_html(show_highest_spending_users(query)), rate_class="report")
+ROUTER.get("/orders/reports/best_sellers",
+           lambda request, params, query: request._send_html(show_best_sellers(query)), rate_class="report")
+ROUTER.get("/orders/reports/distinct_buyers",
+           lambda request, params, query: request._send_html(show_distinct_buyers(query)), rate_class="report")
+ROUTER.get("/orders/export", lambda request, params, query: request._send_export(query), rate_class="report",
+           timeout=config.EXPORT_SEND_TIMEOUT)
+ROUTER.post("/import/{kind:str}", lambda request, params, query: request._handle_import(params["kind"]), rate_class="write")
+ROUTER.get("/api/reports/{report:str}", lambda request, params, query: request._send_api(f"reports/{params['report']}", query),
+           rate_class="report", cache="no-cache", compress=True)
+ROUTER.get("/api/{resource:path}", lambda request, params, query: request._send_api(params["resource"], query),
+           cache="no-cache", compress=True)
+ROUTER.get("/assets/{asset_path:path}", lambda request, params, query: request.load_asset(params["asset_path"]),
+           rate_class=None, cache=f"public, max-age={config.ASSETS_MAX_AGE}", compress=True)
+ROUTER.compile()
 
 if __name__ == "__main__":
     """ Init des données db + redis"""
+    configure_logging()
+    run_migrations()
     added = sync_all_orders_to_redis()
+    sync_all_users_to_redis()
+    sync_all_products_to_redis()
+    load_stock_levels()
+    start_order_projector()
+    start_stock_flusher()
+    start_order_retention()
+    start_pool_liveness_check()
 
-    server = HTTPServer(("0.0.0.0", 5000), StoreManager)
-    print("Server running on http://0.0.0.0:5000")
+    # One thread per request, so a slow backend call does not hold every client (see MYSQL_MAX_CONCURRENCY)
+    server = ThreadingHTTPServer(("0.0.0.0", 5000), StoreManager)
+    logger.info("Server running on http://0.0.0.0:5000")
     server.serve_forever()
@@ -0,0 +1,60 @@
+"""
+Tests for the structured logging
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+import json
+import logging
+import queue
+import pytest
+from logs import JsonFormatter, NonBlockingQueueHandler, record_backend_call, request_scope
+
+@pytest.fixture
+def capture():
+    """Send the records of the test logger and of the access log to a queue, restoring both loggers afterwards"""
+    loggers = [logging.getLogger("tests.logs"), logging.getLogger("access")]
+    saved = [(logger.handlers, logger.propagate, logger.level) for logger in loggers]
+
+    def capture(maxsize=100):
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize))
+        for logger in loggers:
+            logger.handlers = [handler]
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+        return handler, loggers[0]
+
+    yield capture
+    for logger, (handlers, propagate, level) in zip(loggers, saved):
+        logger.handlers = handlers
+        logger.propagate = propagate
+        logger.setLevel(level)
+
+def test_request_records_are_json_lines_with_request_fields(capture):
+    handler, logger = capture()
+    formatter = JsonFormatter(handler)
+    with request_scope("GET", "/orders", "abc123") as context:
+        context.route = "/orders"
+        context.status = 200
+        record_backend_call("mysql", 0.002)
+        record_backend_call("redis", 0.001)
+        record_backend_call("redis", 0.001)
+        logger.info("commande %s lue", 7)
+
+    message, summary = [json.loads(formatter.format(handler.queue.get_nowait())) for _ in range(2)]
+    assert message["message"] == "commande 7 lue" and message["request_id"] == "abc123"
+    assert summary["message"] == "requête" and summary["route"] == "/orders" and summary["status"] == 200
+    assert summary["mysql_calls"] == 1 and summary["redis_calls"] == 2 and summary["duration_ms"] >= 0
+
+def test_invalid_request_id_is_replaced(capture):
+    capture()
+    for request_id in ("abc\r\nSet-Cookie: x=1", "a" * 65, ""):
+        with request_scope("GET", "/orders", request_id) as context:
+            context.status = 200
+        assert context.request_id != request_id and len(context.request_id) == 16
+
+def test_full_queue_drops_records_without_blocking(capture):
+    handler, logger = capture(maxsize=1)
+    for index in range(5):
+        logger.warning("message %d", index)
+    entry = json.loads(JsonFormatter(handler).format(handler.queue.get_nowait()))
+    assert entry["message"] == "message 0" and entry["records_dropped"] == 4
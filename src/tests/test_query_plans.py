@@ -0,0 +1,63 @@
+"""
+Tests for query plans: every query of the application must be served by an index
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+from sqlalchemy import event, text
+from db import engine
+from migrations import run_migrations
+from controllers.order_controller import create_order, remove_order
+from commands.order_projector import project_pending_events
+from queries.read_order import get_orders_from_mysql
+from queries.read_product import get_products, get_product_by_id
+from queries.read_user import get_users, get_user_by_id
+from queries.read_report import get_highest_spending_users_from_mysql, get_most_sold_products_from_mysql
+
+def _add_and_remove_order():
+    order_id = create_order(1, [{'product_id': 1, 'quantity': 1}])
+    remove_order(int(order_id))
+
+# Real application calls; the SELECT statements they send to MySQL are captured and explained
+CALLS = [
+    lambda: get_orders_from_mysql(10),
+    lambda: get_products(10),
+    lambda: get_product_by_id(1),
+    lambda: get_users(10),
+    lambda: get_user_by_id(1),
+    lambda: get_highest_spending_users_from_mysql(10),
+    lambda: get_most_sold_products_from_mysql(10),
+    _add_and_remove_order,
+    project_pending_events,
+]
+
+def _capture_selects(calls):
+    """ Run the calls and return the (statement, parameters) of every SELECT they issue """
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        for call in calls:
+            call()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+def test_queries_do_not_scan_full_tables():
+    run_migrations()
+    statements = _capture_selects(CALLS)
+    assert statements
+
+    full_scans = []
+    with engine.connect() as conn:
+        # With only a few rows in the test database, a scan is always "cheaper": make the optimizer cost plans as on a large table
+        conn.execute(text("SET SESSION max_seeks_for_key = 1"))
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql("EXPLAIN " + statement, parameters).mappings().all()
+            for row in plan:
+                if row["type"] == "ALL" and not str(row["table"]).startswith("<"):
+                    full_scans.append(f"{row['table']}: {' '.join(statement.split())}")
+    assert full_scans == []
@@ -0,0 +1,69 @@
+"""
+Tests for the consistent hash ring and the sharded projection
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+The projection test uses the nodes of REDIS_NODES, e.g. several local Redis processes
+(REDIS_NODES=localhost:6379/0,localhost:6380/0), or the single default node.
+"""
+from datetime import datetime
+import pytest
+from redis_shards import HashRing, ShardedRedis
+from queries.order_projection import (ORDER_INDEX_KEY, get_projection_conn, order_detail_keys, order_shard_token,
+                                      read_order_projections, remove_order_projection, write_order_projection)
+
+NODES = ["redis-1:6379/0", "redis-2:6379/0", "redis-3:6379/0"]
+
+def test_ring_spreads_keys_over_every_node():
+    ring = HashRing(NODES, 160)
+    counts = [0] * len(NODES)
+    for order_id in range(30000):
+        counts[ring.node_for(order_id)] += 1
+    assert min(counts) > 30000 / len(NODES) * 0.8
+
+def test_adding_a_node_moves_only_its_share():
+    before = HashRing(NODES, 160)
+    after = HashRing(NODES + ["redis-4:6379/0"], 160)
+    moved = [order_id for order_id in range(30000) if before.node_for(order_id) != after.node_for(order_id)]
+    assert len(moved) < 30000 * 0.35
+    assert all(after.node_for(order_id) == 3 for order_id in moved)
+
+class RecordingClient:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args))
+
+def test_multi_key_commands_need_their_keys_on_one_node():
+    clients = [RecordingClient() for _ in NODES]
+    r = ShardedRedis(clients, HashRing(NODES, 160), order_shard_token)
+    first = r.node_of("order:1")
+    other = next(order_id for order_id in range(2, 100) if r.node_of(f"order:{order_id}") != first)
+
+    with pytest.raises(ValueError):
+        r.delete("order:1", f"order:{other}")
+    with pytest.raises(ValueError):
+        r.pipeline().zunionstore("orders:by_date", ["order:1", f"order:{other}"])
+    r.delete("order:1", "order:1:items")
+    assert clients[first].calls == [("delete", ("order:1", "order:1:items"))]
+
+def test_sharded_pipeline_keeps_reply_order():
+    order_ids = [999999001, 999999002, 999999003, 999999004]
+    r = get_projection_conn()
+    pipe = r.pipeline()
+    for order_id in order_ids:
+        write_order_projection(pipe, order_id, 1, 10.0, [{"product_id": 1, "quantity": 1, "unit_price": 10.0}],
+                               datetime.utcnow())
+    pipe.execute()
+    orders = read_order_projections(order_ids, with_items=True)
+    assert [order["id"] for order in orders] == [str(order_id) for order_id in order_ids]
+    assert all(r.exists(order_detail_keys(order_id)[0]) for order_id in order_ids)
+
+    pipe = r.pipeline()
+    for order_id in order_ids:
+        remove_order_projection(pipe, order_id)
+    replies = pipe.execute()
+    # First reply of each removal: the detail key existed
+    assert all(replies[index * 3] for index in range(len(order_ids)))
+    assert r.zscore(ORDER_INDEX_KEY, order_ids[0]) is None
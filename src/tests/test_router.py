@@ -0,0 +1,37 @@
+"""
+Tests for the route table
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+"""
+from router import Router
+
+def _router():
+    router = Router()
+    router.get("/orders", "list")
+    router.get("/orders/remove/{order_id:int}", "remove", rate_class="write")
+    router.get("/orders/reports/{report:str}", "report", rate_class="report")
+    router.post("/orders/add", "add", rate_class="write")
+    router.get("/assets/{asset_path:path}", "asset", rate_class=None)
+    return router.compile()
+
+def test_exact_and_typed_parameters():
+    router = _router()
+    route, params, _ = router.match("GET", "/orders")
+    assert route.handler == "list" and params == {}
+    route, params, _ = router.match("GET", "/orders/remove/42")
+    assert route.handler == "remove" and route.rate_class == "write" and params == {"order_id": 42}
+    route, params, _ = router.match("GET", "/orders/reports/best_sellers")
+    assert route.handler == "report" and params == {"report": "best_sellers"}
+    assert router.match("GET", "/orders/remove/abc")[0] is None
+
+def test_path_parameter_is_anchored_at_its_prefix():
+    router = _router()
+    route, params, _ = router.match("GET", "/assets/img/logo.svg")
+    assert route.handler == "asset" and route.rate_class is None and params == {"asset_path": "img/logo.svg"}
+    assert router.match("GET", "/foo/assets/light.css") == (None, {}, [])
+
+def test_method_dispatch():
+    router = _router()
+    route, _, allowed = router.match("GET", "/orders/add")
+    assert route is None and allowed == ["POST"]
+    assert router.match("POST", "/orders/add")[0].handler == "add"
@@ -3,10 +3,36 @@ Tests for orders manager
 SPDX - License - Identifier: LGPL - 3.0 - or -later
 Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
 """
+import io
+import json
+import uuid
+from datetime import datetime
 from commands.write_order import sync_all_orders_to_redis
+from commands.order_projector import project_pending_events
 from controllers.order_controller import create_order, remove_order
-from db import get_redis_conn
+from controllers.product_controller import create_product, delete_product
+from commands.write_stock import set_stock
+from db import engine, get_redis_conn, get_read_engine, read_your_writes, get_pool_stats
+from db_pool import check_idle_connections
+from fanout import fetch_all
+from queries.read_report import get_most_sold_products_from_mysql
+from queries.read_user import get_users_by_ids
+from queries.read_product import get_products, ProductRow
+from queries.read_order import get_order_by_id
+from queries.order_projection import ORDER_INDEX_KEY, read_order_projections, remove_order_projection, write_order_projection, pack_order, unpack_order, pack_items, unpack_items
 from views.report_view import show_highest_spending_users, show_best_sellers
+from views.order_view import show_order_form
+from views.api_view import handle_api_request
+from queries.export_orders import export_orders
+from commands.bulk_import import import_csv
+from commands.reconcile import reconcile
+from commands.projection_memory import measure_projection_memory
+from commands.order_archival import archive_cold_orders
+from queries.search import search
+from queries.read_buyers import get_product_buyers, get_product_buyers_from_mysql, get_daily_buyers
+from sqlalchemy import create_engine, text
+import config
+import db
 """
 AJout
 """
@@ -23,6 +49,7 @@ def test_add_remove_order():
     assert isinstance(order_id, int)
     assert order_id > 0
 
+    project_pending_events()
     r = get_redis_conn()
     order_in_redis = r.keys(f"order:{order_id}")
     assert len(order_in_redis) == 1
@@ -30,6 +57,7 @@ def test_add_remove_order():
     removal_status = remove_order(int(order_id))
     assert removal_status == 1
 
+    project_pending_events()
     order_in_redis = r.keys(f"order:{order_id}")
     assert len(order_in_redis) == 0
 
@@ -47,3 +75,242 @@ def test_report_best_sellers():
     assert "<ul>" in report_html
     assert "<li>" in report_html
     assert "Les articles les plus vendus" in report_html
+
+def test_fetch_all_partial_failure():
+    def fail():
+        raise RuntimeError("backend indisponible")
+    results = fetch_all({"ok": lambda: 42, "ko": fail, "message": lambda: "Une erreur s'est produite"},
+                        defaults={"ko": [], "message": []})
+    assert results == {"ok": 42, "ko": [], "message": []}
+
+def test_report_summaries_follow_orders():
+    def sold(name):
+        return dict(get_most_sold_products_from_mysql(100)).get(name, 0)
+
+    before = sold("Laptop ABC")
+    order_id = create_order(1, [{'product_id': 1, 'quantity': 3}])
+    assert sold("Laptop ABC") == before + 3
+
+    remove_order(int(order_id))
+    assert sold("Laptop ABC") == before
+
+def test_report_best_sellers_window():
+    # A new product sold in a large quantity, so it is in the top 10 with exactly this quantity
+    name = f"Test best-seller {uuid.uuid4().hex[:8]}"
+    product_id = create_product(name, f"TEST-{uuid.uuid4().hex[:8]}", 1.0)
+    order_id = create_order(1, [{'product_id': product_id, 'quantity': 999}])
+    project_pending_events()
+
+    report_html = show_best_sellers({"window": ["week"]})
+    assert "Les articles les plus vendus (7 derniers jours)" in report_html
+    assert f"<li>{name} — 999 vendus</li>" in report_html
+
+    remove_order(int(order_id))
+    project_pending_events()
+    delete_product(product_id)
+
+def test_users_by_ids_read_through_redis():
+    r = get_redis_conn()
+    r.delete("user:1")
+    users = get_users_by_ids([1, 1])
+    assert users[1]["name"] == "Ada Lovelace"
+    assert r.hget("user:1", "name") == "Ada Lovelace"
+
+def test_add_order_idempotency_key():
+    items = [{'product_id': 3, 'quantity': 2}]
+    key = f"test-{uuid.uuid4().hex}"
+    order_id = create_order(1, items, key)
+    assert isinstance(order_id, int)
+    assert create_order(1, items, key) == order_id
+    remove_order(order_id)
+
+def test_order_reserves_stock():
+    product_id = create_product("Test stock", f"TEST-{uuid.uuid4().hex[:8]}", 10.0, 2)
+    r = get_redis_conn()
+
+    result = create_order(1, [{'product_id': product_id, 'quantity': 3}])
+    assert "Stock insuffisant" in result
+    assert r.get(f"stock:{product_id}") == "2"
+
+    order_id = create_order(1, [{'product_id': product_id, 'quantity': 2}])
+    assert r.get(f"stock:{product_id}") == "0"
+
+    remove_order(order_id)
+    assert r.get(f"stock:{product_id}") == "2"
+
+def test_deleted_order_releases_only_reserved_stock():
+    product_id = create_product("Test stock", f"TEST-{uuid.uuid4().hex[:8]}", 10.0)
+    order_id = create_order(1, [{'product_id': product_id, 'quantity': 2}])
+    # Tracked after the order was placed: its deletion has nothing to give back
+    set_stock(product_id, 5)
+    remove_order(order_id)
+    assert get_redis_conn().get(f"stock:{product_id}") == "5"
+
+def test_packed_order_round_trip():
+    record = pack_order(7, 59.5, datetime(2025, 9, 1, 12, 30))
+    assert unpack_order(42, record) == {"id": "42", "user_id": "7", "total": "59.5", "created_at": "2025-09-01T12:30:00"}
+    items = [{"product_id": 2, "quantity": 3, "unit_price": 59.5}, {"product_id": 4, "quantity": 1, "unit_price": 299.75}]
+    assert unpack_items(pack_items(items)) == items
+
+def test_evicted_order_read_through_mysql():
+    order_id = create_order(1, [{'product_id': 1, 'quantity': 1}])
+    project_pending_events()
+    r = get_redis_conn()
+    pipe = r.pipeline()
+    remove_order_projection(pipe, order_id)
+    pipe.execute()
+    assert r.zscore(ORDER_INDEX_KEY, order_id) is None
+
+    order = get_order_by_id(order_id)
+    assert order["id"] == str(order_id)
+    assert order["items"][0]["product_id"] == 1
+    remove_order(order_id)
+
+def test_reads_after_write_use_primary(monkeypatch):
+    class HealthyReplica:
+        # Never queried: only the engine chosen for the reads is checked
+        engine = create_engine("sqlite://")
+
+        def is_usable(self):
+            return True
+
+    replica = HealthyReplica()
+    monkeypatch.setattr(db, "replicas", [replica])
+    with read_your_writes():
+        assert get_read_engine() is replica.engine
+        order_id = create_order(1, [{'product_id': 1, 'quantity': 1}])
+        assert get_read_engine() is engine
+        assert fetch_all({"engine": get_read_engine})["engine"] is engine
+    # The next request reads from the replicas again
+    with read_your_writes():
+        assert get_read_engine() is replica.engine
+    remove_order(order_id)
+
+def test_api_users_fields_and_etag():
+    status, body, headers = handle_api_request("/api/users", {"limit": ["2"], "fields": ["id,name"]})
+    assert status == 200
+    users = json.loads(body)
+    assert len(users) <= 2 and all(set(user) == {"id", "name"} for user in users)
+
+    status, body, _ = handle_api_request("/api/users", {"limit": ["2"], "fields": ["id,name"]}, headers["ETag"])
+    assert status == 304 and body == b""
+
+def test_export_orders_streams_ndjson_and_csv():
+    order_id = create_order(1, [{'product_id': 1, 'quantity': 2}])
+    today = datetime.utcnow().date().isoformat()
+    orders = [json.loads(line) for line in export_orders("ndjson", today, today)]
+    exported = next(order for order in orders if order["id"] == order_id)
+    assert exported["items"][0]["product_id"] == 1
+
+    lines = list(export_orders("csv", today, today))
+    assert lines[0].startswith("order_id,user_id,total,created_at")
+    assert any(line.startswith(f"{order_id},") for line in lines[1:])
+    remove_order(order_id)
+
+def test_bulk_import_products_upsert_by_sku():
+    sku = f"IMP-{uuid.uuid4().hex[:8]}"
+    csv_lines = io.StringIO(f"name,sku,price,stock\nImporté,{sku},10,5\nInvalide,,10,\nImporté v2,{sku},12.5,\n")
+    report = import_csv("products", csv_lines, batch_size=1)
+    assert report["rows"] == 3 and report["imported"] == 2
+    assert [line for line, _ in report["errors"]] == [3]
+
+    with engine.connect() as conn:
+        product = conn.execute(text("SELECT id, name, price, stock FROM products WHERE sku = :sku"), {"sku": sku}).one()
+    assert (product.name, float(product.price), product.stock) == ("Importé v2", 12.5, 5)
+    assert get_redis_conn().get(f"stock:{product.id}") == "5"
+    delete_product(product.id)
+
+def test_pool_stats_and_liveness_check():
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    check_idle_connections(engine)
+    stats = get_pool_stats()["primary"]
+    assert stats["checkouts"] > 0
+    assert stats["checked_out"] == 0
+    assert stats["liveness_failures"] == 0
+
+def test_product_listing_returns_row_tuples():
+    products = get_products(5)
+    assert products and all(isinstance(product, ProductRow) for product in products)
+    assert [product.id for product in products] == sorted((product.id for product in products), reverse=True)
+
+def test_reconcile_repairs_missing_and_orphaned_orders():
+    order_id = create_order(1, [{'product_id': 1, 'quantity': 1}])
+    project_pending_events()
+    r = get_redis_conn()
+    pipe = r.pipeline()
+    remove_order_projection(pipe, order_id)
+    write_order_projection(pipe, 999999999, 1, 1.0, [], datetime.utcnow())
+    pipe.execute()
+
+    report = reconcile(repair=False)
+    assert report["missing"] >= 1 and report["orphaned"] >= 1
+    reconcile()
+    assert r.zscore(ORDER_INDEX_KEY, order_id) is not None
+    assert r.zscore(ORDER_INDEX_KEY, 999999999) is None
+    remove_order(order_id)
+
+def test_reconcile_repairs_stale_items():
+    order_id = create_order(1, [{'product_id': 1, 'quantity': 2}])
+    project_pending_events()
+    order = read_order_projections([order_id], with_items=True)[0]
+    pipe = get_redis_conn().pipeline()
+    write_order_projection(pipe, order_id, order["user_id"], order["total"], [{'product_id': 1, 'quantity': 1}],
+                           datetime.fromisoformat(order["created_at"]))
+    pipe.execute()
+
+    assert reconcile(repair=False)["stale"] >= 1
+    reconcile()
+    items = read_order_projections([order_id], with_items=True)[0]["items"]
+    assert [(item["product_id"], item["quantity"]) for item in items] == [(1, 2)]
+    remove_order(order_id)
+
+def test_archived_order_read_from_archive():
+    order_id = create_order(1, [{'product_id': 1, 'quantity': 1}])
+    project_pending_events()
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE orders SET created_at = NOW() - INTERVAL 400 DAY WHERE id = :id"), {"id": order_id})
+    orders, items = archive_cold_orders(days=365)
+    assert orders >= 1 and items >= 1
+    pipe = get_redis_conn().pipeline()
+    remove_order_projection(pipe, order_id)
+    pipe.execute()
+
+    assert get_order_by_id(order_id, include_archive=False) == {}
+    order = get_order_by_id(order_id)
+    assert order["id"] == str(order_id) and order["items"][0]["product_id"] == 1
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM orders_archive WHERE id = :id"), {"id": order_id})
+
+def test_distinct_buyers_estimate_close_to_exact():
+    order_id = create_order(1, [{'product_id': 1, 'quantity': 1}])
+    project_pending_events()
+    estimate, exact = get_product_buyers(1), get_product_buyers_from_mysql(1)
+    assert estimate >= 1 and abs(estimate - exact) <= max(1, exact * 0.03)
+    by_day, total = get_daily_buyers(7)
+    assert by_day[0][1] >= 1 and total >= by_day[0][1]
+    remove_order(order_id)
+
+def test_product_prefix_search():
+    sku = f"SRCH-{uuid.uuid4().hex[:8]}"
+    product_id = create_product(f"Écran Recherche {sku}", sku, 10.0)
+    assert [product["id"] for product in search("products", sku.lower())] == [product_id]
+    assert product_id in [product["id"] for product in search("products", "ecran recherche srch", 50)]
+    delete_product(product_id)
+    assert search("products", sku) == []
+
+def test_order_form_searches_without_javascript():
+    sku = f"SRCH-{uuid.uuid4().hex[:8]}"
+    product_id = create_product(f"Écran Formulaire {sku}", sku, 10.0)
+    page = show_order_form({"user_q": ["ada"], "product_q": [sku]})
+    assert '<select class="form-select" name="user_id" required><option value="1">Ada Lovelace' in page
+    assert f'<option value="{product_id}">Écran Formulaire {sku}' in page
+    delete_product(product_id)
+
+def test_memory_report_measures_both_formats():
+    order_id = create_order(1, [{'product_id': 1, 'quantity': 2}])
+    report = measure_projection_memory(sample_size=5)
+    assert set(report) == {"hash", "packed"}
+    assert all(usage["orders"] >= 1 and usage["bytes"] > 0 for usage in report.values())
+    assert get_redis_conn(db=config.REDIS_SCRATCH_DB).exists(f"order:{order_id}") == 0
+    remove_order(order_id)
@@ -0,0 +1,136 @@
+"""
+JSON API view
+SPDX - License - Identifier: LGPL - 3.0 - or -later
+Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
+
+Same data as the HTML views, built on the same queries/ functions:
+    GET /api/users, /api/products, /api/orders, /api/orders/{id}
+    GET /api/reports/highest_spenders, /api/reports/best_sellers (?window=...)
+    GET /api/reports/distinct_buyers (?product_id=... or ?window=..., &exact=1 to count in MySQL)
+    GET /api/pool: state and counters of the MySQL connection pools
+    GET /api/search/products, /api/search/users (?q=prefix): records whose name, SKU or email starts with q
+Query parameters: limit, fields (comma-separated). Every response has an ETag,
+an If-None-Match matching it returns 304 without a body.
+"""
+import hashlib
+import json
+import logging
+from operator import attrgetter, itemgetter
+import config
+from db import get_pool_stats
+from views.template_view import get_param
+from views.report_view import get_highest_spenders_rows, get_best_sellers_rows, get_distinct_buyers_rows
+from queries.read_user import get_users
+from queries.read_product import get_products
+from queries.read_order import get_orders_from_redis, get_order_by_id
+from queries.search import search
+
+logger = logging.getLogger(__name__)
+
+_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+def _optional(convert, key):
+    """ Read a field of a Redis order, an empty string becomes null """
+    def get(row):
+        value = row.get(key)
+        return convert(value) if value not in (None, "") else None
+    return get
+
+def _price(product):
+    return float(product.price)
+
+# {resource: (fetch(limit, query), {field: getter of the field from a row})}
+RESOURCES = {
+    "users": (lambda limit, query: get_users(limit), {
+        "id": attrgetter("id"),
+        "name": attrgetter("name"),
+        "email": attrgetter("email"),
+    }),
+    "products": (lambda limit, query: get_products(limit), {
+        "id": attrgetter("id"),
+        "name": attrgetter("name"),
+        "sku": attrgetter("sku"),
+        "price": _price,
+        "stock": attrgetter("stock"),
+    }),
+    "orders": (lambda limit, query: get_orders_from_redis(limit), {
+        "id": _optional(int, "id"),
+        "user_id": _optional(int, "user_id"),
+        "total": _optional(float, "total"),
+        "created_at": _optional(str, "created_at"),
+    }),
+    "reports/highest_spenders": (lambda limit, query: get_highest_spenders_rows(get_param(query, "window"), limit), {
+        "name": itemgetter(0),
+        "spent": itemgetter(1),
+    }),
+    "reports/best_sellers": (lambda limit, query: get_best_sellers_rows(get_param(query, "window"), limit), {
+        "name": itemgetter(0),
+        "sold": itemgetter(1),
+    }),
+    "reports/distinct_buyers": (lambda limit, query: get_distinct_buyers_rows(
+        get_param(query, "product_id"), get_param(query, "window"), get_param(query, "exact") == "1")[:limit], {
+        "label": itemgetter(0),
+        "buyers": itemgetter(1),
+    }),
+}
+
+ORDER_FIELDS = {**RESOURCES["orders"][1], "items": itemgetter("items")}
+
+def _parse_limit(query):
+    limit = get_param(query, "limit")
+    if not limit:
+        return config.API_DEFAULT_LIMIT
+    if not limit.isdigit() or int(limit) < 1:
+        raise ValueError("Le paramètre limit doit être un entier positif.")
+    return min(int(limit), config.API_MAX_LIMIT)
+
+def _select_fields(query, available):
+    """ Get the (name, getter) pairs of the requested fields, all of them by default """
+    fields = get_param(query, "fields")
+    if not fields:
+        return tuple(available.items())
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Champ(s) inconnu(s) : {', '.join(unknown)}. Champs disponibles : {', '.join(available)}.")
+    return tuple((name, available[name]) for name in names)
+
+def _response(status, payload, if_none_match=None):
+    """ Serialize once and build (status, body, headers); 304 with an empty body if the client has this version """
+    body = _encoder.encode(payload).encode("utf-8")
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if status == 200 and if_none_match:
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in candidates or etag in candidates:
+            return 304, b"", headers
+    return status, body, headers
+
+def handle_api_request(path, query, if_none_match=None):
+    """ Get (status, JSON body as bytes, headers) of a GET request on /api/... """
+    resource = path.removeprefix("/api/").strip("/")
+    try:
+        if resource == "pool":
+            return _response(200, get_pool_stats())
+        if resource.startswith("search/"):
+            limit = _parse_limit(query) if get_param(query, "limit") else None
+            return _response(200, search(resource.removeprefix("search/"), get_param(query, "q"), limit), if_none_match)
+        if resource.startswith("orders/") and resource.removeprefix("orders/").isdigit():
+            order = get_order_by_id(int(resource.removeprefix("orders/")))
+            if not order:
+                return _response(404, {"error": "Commande introuvable."})
+            fields = _select_fields(query, ORDER_FIELDS)
+            return _response(200, {name: get(order) for name, get in fields}, if_none_match)
+
+        if resource not in RESOURCES:
+            return _response(404, {"error": "Ressource introuvable."})
+        fetch, available = RESOURCES[resource]
+        fields = _select_fields(query, available)
+        rows = fetch(_parse_limit(query), query)
+    except ValueError as e:
+        return _response(400, {"error": str(e)})
+    except Exception:
+        logger.exception("API %s en échec", resource)
+        return _response(500, {"error": "Une erreur s'est produite. Veuillez consulter les logs pour plus d'informations."})
+
+    return _response(200, [{name: get(row) for name, get in fields} for row in rows], if_none_match)
@@ -3,26 +3,60 @@ Order view
 SPDX - License - Identifier: LGPL - 3.0 - or -later
 Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
 """
+import html
 import numbers
+import uuid
+from fanout import fetch_all
 from views.template_view import get_template, get_param
-from controllers.order_controller import create_order, delete_order, list_orders_from_mysql
-from controllers.product_controller import list_products
-from controllers.user_controller import list_users
+from controllers.order_controller import create_order, delete_order, list_orders_from_redis
+from queries.search import search
+
+# Records listed by the server-side search of the order form
+SEARCH_OPTIONS = 10
+
+def _label(kind, record):
+    if kind == "products":
+        return f"{record['name']} ({record['sku']}) — ${record['price']}"
+    return f"{record['name']} <{record['email']}>"
+
+def _record_field(kind, label, name, placeholder, query, records):
+    """ Search field filled in by assets/search.js, or the list of the records found by the server for query """
+    if query:
+        options = "".join(f'<option value="{record["id"]}">{html.escape(_label(kind, record))}</option>'
+                          for record in records)
+        return f"""
+            <div class="mb-3">
+                <label class="form-label">{label}</label>
+                <select class="form-select" name="{name}" required>{options}</select>
+                {"" if records else f"<p>Aucun résultat pour « {html.escape(query)} ».</p>"}
+            </div>"""
+    return f"""
+            <div class="mb-3">
+                <label class="form-label">{label}</label>
+                <input class="form-control" type="search" list="{kind}-options" data-search="{kind}" data-target="{name}"
+                       placeholder="{placeholder}" autocomplete="off" required>
+                <datalist id="{kind}-options"></datalist>
+                <input type="hidden" name="{name}">
+            </div>"""
+
+def show_order_form(query=None):
+    """ Show order form and list; users and products are looked up by prefix as they are typed (see assets/search.js),
+    or by the server from ?user_q=&product_q= when JavaScript is disabled """
+    user_q = get_param(query, "user_q").strip()
+    product_q = get_param(query, "product_q").strip()
+    calls = {"orders": lambda: list_orders_from_redis(10)}
+    if user_q:
+        calls["users"] = lambda: search("users", user_q, SEARCH_OPTIONS)
+    if product_q:
+        calls["products"] = lambda: search("products", product_q, SEARCH_OPTIONS)
+    results = fetch_all(calls, defaults={"orders": [], "users": [], "products": []})
 
-def show_order_form():
-    """ Show order form and list """
-    # TODO: utilisez Redis seulement
-    orders = get_orders_from_redis(10)
-    products = list_products(99)
-    users = list_users(99)
     order_rows = [f"""
             <tr>
-                <td>{order.id}</td>
-                <td>${order.total_amount}</td>
-                <td><a href="/orders/remove/{order.id}">Supprimer</a></td>
-            </tr> """ for order in orders]
-    user_rows = [f"""<option key={user.id} value={user.id}>{user.name}</option>""" for user in users]
-    product_rows = [f"""<option key={product.id} value={product.id}>{product.name} (${product.price})</option>""" for product in products]
+                <td>{order["id"]}</td>
+                <td>${order["total"]}</td>
+                <td><a href="/orders/remove/{order["id"]}">Supprimer</a></td>
+            </tr> """ for order in results["orders"]]
     return get_template(f"""
         <h2>Commandes</h2>
         <p>Voici les 10 derniers enregistrements :</p>
@@ -35,25 +69,26 @@ def show_order_form():
             {" ".join(order_rows)}
         </table>
         <h2>Enregistrement</h2>
+        <noscript>
+            <form method="GET" action="/orders" class="mb-3">
+                <input class="form-control mb-2" type="search" name="user_q" value="{html.escape(user_q)}"
+                       placeholder="Utilisateur : nom ou courriel" required>
+                <input class="form-control mb-2" type="search" name="product_q" value="{html.escape(product_q)}"
+                       placeholder="Article : nom ou SKU" required>
+                <button type="submit" class="btn btn-secondary">Rechercher</button>
+            </form>
+        </noscript>
         <form method="POST" action="/orders/add">
-            <div class="mb-3">
-                <label class="form-label">Utilisateur</label>
-                <select class="form-control" name="user_id" required>
-                    {" ".join(user_rows)}
-                </select>
-            </div>
-            <div class="mb-3">
-                <label class="form-label">Article</label>
-                <select class="form-control" name="product_id" required>
-                    {" ".join(product_rows)}
-                </select>
-            </div>
+            <input type="hidden" name="idempotency_key" value="{uuid.uuid4().hex}">
+            {_record_field("users", "Utilisateur", "user_id", "Nom ou courriel", user_q, results.get("users"))}
+            {_record_field("products", "Article", "product_id", "Nom ou SKU", product_q, results.get("products"))}
             <div class="mb-3">
                 <label class="form-label">Quantité</label>
                 <input class="form-control" type="number" name="quantity" step="1" value="1" min="1" max="999" required>
             </div>
             <button type="submit" class="btn btn-primary">Enregistrer</button>
         </form>
+        <script src="/assets/search.js" defer></script>
     """)
 
 def register_order(params):
@@ -65,7 +100,7 @@ def register_order(params):
         items = [
             {'product_id': product_id, 'quantity': quantity}
         ]
-        result = create_order(user_id, items)
+        result = create_order(user_id, items, get_param(params, "idempotency_key") or None)
     else: 
         return get_template(f"""
                 <h2>Erreur</h2>
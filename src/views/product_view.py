@@ -16,6 +16,7 @@ def show_product_form():
                 <td>{product.name}</td>
                 <td>{product.sku}</td>
                 <td>${product.price}</td>
+                <td>{"—" if product.stock is None else product.stock}</td>
                 <td><a href="/products/remove/{product.id}">Supprimer</a></td>
             </tr> """ for product in products]
     return get_template(f"""
@@ -27,6 +28,7 @@ def show_product_form():
                 <th>Nom</th>
                 <th>Numéro SKU</th>
                 <th>Prix unitaire</th> 
+                <th>Stock</th>
                 <th>Actions</th> 
             </tr>  
             {" ".join(rows)}
@@ -45,6 +47,10 @@ def show_product_form():
                 <label class="form-label">Prix unitaire</label>
                 <input class="form-control" type="number" name="price" step="0.01" value="1.00" min="0.00" max="99999.00" required>
             </div>
+            <div class="mb-3">
+                <label class="form-label">Stock initial (vide : non suivi)</label>
+                <input class="form-control" type="number" name="stock" step="1" min="0">
+            </div>
             <button type="submit" class="btn btn-primary">Enregistrer</button>
         </form>
     """)
@@ -55,7 +61,8 @@ def register_product(params):
         name = get_param(params, "name")
         sku = get_param(params, "sku")
         price = get_param(params, "price")
-        result = create_product(name, sku, price)
+        stock = get_param(params, "stock")
+        result = create_product(name, sku, price, stock or None)
     else: 
         return get_template(f"""
                 <h2>Erreur</h2>
@@ -3,10 +3,17 @@ Report view
 SPDX - License - Identifier: LGPL - 3.0 - or -later
 Auteurs : Gabriel C. Ullmann, Fabio Petrillo, 2025
 """
+import logging
 from views.template_view import get_template, get_param
-from queries.read_order import get_highest_spending_users, get_most_sold_products
-from sqlalchemy import text
-from db import engine
+from queries.read_order import REPORT_WINDOWS, get_highest_spending_users, get_most_sold_products, parse_window
+from queries.read_buyers import (get_daily_buyers, get_daily_buyers_from_mysql, get_product_buyers,
+                                 get_product_buyers_from_mysql)
+from queries.read_report import get_highest_spending_users_from_mysql, get_most_sold_products_from_mysql
+from queries.read_user import get_users_by_ids
+from queries.read_product import get_products_by_ids
+
+logger = logging.getLogger(__name__)
+
 def _render_page(title: str, heading: str, ul_html: str) -> str:
     return f"""<!DOCTYPE html>
     <html lang="fr">
@@ -30,30 +37,33 @@ def _render_page(title: str, heading: str, ul_html: str) -> str:
         </body>
     </html>
     """
-def show_highest_spending_users():
+def _window_label(window):
+    """ Get the heading suffix of a report window """
+    days = parse_window(window)
+    if not days:
+        return ""
+    return " (aujourd'hui)" if days == 1 else f" ({days} derniers jours)"
+
+def _with_names(rows, get_by_ids):
+    """ Replace the IDs of Redis report rows by names, resolved with a single batched lookup """
+    by_id = get_by_ids([row_id for row_id, _ in rows])
+    return [(by_id.get(int(row_id), {}).get("name", row_id), value) for row_id, value in rows]
+
+def get_highest_spenders_rows(window=None, limit=10):
+    """ Get the (user name, total spent) rows of the report, from Redis or the MySQL summaries """
     try:
-        rows = get_highest_spending_users()
-    except Exception as e:
-        print(e)
+        rows = _with_names(get_highest_spending_users(limit, window=window), get_users_by_ids)
+    except Exception:
+        logger.exception("meilleurs clients (Redis) indisponibles")
         rows = []
-    if not rows:
+    # The MySQL summaries are all-time only, a windowed report never falls back on them
+    if not rows and not parse_window(window):
         try:
-            with engine.connect() as conn:
-                res = conn.execute(text("""
-                    SELECT u.name AS user_name,
-                           COALESCE(SUM(oi.quantity * oi.unit_price), 0) AS spent
-                    FROM orders o
-                    JOIN users u ON u.id = o.user_id
-                    LEFT JOIN order_items oi ON oi.order_id = o.id
-                    GROUP BY u.id, u.name
-                    ORDER BY spent DESC
-                    LIMIT 10
-                """))
-                rows = [(r["user_name"], float(r["spent"])) for r in res.mappings()]
-        except Exception as e:
-            print(e)
+            rows = get_highest_spending_users_from_mysql(limit)
+        except Exception:
+            logger.exception("meilleurs clients (MySQL) indisponibles")
             rows = []
-    items = []
+    result = []
     for row in rows:
         if isinstance(row, dict):
             user = row.get("user_name") or row.get("name")
@@ -69,7 +79,57 @@ def show_highest_spending_users():
             total = float(total or 0)
         except Exception:
             total = 0.0
-        items.append(f"<li>{user} — {total:.2f}$</li>")
+        result.append((user, total))
+    return result
+
+def get_best_sellers_rows(window=None, limit=10):
+    """ Get the (product name, units sold) rows of the report, from Redis or the MySQL summaries """
+    try:
+        rows = _with_names(get_most_sold_products(limit, window=window), get_products_by_ids)
+    except Exception:
+        logger.exception("meilleures ventes (Redis) indisponibles")
+        rows = []
+    if not rows and not parse_window(window):
+        try:
+            rows = get_most_sold_products_from_mysql(limit)
+        except Exception:
+            logger.exception("meilleures ventes (MySQL) indisponibles")
+            rows = []
+    return [(product, int(qty or 0)) for product, qty in rows if product is not None]
+
+def get_distinct_buyers_rows(product_id=None, window=None, exact=False):
+    """ Get the (label, distinct buyers) rows of the report: one row for a product, otherwise a ("total", buyers
+    of the whole window) row then one row per day of the window. Estimated by Redis, counted by MySQL if exact """
+    if product_id:
+        if not str(product_id).isdigit():
+            raise ValueError("Le paramètre product_id doit être un entier positif.")
+        product_id = int(product_id)
+        buyers = get_product_buyers_from_mysql(product_id) if exact else get_product_buyers(product_id)
+        return [(get_products_by_ids([product_id]).get(product_id, {}).get("name", product_id), buyers)]
+    days = parse_window(window) or REPORT_WINDOWS["week"]
+    by_day, total = get_daily_buyers_from_mysql(days) if exact else get_daily_buyers(days)
+    return [("total", total)] + by_day
+
+def show_distinct_buyers(params=None):
+    product_id = get_param(params, "product_id")
+    window = get_param(params, "window") or "week"
+    exact = get_param(params, "exact") == "1"
+    try:
+        rows = get_distinct_buyers_rows(product_id, window, exact)
+        items_html = "".join(f"<li>{label} — {buyers} acheteur(s)</li>" for label, buyers in rows)
+    except ValueError as e:
+        items_html = f"<li>{e}</li>"
+    except Exception:
+        logger.exception("acheteurs distincts indisponibles")
+        items_html = "<li>Aucun résultat</li>"
+
+    heading = "Acheteurs distincts" + ("" if product_id else _window_label(window))
+    heading += " — comptage exact" if exact else " — estimation (±1%)"
+    return _render_page(heading, heading, f"<ul>{items_html}</ul>")
+
+def show_highest_spending_users(params=None):
+    window = get_param(params, "window")
+    items = [f"<li>{user} — {total:.2f}$</li>" for user, total in get_highest_spenders_rows(window)]
 
     if not items:
         items_html = "<li>Aucun résultat</li>"
@@ -77,21 +137,13 @@ def show_highest_spending_users():
         items_html = "".join(items)
 
     ul_html = f"<ul>{items_html}</ul>"
-    return _render_page("Les plus gros acheteurs", "Les plus gros acheteurs", ul_html)
-
+    heading = "Les plus gros acheteurs" + _window_label(window)
+    return _render_page(heading, heading, ul_html)
 
-def show_best_sellers():
-    try:
-        rows = get_most_sold_products()
-    except Exception as e:
-        print(e)
-        rows = []
 
-    items_html = "".join(
-        f"<li>{product} — {int(qty or 0)} vendus</li>"
-        for product, qty in rows
-        if product is not None
-    )
+def show_best_sellers(params=None):
+    window = get_param(params, "window")
+    items_html = "".join(f"<li>{product} — {qty} vendus</li>" for product, qty in get_best_sellers_rows(window))
 
     if not items_html:
         items_html = "<li>Aucun résultat</li>"
@@ -115,7 +167,7 @@ def show_best_sellers():
                 <a href="/">← Retourner à la page d'accueil</a>
             </div>
             <hr>
-            <h2>Les articles les plus vendus</h2>
+            <h2>Les articles les plus vendus{_window_label(window)}</h2>
             {ul_html}
         </body>
     </html>
@@ -22,6 +22,9 @@ def show_main_menu():
             <ul class="list-group">
                 <li class="list-group-item"><a href="/orders/reports/highest_spenders">Les plus gros acheteurs</a></li>
                 <li class="list-group-item"><a href="/orders/reports/best_sellers">Les articles les plus vendus</a></li>
+                <li class="list-group-item"><a href="/orders/reports/highest_spenders?window=week">Les plus gros acheteurs de la semaine</a></li>
+                <li class="list-group-item"><a href="/orders/reports/best_sellers?window=week">Les articles les plus vendus de la semaine</a></li>
+                <li class="list-group-item"><a href="/orders/reports/distinct_buyers?window=week">Les acheteurs distincts de la semaine</a></li>
             </ul>
         </nav>""", homepage=True)
 